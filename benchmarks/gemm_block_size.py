@@ -0,0 +1,134 @@
+"""
+GEMM Block Size Tuning Aid
+
+Times the blocked pixel-major solve of the NumPy backend over a range of
+block sizes, for several band and endmember counts and data layouts, and
+reports the block size with the best total time. Every block size must give
+the same result as the largest one (a single block for these problems);
+exits non-zero if one does not.
+
+This is a manual tool: hypmix does not tune the block size at runtime.
+`hypmix.solver_backends.BLOCK_BYTES` is a fixed default because the memory
+planner and the blocked subspace projection size their per-worker
+temporaries from it, so runs plan the same on every machine. The best size
+depends on the cache sizes of the machine; to use it, register the backend
+per process with::
+
+    register_backend("numpy", lambda: NumpyBackend(block_bytes=...))
+
+Sizes above `BLOCK_BYTES` are not charged by the planner, so raise the
+constant itself (and rerun this script) to move the default.
+
+Usage::
+
+    python benchmarks/gemm_block_size.py
+    python benchmarks/gemm_block_size.py --rows 512 --repeat 5
+"""
+
+# Standard Libraries
+import argparse
+import sys
+import time
+
+# Dependencies
+import numpy as np
+
+# Relative Imports
+from hypmix.model_math import _augment, _factor
+from hypmix.solver_backends import BLOCK_BYTES, NumpyBackend
+
+BLOCK_SIZES = [1 << k for k in range(15, 25)]
+# (bands, endmembers)
+SHAPES = [(50, 4), (200, 8), (400, 20)]
+LAYOUTS = [("bip", np.float32), ("bil", np.float32), ("bip", np.int16)]
+# Allowed difference, relative to the largest data value.
+RTOL = 1e-5
+
+
+def make_problem(
+    rows: int, bands: int, n_em: int, layout: str, dtype: type, seed: int = 0
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Augmented design matrix, its solve prefix and a mixed cube."""
+    rng = np.random.default_rng(seed)
+    E = rng.random((bands, n_em)).astype(np.float32)
+    G = _augment(E, np.ones(bands))
+    fracs = rng.dirichlet(np.ones(n_em), (rows, 256)).astype(np.float32)
+    d = fracs @ E.T + rng.normal(0, 0.01, (rows, 256, bands))
+    if np.issubdtype(dtype, np.integer):
+        d = d * 1000
+    d = d.astype(dtype)
+    if layout == "bil":
+        d = np.ascontiguousarray(np.swapaxes(d, 1, 2)).swapaxes(1, 2)
+    return G, _factor(G).prefix, d
+
+
+def timed(
+    backend: NumpyBackend,
+    prefix: np.ndarray,
+    G: np.ndarray,
+    d: np.ndarray,
+    repeat: int,
+) -> tuple[float, tuple[np.ndarray, ...]]:
+    result = backend.solve(prefix, G, d, True)
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        result = backend.solve(prefix, G, d, True)
+        best = min(best, time.perf_counter() - t)
+    return best, result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=256)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    totals = dict.fromkeys(BLOCK_SIZES, 0.0)
+    failed = False
+    header = " ".join(f"{size >> 10:>7}K" for size in BLOCK_SIZES)
+    print(f"{'problem':<24} {header}  (ms)")
+    for bands, n_em in SHAPES:
+        for layout, dtype in LAYOUTS:
+            G, prefix, d = make_problem(
+                args.rows, bands, n_em, layout, dtype
+            )
+            scale = float(np.abs(d).max())
+            # One block covers the whole problem.
+            reference = NumpyBackend(block_bytes=1 << 62).solve(
+                prefix, G, d, True
+            )
+            times = []
+            for size in BLOCK_SIZES:
+                t, result = timed(
+                    NumpyBackend(block_bytes=size), prefix, G, d, args.repeat
+                )
+                diff = max(
+                    float(np.abs(out - ref).max())
+                    for out, ref in zip(result, reference)
+                )
+                if diff > RTOL * scale:
+                    failed = True
+                    print(f"  FAIL {size} bytes: max diff {diff:.2e}")
+                totals[size] += t
+                times.append(t)
+            label = f"{bands}x{n_em} {layout} {np.dtype(dtype).name}"
+            row = " ".join(f"{1e3 * t:8.1f}" for t in times)
+            print(f"{label:<24} {row}")
+
+    best = min(totals, key=totals.__getitem__)
+    print(f"best block size: {best} bytes")
+    for size in sorted({BLOCK_BYTES, BLOCK_SIZES[-1]} & set(totals)):
+        print(f"  {totals[size] / totals[best]:.2f}x slower at {size} bytes")
+    if best > BLOCK_BYTES:
+        print(f"raise BLOCK_BYTES to {best} to apply it to planned runs")
+    else:
+        print(
+            "apply with: register_backend("
+            f'"numpy", lambda: NumpyBackend(block_bytes={best}))'
+        )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""
+Import-Time Regression Benchmark
+
+Times imports of hypmix in fresh interpreters and checks which heavy
+dependencies they load. Exits non-zero if an import loads a forbidden
+module or exceeds its time budget.
+
+Usage::
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --repeat 10 --scale 2.0
+"""
+
+# Standard Libraries
+import argparse
+import json
+import subprocess
+import sys
+from dataclasses import dataclass
+
+HEAVY = ("h5py", "rasterio", "PySide6", "pyqtgraph", "spectralio")
+
+
+@dataclass
+class ImportCase:
+    statement: str
+    budget_ms: float
+    forbidden: tuple[str, ...]
+
+
+CASES = [
+    ImportCase("import hypmix", 50, HEAVY + ("numpy",)),
+    ImportCase("from hypmix import MixtureModel", 600, HEAVY),
+    ImportCase("from hypmix import SUnSALOptions, StorageOptions", 600, HEAVY),
+    ImportCase(
+        "from hypmix import load_model_result",
+        1200,
+        ("rasterio", "PySide6", "pyqtgraph"),
+    ),
+]
+
+PROBE = """
+import json, sys, time
+t = time.perf_counter()
+{statement}
+t = time.perf_counter() - t
+print(json.dumps({{"ms": 1e3 * t, "modules": sorted(sys.modules)}}))
+"""
+
+
+def measure(statement: str) -> tuple[float, set[str]]:
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE.format(statement=statement)],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    return result["ms"], {m.split(".")[0] for m in result["modules"]}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=1.0,
+        help="Multiplies every time budget (for slow machines).",
+    )
+    args = parser.parse_args()
+
+    failed = False
+    for case in CASES:
+        best = float("inf")
+        loaded: set[str] = set()
+        for _ in range(args.repeat):
+            ms, loaded = measure(case.statement)
+            best = min(best, ms)
+        budget = case.budget_ms * args.scale
+        bad = sorted(loaded.intersection(case.forbidden))
+        ok = best <= budget and not bad
+        failed |= not ok
+        status = "ok  " if ok else "FAIL"
+        print(
+            f"{status} {best:8.1f} ms (budget {budget:.0f}) {case.statement}"
+        )
+        if bad:
+            print(f"       loaded forbidden modules: {', '.join(bad)}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""
+Memory Budget Check
+
+Runs planned runs over an in-memory mixture cube under `tracemalloc` and
+checks that the peak memory each one allocates stays within the
+`memory_budget` it was planned for. Plain, pipelined, multi-worker,
+subspace, sparse, class-wise and refined runs are covered; configurations
+the planner rejects with `MemoryBudgetError` are reported and skipped.
+
+Usage::
+
+    python benchmarks/memory_budget.py
+    python benchmarks/memory_budget.py --budget 40 --bands 224
+"""
+
+# Standard Libraries
+import argparse
+import sys
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+# Dependencies
+import numpy as np
+
+# Relative Imports
+from hypmix import MixtureModel, SUnSALOptions
+from hypmix.class_unmixing import EndmemberClasses
+from hypmix.endmember import EndMemberGroup
+from hypmix.model_math import PrecisionPolicy
+from hypmix.planning import MemoryBudgetError
+from hypmix.reduction import ReductionMethod, fit_subspace
+from hypmix.typing import ImageCube
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=600)
+    parser.add_argument("--cols", type=int, default=500)
+    parser.add_argument("--bands", type=int, default=200)
+    parser.add_argument("--endmembers", type=int, default=5)
+    parser.add_argument(
+        "--budget", type=float, nargs="+", default=[20, 60], help="MiB"
+    )
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    shape = (args.rows, args.cols)
+    wvl = np.linspace(400, 2500, args.bands)
+    E = rng.random((args.bands, args.endmembers)).astype(np.float32)
+    fracs = rng.dirichlet(np.ones(args.endmembers), shape)
+    cube = ImageCube(np.ascontiguousarray(fracs.astype(np.float32) @ E.T), wvl)
+    names = [f"em{n}" for n in range(args.endmembers)]
+    group = EndMemberGroup.from_array(names, E, wvl)
+    model = MixtureModel(group, cube)
+    refined = MixtureModel(group, cube, precision=PrecisionPolicy(refine=True))
+    classes = EndmemberClasses(
+        rng.integers(0, 2, shape), {0: tuple(names[:3]), 1: tuple(names[2:])}
+    )
+    cases = {
+        "plain": (model, {}),
+        "pipeline": (model, {"pipeline": True}),
+        "workers": (model, {"workers": 4}),
+        "subspace": (
+            model,
+            {"subspace": fit_subspace(cube, 4, ReductionMethod.PCA)},
+        ),
+        "sparse": (model, {"sparse": SUnSALOptions(block_size=1024)}),
+        "classes": (model, {"classes": classes}),
+        "refine": (refined, {}),
+    }
+
+    over = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        dst = Path(tmp) / "results.hdf5"
+        # Leave one-time imports and caches out of the measured peaks.
+        model.run(dst, "warm-up", reuse=False)
+        for mib in args.budget:
+            budget = int(mib * 2**20)
+            for label, (m, kwargs) in cases.items():
+                try:
+                    plan = m.plan(memory_budget=budget, **kwargs)
+                except MemoryBudgetError as e:
+                    print(f"{mib:5.0f} MiB {label:<9} skipped: {e}")
+                    continue
+                tracemalloc.start()
+                m.run(dst, label, memory_budget=budget, reuse=False, **kwargs)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                ok = peak <= budget
+                over += not ok
+                print(
+                    f"{mib:5.0f} MiB {label:<9} "
+                    f"planned {plan.peak_bytes / 2**20:6.1f} MiB, "
+                    f"measured {peak / 2**20:6.1f} MiB "
+                    f"({plan.tile_rows} rows, {plan.workers} workers)"
+                    + ("" if ok else "  OVER BUDGET")
+                )
+    print("all runs within budget" if not over else f"{over} runs over")
+    return 0 if not over else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""
+Pipelined Run Benchmark
+
+Times tiled runs over a memory-mapped cube on disk with and without
+`pipeline=True`, and checks that both write the same result. Before every
+run the cube file is dropped from the page cache (where the platform
+supports `posix_fadvise`), so tiles are read from disk and reads compete
+with the solves as they would in a first pass over a large scene.
+
+Usage::
+
+    python benchmarks/pipelined_run.py
+    python benchmarks/pipelined_run.py --rows 4000 --bands 224 --workers 2
+"""
+
+# Standard Libraries
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Dependencies
+import numpy as np
+
+# Relative Imports
+from hypmix import MixtureModel
+from hypmix.endmember import EndMemberGroup
+from hypmix.typing import ImageCube
+
+
+def make_cube(path: Path, rows: int, cols: int, bands: int, n_em: int):
+    """Writes a noisy mixture cube to `path`, one block of rows at a time."""
+    rng = np.random.default_rng(0)
+    E = rng.random((bands, n_em)).astype(np.float32)
+    cube = np.lib.format.open_memmap(
+        path, mode="w+", dtype=np.float32, shape=(rows, cols, bands)
+    )
+    for r in range(0, rows, 256):
+        n = min(256, rows - r)
+        fracs = rng.dirichlet(np.ones(n_em), (n, cols)).astype(np.float32)
+        cube[r : r + n] = fracs @ E.T + rng.normal(0, 0.01, (n, cols, bands))
+    cube.flush()
+    del cube
+    return E
+
+
+def drop_cache(path: Path) -> bool:
+    if not hasattr(os, "posix_fadvise"):
+        return False
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+    return True
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--cols", type=int, default=512)
+    parser.add_argument("--bands", type=int, default=200)
+    parser.add_argument("--endmembers", type=int, default=8)
+    parser.add_argument("--tile-rows", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src = Path(tmp) / "cube.npy"
+        E = make_cube(src, args.rows, args.cols, args.bands, args.endmembers)
+        wvl = np.linspace(400, 2500, args.bands)
+        names = [f"em{n}" for n in range(args.endmembers)]
+        endmembers = EndMemberGroup.from_array(names, E, wvl).endmember_list
+        data = np.load(src, mmap_mode="r")
+        model = MixtureModel(endmembers, ImageCube(data, wvl))
+        size = data.nbytes / 2**20
+        print(f"cube: {data.shape}, {size:,.0f} MiB")
+
+        dst = Path(tmp) / "results.hdf5"
+        times = {}
+        for pipeline in (False, True):
+            best = float("inf")
+            for _ in range(args.repeat):
+                cold = drop_cache(src)
+                t = time.perf_counter()
+                result = model.run(
+                    dst,
+                    f"pipeline={pipeline}",
+                    reuse=False,
+                    tile_rows=args.tile_rows,
+                    workers=args.workers,
+                    pipeline=pipeline,
+                )
+                best = min(best, time.perf_counter() - t)
+            times[pipeline] = best
+            label = "pipelined" if pipeline else "in order "
+            state = "cold" if cold else "warm"
+            print(f"{label} {best:6.2f} s ({state} reads)")
+            del result
+
+        a = model.run(dst, "pipeline=False", tile_rows=args.tile_rows)
+        b = model.run(dst, "pipeline=True", tile_rows=args.tile_rows)
+        same = np.array_equal(
+            a.unmixed_image.fracs[...],
+            b.unmixed_image.fracs[...],
+            equal_nan=True,
+        )
+        print(f"speedup: {times[False] / times[True]:.2f}x")
+        print("results agree" if same else "RESULTS DIFFER")
+        return 0 if same else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+"""
+Solver Backend Agreement Benchmark
+
+Runs the same unmixing problems on every available solver backend, checks
+that each one reproduces the NumPy reference (same NaN pixels, and values
+equal to float32 rounding) and times them. Exits non-zero if a backend
+disagrees.
+
+Usage::
+
+    python benchmarks/solver_backends.py
+    python benchmarks/solver_backends.py --rows 1000 --repeat 5
+"""
+
+# Standard Libraries
+import argparse
+import sys
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+# Dependencies
+import numpy as np
+
+# Relative Imports
+from hypmix.model_math import MixedCube, PrecisionPolicy, unmix_spectral_cube
+from hypmix.reduction import fit_subspace
+from hypmix.solver_backends import available_backends, get_backend
+from hypmix.sparse_unmixing import SUnSALOptions, unmix_sparse
+from hypmix.typing import ImageCube
+
+# Allowed difference, relative to the largest value of an output or of the
+# data it was computed from (residuals are small differences of data values).
+RTOL = 1e-5
+
+
+@dataclass
+class Case:
+    name: str
+    layout: str
+    dtype: type
+    run: Callable[[MixedCube, str], dict[str, np.ndarray]]
+
+
+def make_problem(
+    rows: int, layout: str, dtype: type, seed: int = 0
+) -> MixedCube:
+    """Noisy mixtures of 8 endmembers over 200 bands, with a NaN pixel."""
+    rng = np.random.default_rng(seed)
+    bands, cols, n_em = 200, 256, 8
+    G = rng.random((bands, n_em)).astype(np.float32)
+    fracs = rng.dirichlet(np.ones(n_em), (rows, cols)).astype(np.float32)
+    d = fracs @ G.T + rng.normal(0, 0.01, (rows, cols, bands))
+    d[0, 0, 0] = np.nan
+    if np.issubdtype(dtype, np.integer):
+        d = np.nan_to_num(d * 1000)
+    d = d.astype(dtype)
+    if layout == "bil":
+        d = np.ascontiguousarray(np.swapaxes(d, 1, 2)).swapaxes(1, 2)
+    return MixedCube(G, d)
+
+
+def _least_squares(
+    precision: Optional[PrecisionPolicy] = None, add_to_one: bool = True
+) -> Callable[[MixedCube, str], dict[str, np.ndarray]]:
+    def run(problem: MixedCube, backend: str) -> dict[str, np.ndarray]:
+        res = unmix_spectral_cube(
+            problem,
+            add_to_one=add_to_one,
+            precision=precision,
+            backend=backend,
+        )
+        rms = get_backend(backend).rms(res.res)
+        return {
+            "fracs": res.fracs,
+            "model": res.model,
+            "res": res.res,
+            "rms": rms,
+        }
+
+    return run
+
+
+def _reduced(problem: MixedCube, backend: str) -> dict[str, np.ndarray]:
+    sample = np.nan_to_num(problem.d[:16])
+    wvl = np.arange(sample.shape[-1], dtype=np.float64)
+    cube = ImageCube(np.moveaxis(sample, -1, 0), wvl, bands_first=True)
+    subspace = fit_subspace(cube, 4, seed=0)
+    res = unmix_spectral_cube(problem, subspace=subspace, backend=backend)
+    rms = get_backend(backend).rms(res.res, res.res_perp)
+    return {"fracs": res.fracs, "rms": rms}
+
+
+def _sparse(problem: MixedCube, backend: str) -> dict[str, np.ndarray]:
+    opts = SUnSALOptions(lam=1e-4, max_iter=50)
+    sub = MixedCube(problem.G, problem.d[:32])
+    res = unmix_sparse(sub, opts, backend=backend)
+    return {"fracs": res.fracs, "res": res.res}
+
+
+CASES = [
+    Case("least squares", "bip", np.float32, _least_squares()),
+    Case("least squares", "bil", np.float32, _least_squares()),
+    Case("least squares", "bip", np.float64, _least_squares()),
+    Case("least squares", "bip", np.int16, _least_squares()),
+    Case(
+        "unconstrained",
+        "bip",
+        np.float32,
+        _least_squares(add_to_one=False),
+    ),
+    Case(
+        "refined",
+        "bip",
+        np.float64,
+        _least_squares(PrecisionPolicy(refine=True)),
+    ),
+    Case("subspace", "bip", np.float32, _reduced),
+    Case("sparse", "bip", np.float32, _sparse),
+]
+
+
+def compare(
+    result: dict[str, np.ndarray],
+    reference: dict[str, np.ndarray],
+    data_scale: float,
+) -> list[str]:
+    """Outputs of `result` that differ from `reference`."""
+    bad = []
+    for key, ref in reference.items():
+        out = np.asarray(result[key])
+        ref = np.asarray(ref)
+        same_nan = np.array_equal(np.isnan(out), np.isnan(ref))
+        scale = max(float(np.nanmax(np.abs(ref))), data_scale)
+        diff = float(np.nanmax(np.abs(out - ref))) if out.size else 0.0
+        if out.dtype != ref.dtype or not same_nan or diff > RTOL * scale:
+            bad.append(f"{key} (max diff {diff:.2e}, scale {scale:.2e})")
+    return bad
+
+
+def timed(
+    case: Case, problem: MixedCube, backend: str, repeat: int
+) -> tuple[float, dict[str, np.ndarray]]:
+    # The first call compiles JIT backends; it is not timed.
+    result = case.run(problem, backend)
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        result = case.run(problem, backend)
+        best = min(best, time.perf_counter() - t)
+    return best, result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=512)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    backends = available_backends()
+    print(f"backends: {', '.join(backends)}")
+    failed = False
+    for case in CASES:
+        problem = make_problem(args.rows, case.layout, case.dtype)
+        label = f"{case.name} ({case.layout}, {np.dtype(case.dtype).name})"
+        data_scale = float(np.nanmax(np.abs(problem.d)))
+        ref_time, reference = timed(case, problem, "numpy", args.repeat)
+        print(f"{label}: numpy {1e3 * ref_time:.1f} ms")
+        for backend in backends:
+            if backend == "numpy":
+                continue
+            t, result = timed(case, problem, backend, args.repeat)
+            bad = compare(result, reference, data_scale)
+            failed |= bool(bad)
+            status = "ok  " if not bad else "FAIL"
+            print(
+                f"  {status} {backend} {1e3 * t:.1f} ms "
+                f"({ref_time / t:.2f}x)"
+            )
+            for line in bad:
+                print(f"       differs: {line}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
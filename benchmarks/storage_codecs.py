@@ -0,0 +1,107 @@
+"""
+Storage Codec Round Trip
+
+Saves a model result, then loads it lazily and saves it again over itself
+with every storage codec in turn, as when a stored result is recompressed.
+Reports the stored size and the largest fraction error of each codec, and
+checks that the lazy result still reads the re-encoded data afterwards.
+
+Usage::
+
+    python benchmarks/storage_codecs.py
+    python benchmarks/storage_codecs.py --rows 400 --bands 224
+"""
+
+# Standard Libraries
+import argparse
+import sys
+import tempfile
+from pathlib import Path
+
+# Dependencies
+import h5py as h5
+import numpy as np
+
+# Relative Imports
+from hypmix import MixtureModel, StorageCodec, StorageOptions
+from hypmix.endmember import EndMemberGroup
+from hypmix.io import load_model_result, save_model_result
+from hypmix.typing import ImageCube
+
+# Largest fraction error each codec may introduce.
+TOLERANCE = {
+    StorageCodec.FLOAT32: 0.0,
+    StorageCodec.FLOAT16: 1e-3,
+    StorageCodec.INT16: 1e-4,
+    StorageCodec.SCALE_OFFSET: 1e-4,
+}
+
+
+def stored_bytes(group: h5.Group) -> int:
+    sizes = []
+
+    def visit(_, obj):
+        if isinstance(obj, h5.Dataset):
+            sizes.append(obj.id.get_storage_size())
+
+    group.visititems(visit)
+    return sum(sizes)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--cols", type=int, default=150)
+    parser.add_argument("--bands", type=int, default=120)
+    parser.add_argument("--endmembers", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    wvl = np.linspace(400, 2500, args.bands)
+    E = rng.random((args.bands, args.endmembers)).astype(np.float32)
+    fracs = rng.dirichlet(np.ones(args.endmembers), (args.rows, args.cols))
+    data = fracs.astype(np.float32) @ E.T
+    data += rng.normal(0, 0.01, data.shape).astype(np.float32)
+    names = [f"em{n}" for n in range(args.endmembers)]
+    model = MixtureModel(
+        EndMemberGroup.from_array(names, E, wvl), ImageCube(data, wvl)
+    )
+
+    failed = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        dst = Path(tmp) / "results.hdf5"
+        result = model.run(dst, "m")
+        save_model_result(result)
+        expected = np.asarray(result.unmixed_image.fracs)
+        for codec, tol in TOLERANCE.items():
+            storage = StorageOptions(codec, band_major=("fractions",))
+            lazy = load_model_result(dst, "m", lazy=True)
+            try:
+                save_model_result(lazy, storage=storage)
+                stored = load_model_result(dst, "m").unmixed_image.fracs
+                reread = lazy.unmixed_image.fracs[:, :, 0]
+            except Exception as e:
+                print(f"{codec.value:<12} FAILED: {type(e).__name__}: {e}")
+                failed += 1
+                continue
+            # Each save starts from the previous codec's values.
+            err = np.nanmax(np.abs(stored - expected))
+            # The band image is read from the band-major copy, which
+            # scale-offset may quantize against other chunk minima.
+            ok = err <= 2 * tol + 1e-6 and np.allclose(
+                reread, stored[:, :, 0], rtol=0, atol=tol, equal_nan=True
+            )
+            failed += not ok
+            with h5.File(dst, "r") as f:
+                size = stored_bytes(f["m"]) / 2**20
+            print(
+                f"{codec.value:<12} {size:6.2f} MiB, max error {err:.2e}"
+                + ("" if ok else "  MISMATCH")
+            )
+            expected = stored
+    print("all codecs round trip" if not failed else f"{failed} failed")
+    return 0 if not failed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
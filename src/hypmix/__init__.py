@@ -1,17 +1,103 @@
-from .endmember import InSceneEndMember, ExternalEndMember, EndMember
-from .io import ModelResult, save_model_result, load_model_result
-from .run_model import MixtureModel
-from .typing import Spectrum
-from .helper_functions import open_mixview
+# Public names are imported on first access (PEP 562), so `import hypmix`
+# does not pull in h5py, rasterio or the Qt stack of MixView.
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
 
-__all__ = [
-    "InSceneEndMember",
-    "ExternalEndMember",
-    "EndMember",
-    "ModelResult",
-    "save_model_result",
-    "load_model_result",
-    "MixtureModel",
-    "Spectrum",
-    "open_mixview",
-]
+if TYPE_CHECKING:
+    from .endmember import (  # noqa: F401
+        InSceneEndMember,
+        ExternalEndMember,
+        EndMember,
+    )
+    from .io import (  # noqa: F401
+        ModelResult,
+        save_model_result,
+        load_model_result,
+    )
+    from .run_model import MixtureModel  # noqa: F401
+    from .typing import Spectrum  # noqa: F401
+    from .helper_functions import open_mixview  # noqa: F401
+    from .extraction import vca, nfindr, ppi  # noqa: F401
+    from .roi import PixelWindow  # noqa: F401
+    from .library import SpectralLibrary  # noqa: F401
+    from .sparse_unmixing import SUnSALOptions  # noqa: F401
+    from .robust_unmixing import (  # noqa: F401
+        RobustLoss,
+        RobustOptions,
+        WeightMode,
+    )
+    from .progress import (  # noqa: F401
+        CancelToken,
+        RunCancelledError,
+        TileProgress,
+    )
+    from .planning import MemoryBudgetError, RunPlan  # noqa: F401
+    from .storage import StorageCodec, StorageOptions  # noqa: F401
+    from .sharding import ShardManifest, merge_shards  # noqa: F401
+    from .comparison import compare_models, load_comparison  # noqa: F401
+    from .hapke import (  # noqa: F401
+        HapkeGeometry,
+        cube_to_ssa,
+        endmembers_to_ssa,
+    )
+    from .model_math import AccuracyReport, PrecisionPolicy  # noqa: F401
+    from .class_unmixing import EndmemberClasses  # noqa: F401
+    from .solver_backends import (  # noqa: F401
+        available_backends,
+        register_backend,
+    )
+
+_EXPORTS = {
+    "InSceneEndMember": ".endmember",
+    "ExternalEndMember": ".endmember",
+    "EndMember": ".endmember",
+    "ModelResult": ".io",
+    "save_model_result": ".io",
+    "load_model_result": ".io",
+    "MixtureModel": ".run_model",
+    "Spectrum": ".typing",
+    "open_mixview": ".helper_functions",
+    "vca": ".extraction",
+    "nfindr": ".extraction",
+    "ppi": ".extraction",
+    "PixelWindow": ".roi",
+    "SpectralLibrary": ".library",
+    "SUnSALOptions": ".sparse_unmixing",
+    "RobustOptions": ".robust_unmixing",
+    "RobustLoss": ".robust_unmixing",
+    "WeightMode": ".robust_unmixing",
+    "CancelToken": ".progress",
+    "RunCancelledError": ".progress",
+    "TileProgress": ".progress",
+    "MemoryBudgetError": ".planning",
+    "RunPlan": ".planning",
+    "StorageCodec": ".storage",
+    "StorageOptions": ".storage",
+    "ShardManifest": ".sharding",
+    "merge_shards": ".sharding",
+    "compare_models": ".comparison",
+    "load_comparison": ".comparison",
+    "HapkeGeometry": ".hapke",
+    "cube_to_ssa": ".hapke",
+    "endmembers_to_ssa": ".hapke",
+    "PrecisionPolicy": ".model_math",
+    "AccuracyReport": ".model_math",
+    "EndmemberClasses": ".class_unmixing",
+    "available_backends": ".solver_backends",
+    "register_backend": ".solver_backends",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str) -> Any:
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted([*globals(), *__all__])
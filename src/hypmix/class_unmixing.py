@@ -0,0 +1,177 @@
+"""
+Class-Map Unmixing
+
+Unmixes each part of a scene with its own endmember set, chosen per pixel by
+a class raster (e.g. geologic units of a mosaic). The model holds the union
+of all endmembers; each class names the subset it is unmixed with. Pixels
+are sorted by class once per tile, and every class is gathered and solved
+as one batch with its own design matrix, which a run factorizes once.
+
+Results keep the layout of a single-set run over the union of endmembers:
+fractions of endmembers outside a pixel's set are 0, and pixels of classes
+without a set are left unsolved (NaN). The per-pixel class and the
+endmembers of each class are stored with the result.
+
+Usage::
+
+    classes = EndmemberClasses(
+        unit_raster,
+        {1: ("basalt", "soil"), 2: ("granite", "soil", "vegetation")},
+    )
+    res = model.run("results.hdf5", "units", classes=classes)
+"""
+
+# Standard Libraries
+from dataclasses import dataclass
+from typing import Any, Callable, Optional, Sequence
+from typing_extensions import Annotated
+
+# Dependencies
+import numpy as np
+import numpy.typing as npt
+
+# Relative Imports
+from .model_math import AccuracyReport, MixedCube, UnMixedCube
+from .roi import ROI
+from .tiling import Tile, read_tile
+
+
+@dataclass
+class EndmemberClasses:
+    """
+    Parameters
+    ----------
+    class_map: NDArray[np.integer, (2,)]
+        Class of every pixel, with the (rows, columns) shape of the data
+        cube. For loaded results, the class of every result pixel.
+    sets: dict[int, Sequence[str]]
+        Names of the model endmembers each class is unmixed with. Pixels of
+        classes missing from `sets` are not solved.
+    """
+
+    class_map: Annotated[npt.NDArray[np.integer], (2,)]
+    sets: dict[int, Sequence[str]]
+
+    def __post_init__(self):
+        if not np.issubdtype(self.class_map.dtype, np.integer):
+            raise ValueError(
+                f"class_map must be integer, got {self.class_map.dtype}."
+            )
+        for cid, names in self.sets.items():
+            if len(names) == 0:
+                raise ValueError(f"Class {cid} has an empty endmember set.")
+
+    def columns(
+        self, endmember_names: Sequence[str]
+    ) -> dict[int, npt.NDArray[np.intp]]:
+        """
+        Columns of the model design matrix used by each class, in the order
+        of `endmember_names`.
+
+        Raises
+        ------
+        ValueError
+            If a set names an endmember that is not in the model.
+        """
+        position = {name: n for n, name in enumerate(endmember_names)}
+        out = {}
+        for cid, names in self.sets.items():
+            unknown = [name for name in names if name not in position]
+            if unknown:
+                raise ValueError(
+                    f"Class {cid} uses endmembers {unknown} that are not in "
+                    "the model."
+                )
+            out[int(cid)] = np.array(
+                sorted(position[name] for name in names), dtype=np.intp
+            )
+        return out
+
+    def membership(
+        self, endmember_names: Sequence[str]
+    ) -> tuple[npt.NDArray, npt.NDArray[np.bool_]]:
+        """
+        Class ids, sorted, and a (classes x endmembers) mask of the
+        endmembers each class uses.
+        """
+        columns = self.columns(endmember_names)
+        ids = np.array(sorted(columns), dtype=np.int64)
+        mask = np.zeros((ids.size, len(endmember_names)), dtype=np.bool_)
+        for n, cid in enumerate(ids):
+            mask[n, columns[int(cid)]] = True
+        return ids, mask
+
+    def read(
+        self, region: Optional[ROI], tile: Optional[Tile] = None
+    ) -> npt.NDArray:
+        """
+        Classes of the pixels of a run, or of one of its tiles, in the
+        layout of the data read for it (see `hypmix.tiling.read_tile`).
+        """
+        cube = self.class_map[..., None]
+        if tile is None:
+            labels = cube if region is None else region.read(cube)
+        else:
+            labels = read_tile(cube, region, tile)
+        return labels[..., 0]
+
+
+def unmix_by_class(
+    G: Annotated[npt.NDArray[np.float32], (2,)],
+    d: Annotated[npt.NDArray, (3,)],
+    labels: Annotated[npt.NDArray[np.integer], (2,)],
+    columns: dict[int, npt.NDArray[np.intp]],
+    solve: Callable[[MixedCube, Any], UnMixedCube],
+    factors: Optional[dict[int, Any]] = None,
+) -> UnMixedCube:
+    """
+    Unmixes every pixel of `d` with the columns of `G` of its class.
+
+    Pixels are sorted by class, and the pixels of each class are gathered
+    into one (pixels, 1, bands) cube and unmixed by `solve`, which must
+    return the sum-to-one layout of `unmix_spectral_cube`. `solve` is also
+    passed the factorization of the class from `factors` (None without
+    one), so the classes of a run are factorized once for all its tiles.
+    Fractions are scattered back into the columns of the full design
+    matrix.
+    """
+    nb = d.shape[-1]
+    nm = G.shape[1]
+    shape = labels.shape
+    flat = labels.reshape(-1)
+    npix = flat.size
+    order = np.argsort(flat, kind="stable")
+    ordered = flat[order]
+
+    fracs = np.full((npix, nm + 1), np.nan, dtype=np.float32)
+    model = np.full((npix, nb + 1), np.nan, dtype=np.float32)
+    res = np.full((npix, nb + 1), np.nan, dtype=np.float32)
+    report: Optional[AccuracyReport] = None
+
+    for cid, cols in columns.items():
+        start = np.searchsorted(ordered, cid, side="left")
+        stop = np.searchsorted(ordered, cid, side="right")
+        if start == stop:
+            continue
+        idx = order[start:stop]
+        block = d[np.unravel_index(idx, shape)][:, None, :]
+        factor = None if factors is None else factors.get(cid)
+        unmixed = solve(MixedCube(G[:, cols], block), factor)
+
+        fracs[idx] = 0
+        fracs[idx[:, None], np.append(cols, nm)] = unmixed.fracs[:, 0]
+        model[idx] = unmixed.model[:, 0]
+        res[idx] = unmixed.res[:, 0]
+        if unmixed.accuracy is not None:
+            report = (
+                unmixed.accuracy
+                if report is None
+                else report.merge(unmixed.accuracy)
+            )
+
+    return UnMixedCube(
+        model.reshape(*shape, nb + 1),
+        fracs.reshape(*shape, nm + 1),
+        res.reshape(*shape, nb + 1),
+        accuracy=report,
+    )
@@ -0,0 +1,378 @@
+"""
+Model Comparison
+
+Compares several model results stored in one file without loading their
+cubes. `rsquared` and the fractions of shared endmembers are streamed tile by
+tile, and the comparison is written back to the file as a derived group:
+
+- `best_model`: index (into `models`) of the model with the lowest RMS
+  residual at each pixel, -1 where no model has a finite RMS.
+- `best_rsquared`: that lowest RMS residual.
+- `rsquared`: the RMS residual of every model, stacked on the last axis.
+- `fraction_diff/<model>`: fractions of `<model>` minus those of the
+  reference model, for the endmembers the two share by name.
+
+Summary statistics (share of pixels each model wins, mean and maximum RMS,
+mean absolute, RMS and maximum absolute fraction differences) are kept as
+attributes. MixView shows comparison groups in its Model Comparison dock.
+
+Usage::
+
+    comp = compare_models("results.hdf5", ["m1", "m2", "m3"])
+    print(comp.summary.win_fraction)
+"""
+
+# Standard Libraries
+from dataclasses import dataclass
+from typing import Optional
+
+# Dependencies
+import numpy as np
+import numpy.typing as npt
+import h5py as h5  # type: ignore
+
+# Relative Imports
+from .typing import PathLike
+from .io import LazyDataset, _read_roi, _write_roi
+from .roi import ROI
+from .storage import chunk_shape, read_decoded
+from .tiling import plan_tiles
+
+KIND = "comparison"
+NO_MODEL = -1
+
+
+@dataclass
+class ComparisonSummary:
+    """
+    Attributes
+    ----------
+    n_pixels: int
+        Pixels where at least one model has a finite RMS residual.
+    win_fraction: NDArray[(1,)]
+        Share of those pixels where each model fits best.
+    mean_rsquared: NDArray[(1,)]
+        Mean RMS residual of each model over its finite pixels.
+    max_rsquared: NDArray[(1,)]
+        Maximum RMS residual of each model.
+    fraction_diff_mean_abs: dict[str, NDArray[(1,)]]
+        Per model, mean absolute fraction difference to the reference for
+        each shared endmember.
+    fraction_diff_rms: dict[str, NDArray[(1,)]]
+        Per model, RMS fraction difference to the reference.
+    fraction_diff_max_abs: dict[str, NDArray[(1,)]]
+        Per model, maximum absolute fraction difference to the reference.
+    """
+
+    n_pixels: int
+    win_fraction: npt.NDArray
+    mean_rsquared: npt.NDArray
+    max_rsquared: npt.NDArray
+    fraction_diff_mean_abs: dict[str, npt.NDArray]
+    fraction_diff_rms: dict[str, npt.NDArray]
+    fraction_diff_max_abs: dict[str, npt.NDArray]
+
+
+@dataclass
+class ModelComparison:
+    """
+    Attributes
+    ----------
+    savefile: PathLike
+        File holding the compared models and the comparison group.
+    name: str
+        Name of the comparison group.
+    models: list[str]
+        Compared model groups, in the order `best_model` indexes them.
+    reference: str
+        Model the fraction differences are taken against.
+    wavelengths: NDArray[(1,)]
+        Wavelengths of the compared models.
+    best_model: NDArray or LazyDataset
+        Index of the best-fitting model per pixel, -1 for none.
+    best_rsquared: NDArray or LazyDataset
+        RMS residual of the best-fitting model.
+    rsquared: NDArray or LazyDataset
+        RMS residual of every model, stacked on the last axis.
+    fraction_diffs: dict[str, tuple[list[str], NDArray or LazyDataset]]
+        Per non-reference model, the shared endmember names and the
+        fraction differences (model - reference).
+    summary: ComparisonSummary
+        Summary statistics.
+    roi: ROI, optional
+        Region of interest shared by the compared models.
+    """
+
+    savefile: PathLike
+    name: str
+    models: list[str]
+    reference: str
+    wavelengths: npt.NDArray
+    best_model: npt.NDArray | LazyDataset
+    best_rsquared: npt.NDArray | LazyDataset
+    rsquared: npt.NDArray | LazyDataset
+    fraction_diffs: dict[str, tuple[list[str], npt.NDArray | LazyDataset]]
+    summary: ComparisonSummary
+    roi: Optional[ROI] = None
+
+
+def is_comparison(p: PathLike, name: str) -> bool:
+    """Whether group `name` of file `p` is a model comparison."""
+    with h5.File(p, "r") as f:
+        g = f.get(name)
+        return g is not None and g.attrs.get("kind") == KIND
+
+
+def _endmember_names(g: h5.Group) -> list[str]:
+    items = sorted(
+        g["endmembers"].items(),  # type: ignore
+        key=lambda x: int(x[1].attrs["index"]),
+    )
+    return [n for n, _ in items]
+
+
+def _check_compatible(groups: dict[str, h5.Group]) -> None:
+    shapes = {m: g["rsquared"].shape for m, g in groups.items()}
+    if len(set(shapes.values())) != 1:
+        raise ValueError(f"Models cover different pixels: {shapes}.")
+    rois = {m: _read_roi(g) for m, g in groups.items()}
+    first = next(iter(rois.values()))
+    for m, roi in rois.items():
+        same = (roi is None and first is None) or (
+            roi is not None
+            and first is not None
+            and roi.window == first.window
+            and (
+                (roi.coords is None and first.coords is None)
+                or (
+                    roi.coords is not None
+                    and first.coords is not None
+                    and np.array_equal(roi.coords, first.coords)
+                )
+            )
+        )
+        if not same:
+            raise ValueError(f"Model {m} has a different region of interest.")
+
+
+def compare_models(
+    p: PathLike,
+    models: list[str],
+    name: str = "comparison",
+    reference: Optional[str] = None,
+    tile_rows: int = 256,
+) -> ModelComparison:
+    """
+    Compares model results stored in `p` and writes the comparison to group
+    `name` of the same file, replacing an existing group of that name.
+
+    Parameters
+    ----------
+    p: PathLike
+        HDF5 result file.
+    models: list[str]
+        Model groups to compare. They must cover the same pixels.
+    name: str, default="comparison"
+        Name of the derived comparison group.
+    reference: str, optional
+        Model that fraction differences are taken against. Defaults to the
+        first model.
+    tile_rows: int, default=256
+        Rows (pixels, for sparse results) read per tile. Memory use is
+        bounded by one tile of every model's RMS plus the fractions of two
+        models.
+
+    Returns
+    -------
+    ModelComparison
+        The comparison, loaded lazily.
+    """
+    if len(models) < 2:
+        raise ValueError("At least two models are needed for a comparison.")
+    if reference is None:
+        reference = models[0]
+    if reference not in models:
+        raise ValueError(f"Reference {reference} is not one of the models.")
+    if name in models:
+        raise ValueError(f"{name} is one of the compared models.")
+
+    with h5.File(p, "r+") as f:
+        groups = {m: f[m] for m in models}
+        _check_compatible(groups)  # type: ignore
+        pixel_shape = tuple(groups[models[0]]["rsquared"].shape)
+        n_models = len(models)
+
+        ref_names = _endmember_names(groups[reference])  # type: ignore
+        shared: dict[str, tuple[list[str], list[int], list[int]]] = {}
+        for m in models:
+            if m == reference:
+                continue
+            names = _endmember_names(groups[m])  # type: ignore
+            common = [n for n in names if n in ref_names]
+            shared[m] = (
+                common,
+                [names.index(n) for n in common],
+                [ref_names.index(n) for n in common],
+            )
+
+        if name in f:
+            del f[name]
+        out = f.create_group(name)
+        out.attrs["kind"] = KIND
+        out.attrs["models"] = models
+        out.attrs["reference"] = reference
+        out.attrs["wavelengths"] = groups[models[0]].attrs["wavelengths"]
+        _write_roi(out, _read_roi(groups[models[0]]))  # type: ignore
+
+        def _create(g, dname, shape, dtype, fill):
+            return g.create_dataset(
+                dname,
+                shape=shape,
+                dtype=dtype,
+                fillvalue=fill,
+                chunks=chunk_shape(shape, np.dtype(dtype).itemsize),
+            )
+
+        best_ds = _create(out, "best_model", pixel_shape, np.int16, NO_MODEL)
+        best_rsq_ds = _create(
+            out, "best_rsquared", pixel_shape, np.float32, np.nan
+        )
+        rsq_ds = _create(
+            out, "rsquared", (*pixel_shape, n_models), np.float32, np.nan
+        )
+        diff_ds = {}
+        if len(shared) > 0:
+            dg = out.create_group("fraction_diff")
+            for m, (common, _, _) in shared.items():
+                diff_ds[m] = _create(
+                    dg, m, (*pixel_shape, len(common)), np.float32, np.nan
+                )
+                diff_ds[m].attrs["endmembers"] = common
+
+        wins = np.zeros(n_models, dtype=np.int64)
+        rsq_sum = np.zeros(n_models)
+        rsq_count = np.zeros(n_models, dtype=np.int64)
+        rsq_max = np.full(n_models, -np.inf)
+        diff_abs = {m: np.zeros(len(s[0])) for m, s in shared.items()}
+        diff_sq = {m: np.zeros(len(s[0])) for m, s in shared.items()}
+        diff_max = {m: np.zeros(len(s[0])) for m, s in shared.items()}
+        diff_count = {m: np.zeros(len(s[0])) for m, s in shared.items()}
+        n_valid = 0
+
+        for tile in plan_tiles(pixel_shape[0], tile_rows):
+            rows = slice(tile.start, tile.stop)
+            rsq = np.stack(
+                [read_decoded(groups[m]["rsquared"], rows) for m in models],
+                axis=-1,
+            ).astype(np.float32)
+            finite = np.isfinite(rsq)
+            valid = finite.any(axis=-1)
+            best = np.argmin(np.where(finite, rsq, np.inf), axis=-1)
+            best_rsq = np.take_along_axis(rsq, best[..., None], -1)[..., 0]
+            best = np.where(valid, best, NO_MODEL).astype(np.int16)
+            best_rsq[~valid] = np.nan
+
+            rsq_ds[rows] = rsq
+            best_ds[rows] = best
+            best_rsq_ds[rows] = best_rsq
+
+            n_valid += int(valid.sum())
+            wins += np.bincount(best[valid], minlength=n_models)
+            rsq_sum += np.where(finite, rsq, 0).reshape(-1, n_models).sum(0)
+            rsq_count += finite.reshape(-1, n_models).sum(0)
+            rsq_max = np.fmax(
+                rsq_max,
+                np.where(finite, rsq, -np.inf).reshape(-1, n_models).max(0),
+            )
+
+            if len(shared) == 0:
+                continue
+            ref_fracs = read_decoded(groups[reference]["fractions"], rows)
+            for m, (common, idx, ref_idx) in shared.items():
+                fracs = read_decoded(groups[m]["fractions"], rows)
+                diff = fracs[..., idx] - ref_fracs[..., ref_idx]
+                diff_ds[m][rows] = diff
+                flat = diff.reshape(-1, len(common)).astype(np.float64)
+                ok = np.isfinite(flat)
+                flat = np.where(ok, flat, 0)
+                diff_abs[m] += np.abs(flat).sum(0)
+                diff_sq[m] += (flat**2).sum(0)
+                diff_max[m] = np.fmax(diff_max[m], np.abs(flat).max(0))
+                diff_count[m] += ok.sum(0)
+
+        out.attrs["n_pixels"] = n_valid
+        out.attrs["win_fraction"] = wins / max(n_valid, 1)
+        out.attrs["mean_rsquared"] = rsq_sum / np.maximum(rsq_count, 1)
+        out.attrs["max_rsquared"] = np.where(
+            rsq_count > 0, rsq_max, np.nan
+        )
+        for m in shared:
+            count = np.maximum(diff_count[m], 1)
+            diff_ds[m].attrs["mean_abs"] = diff_abs[m] / count
+            diff_ds[m].attrs["rms"] = np.sqrt(diff_sq[m] / count)
+            diff_ds[m].attrs["max_abs"] = diff_max[m]
+
+    return load_comparison(p, name, lazy=True)
+
+
+def load_comparison(
+    p: PathLike,
+    name: str = "comparison",
+    densify: bool = False,
+    lazy: bool = False,
+) -> ModelComparison:
+    """
+    Loads a comparison written by `compare_models`. As in
+    `load_model_result`, `densify` places the maps of a sparse region into
+    its window (`best_model` then marks missing pixels with NaN), and `lazy`
+    returns the maps as `LazyDataset` views.
+    """
+    with h5.File(p, "r") as f:
+        g = f[name]
+        if g.attrs.get("kind") != KIND:
+            raise ValueError(f"{name} is not a model comparison group.")
+        roi = _read_roi(g)  # type: ignore
+        scatter = densify and roi is not None and roi.is_sparse
+
+        def _get(dname: str):
+            if lazy and not scatter:
+                return LazyDataset(p, f"{name}/{dname}")
+            data = g[dname][...]  # type: ignore
+            if scatter:
+                assert roi is not None
+                if dname == "best_model":
+                    data = np.where(data == NO_MODEL, np.nan, data)
+                data = roi.scatter(data)
+            return data
+
+        fraction_diffs = {}
+        mean_abs, rms, max_abs = {}, {}, {}
+        for m, d in g.get("fraction_diff", {}).items():  # type: ignore
+            names = [str(n) for n in d.attrs["endmembers"]]
+            fraction_diffs[m] = (names, _get(f"fraction_diff/{m}"))
+            mean_abs[m] = d.attrs["mean_abs"]
+            rms[m] = d.attrs["rms"]
+            max_abs[m] = d.attrs["max_abs"]
+
+        summary = ComparisonSummary(
+            int(g.attrs["n_pixels"]),  # type: ignore
+            g.attrs["win_fraction"],  # type: ignore
+            g.attrs["mean_rsquared"],  # type: ignore
+            g.attrs["max_rsquared"],  # type: ignore
+            mean_abs,
+            rms,
+            max_abs,
+        )
+        return ModelComparison(
+            p,
+            name,
+            [str(m) for m in g.attrs["models"]],  # type: ignore
+            str(g.attrs["reference"]),
+            g.attrs["wavelengths"],  # type: ignore
+            _get("best_model"),
+            _get("best_rsquared"),
+            _get("rsquared"),
+            fraction_diffs,
+            summary,
+            roi=roi,
+        )
@@ -1,6 +1,6 @@
 # Standard Libraries
 from dataclasses import dataclass
-from typing import Tuple
+from typing import Iterator, Tuple, Optional
 
 # Dependencies
 import numpy as np
@@ -27,17 +27,57 @@ class ExternalEndMember(EndMember):
 
 class EndMemberGroup:
     def __init__(self, endmember_list: list[EndMember]):
-        self.endmember_list = endmember_list
+        self._endmember_list: Optional[list[EndMember]] = endmember_list
         self.endmember_array = np.empty(
             (len(endmember_list[0].spectrum.data), len(endmember_list)),
             dtype=np.float32,
         )
         self.endmember_name_list: list[str] = []
+        self.wvl = endmember_list[0].spectrum.wvl
 
         for n, i in enumerate(endmember_list):
             self.endmember_array[:, n] = i.spectrum.data
             self.endmember_name_list.append(i.name)
 
+    @classmethod
+    def from_array(
+        cls, names: list[str], arr: np.ndarray, wvl: np.ndarray
+    ) -> "EndMemberGroup":
+        """
+        Builds a group directly from a (bands x endmembers) array without
+        creating per-spectrum `EndMember` objects.
+        """
+        grp = cls.__new__(cls)
+        grp._endmember_list = None
+        grp.endmember_array = np.ascontiguousarray(arr, dtype=np.float32)
+        grp.endmember_name_list = list(names)
+        grp.wvl = wvl
+        return grp
+
+    @property
+    def endmember_list(self) -> list[EndMember]:
+        if self._endmember_list is None:
+            self._endmember_list = [
+                EndMember(name, Spectrum(self.endmember_array[:, n], self.wvl))
+                for n, name in enumerate(self.endmember_name_list)
+            ]
+        return self._endmember_list
+
+    def append(self, endmember: EndMember) -> None:
+        """Adds an endmember sampled on the group's wavelengths."""
+        self.endmember_array = np.column_stack(
+            [
+                self.endmember_array,
+                np.asarray(endmember.spectrum.data, dtype=np.float32),
+            ]
+        )
+        self.endmember_name_list.append(endmember.name)
+        if self._endmember_list is not None:
+            self._endmember_list.append(endmember)
+
+    def __iter__(self) -> Iterator[EndMember]:
+        return iter(self.endmember_list)
+
     def __len__(self):
         return len(self.endmember_name_list)
 
@@ -0,0 +1,360 @@
+"""
+Automated Endmember Extraction
+
+Vectorized implementations of common geometric endmember extraction
+algorithms that run over a whole `ImageCube` and return
+`InSceneEndMember` objects ready to be passed to `MixtureModel`.
+
+Every algorithm works in a low-dimensional subspace fit on a random pixel
+sample, and N-FINDR restricts its volume search to the extreme pixels found
+along random projections (skewers), so extraction scales to
+multi-million-pixel scenes.
+
+Available Functions::
+
+    ems = vca(cube, 4)
+    ems = nfindr(cube, 4)
+    ems = ppi(cube, 4)
+
+    model = MixtureModel(ems, cube)
+"""
+
+# Standard Libraries
+from typing import Optional
+
+# Dependencies
+import numpy as np
+import numpy.typing as npt
+
+# Relative Imports
+from .typing import ImageCube, Spectrum
+from .endmember import InSceneEndMember, EndMember
+
+
+def _pixel_matrix(
+    cube: ImageCube,
+) -> tuple[npt.NDArray, npt.NDArray[np.intp]]:
+    """
+    Returns the cube as a (pixels x bands) matrix along with the flat indices
+    of the pixels that are finite in every band.
+    """
+    X = cube.data.reshape(-1, cube.data.shape[-1])
+    valid = np.flatnonzero(np.isfinite(X).all(axis=1))
+    return X, valid
+
+
+def _fit_subspace(
+    X: npt.NDArray,
+    valid: npt.NDArray[np.intp],
+    n_components: int,
+    max_samples: int,
+    rng: np.random.Generator,
+    center: bool = True,
+) -> tuple[npt.NDArray[np.float32], npt.NDArray[np.float32]]:
+    """
+    Fits a PCA subspace on a random sample of pixels. With `center=False`
+    the uncentered signal subspace is fit instead.
+
+    Returns
+    -------
+    mean: NDArray[np.float32, (1,)]
+        Mean spectrum of the sample, or zeros if `center` is False.
+    V: NDArray[np.float32, (2,)]
+        (bands x n_components) matrix of principal directions.
+    """
+    if valid.size > max_samples:
+        sample = rng.choice(valid, size=max_samples, replace=False)
+    else:
+        sample = valid
+    Xs = X[np.sort(sample)].astype(np.float32)
+    if center:
+        mean = Xs.mean(axis=0)
+    else:
+        mean = np.zeros(Xs.shape[1], dtype=np.float32)
+    _, _, Vt = np.linalg.svd(Xs - mean, full_matrices=False)
+    return mean, Vt[:n_components].T.copy()
+
+
+def _project(
+    X: npt.NDArray,
+    valid: npt.NDArray[np.intp],
+    mean: npt.NDArray[np.float32],
+    V: npt.NDArray[np.float32],
+    chunk_size: int,
+) -> npt.NDArray[np.float32]:
+    """Projects the valid pixels into the subspace, one chunk at a time."""
+    Y = np.empty((valid.size, V.shape[1]), dtype=np.float32)
+    rows = max(1, chunk_size // X.shape[1])
+    for start in range(0, valid.size, rows):
+        idx = valid[start : start + rows]
+        Y[start : start + idx.size] = (X[idx] - mean) @ V
+    return Y
+
+
+def _extreme_pixels(
+    Y: npt.NDArray[np.float32],
+    n_skewers: int,
+    max_samples: int,
+    chunk_size: int,
+    rng: np.random.Generator,
+) -> npt.NDArray[np.intp]:
+    """
+    Projects every pixel onto random unit vectors (skewers) and returns, for
+    each skewer, the rows of `Y` with the minimum and maximum projection as a
+    (2 x n_skewers) array. `chunk_size` bounds the number of elements of
+    the (pixels x n_skewers) projection held at once.
+
+    The skewers are first applied to a random sample of pixels. No pixel
+    whose norm is below the smallest extreme projection of that sample can be
+    an extreme of any skewer, so those pixels are dropped before the full
+    projection, which leaves only the outer shell of the point cloud.
+    """
+    skewers = rng.standard_normal((Y.shape[1], n_skewers)).astype(np.float32)
+    skewers /= np.linalg.norm(skewers, axis=0)
+
+    if Y.shape[0] > max_samples:
+        sample = rng.choice(Y.shape[0], size=max_samples, replace=False)
+    else:
+        sample = np.arange(Y.shape[0])
+    proj = Y[sample] @ skewers
+    radius = min(proj.max(axis=0).min(), -proj.min(axis=0).max())
+    if radius > 0:
+        shell = np.flatnonzero(np.einsum("ij,ij->i", Y, Y) >= radius**2)
+    else:
+        shell = np.arange(Y.shape[0])
+    Ys = Y[shell]
+
+    best_max = np.full(n_skewers, -np.inf, dtype=np.float32)
+    best_min = np.full(n_skewers, np.inf, dtype=np.float32)
+    arg_max = np.zeros(n_skewers, dtype=np.intp)
+    arg_min = np.zeros(n_skewers, dtype=np.intp)
+    skewer_idx = np.arange(n_skewers)
+    skewers_t = np.ascontiguousarray(skewers.T)
+    rows = max(1, chunk_size // n_skewers)
+    for start in range(0, Ys.shape[0], rows):
+        # (n_skewers x rows) so the reductions run over contiguous memory.
+        proj = skewers_t @ Ys[start : start + rows].T
+
+        local_max = np.argmax(proj, axis=1)
+        vals = proj[skewer_idx, local_max]
+        better = vals > best_max
+        best_max[better] = vals[better]
+        arg_max[better] = local_max[better] + start
+
+        local_min = np.argmin(proj, axis=1)
+        vals = proj[skewer_idx, local_min]
+        better = vals < best_min
+        best_min[better] = vals[better]
+        arg_min[better] = local_min[better] + start
+
+    return shell[np.vstack((arg_min, arg_max))]
+
+
+def _to_endmembers(
+    cube: ImageCube, flat_idx: npt.NDArray[np.intp], prefix: str
+) -> list[EndMember]:
+    ncols = cube.data.shape[1]
+    em_list: list[EndMember] = []
+    for n, i in enumerate(flat_idx):
+        row, col = divmod(int(i), ncols)
+        em_list.append(
+            InSceneEndMember(
+                f"{prefix}_{n + 1}",
+                Spectrum(cube.data[row, col, :].copy(), cube.wvl),
+                (row, col),
+            )
+        )
+    return em_list
+
+
+def ppi(
+    cube: ImageCube,
+    n_endmembers: int,
+    n_skewers: int = 1000,
+    n_components: int = 10,
+    max_samples: int = 50_000,
+    chunk_size: int = 4_194_304,
+    seed: Optional[int] = None,
+) -> list[EndMember]:
+    """
+    Pixel Purity Index endmember extraction.
+
+    Every pixel is projected onto `n_skewers` random directions in a PCA
+    subspace and the pixels that are most often an extreme of a projection
+    are returned.
+
+    Parameters
+    ----------
+    cube: ImageCube
+        Spectral data cube.
+    n_endmembers: int
+        Number of endmembers to extract.
+    n_skewers: int, default=1000
+        Number of random projection directions.
+    n_components: int, default=10
+        Dimension of the PCA subspace the skewers live in.
+    max_samples: int, default=50_000
+        Number of randomly sampled pixels used to fit the PCA subspace.
+    chunk_size: int, default=4_194_304
+        Number of array elements processed at once. Bounds the memory used.
+    seed: int, optional
+        Seed for the random number generator.
+
+    Returns
+    -------
+    endmembers: list[EndMember]
+        `InSceneEndMember` objects whose `coord` is the (row, column) of the
+        selected pixel.
+    """
+    rng = np.random.default_rng(seed)
+    X, valid = _pixel_matrix(cube)
+    n_components = min(n_components, X.shape[1])
+    mean, V = _fit_subspace(X, valid, n_components, max_samples, rng)
+    Y = _project(X, valid, mean, V, chunk_size)
+
+    extremes = _extreme_pixels(Y, n_skewers, max_samples, chunk_size, rng)
+    counts = np.bincount(extremes.ravel(), minlength=Y.shape[0])
+    order = np.argsort(counts)[::-1][:n_endmembers]
+
+    return _to_endmembers(cube, valid[order], "PPI")
+
+
+def nfindr(
+    cube: ImageCube,
+    n_endmembers: int,
+    n_skewers: int = 2000,
+    max_iter: int = 10,
+    max_samples: int = 50_000,
+    chunk_size: int = 4_194_304,
+    seed: Optional[int] = None,
+) -> list[EndMember]:
+    """
+    N-FINDR endmember extraction.
+
+    Finds the set of pixels spanning the largest simplex volume in the
+    (n_endmembers - 1)-dimensional PCA subspace. The search is restricted to
+    the pixels that are extreme along random projections, since the vertices
+    of the largest simplex always are, and each replacement sweep is
+    evaluated for every candidate at once using cofactor expansion of the
+    volume determinant.
+
+    Parameters
+    ----------
+    cube: ImageCube
+        Spectral data cube.
+    n_endmembers: int
+        Number of endmembers to extract.
+    n_skewers: int, default=2000
+        Number of random projections used to find candidate pixels.
+    max_iter: int, default=10
+        Maximum number of full replacement sweeps.
+    max_samples: int, default=50_000
+        Number of randomly sampled pixels used to fit the PCA subspace.
+    chunk_size: int, default=4_194_304
+        Number of array elements processed at once. Bounds the memory used.
+    seed: int, optional
+        Seed for the random number generator.
+
+    Returns
+    -------
+    endmembers: list[EndMember]
+        `InSceneEndMember` objects whose `coord` is the (row, column) of the
+        selected pixel.
+    """
+    rng = np.random.default_rng(seed)
+    X, valid = _pixel_matrix(cube)
+    mean, V = _fit_subspace(X, valid, n_endmembers - 1, max_samples, rng)
+    Y = _project(X, valid, mean, V, chunk_size)
+
+    candidates = np.unique(
+        _extreme_pixels(Y, n_skewers, max_samples, chunk_size, rng)
+    )
+    if candidates.size < n_endmembers:
+        candidates = np.arange(Y.shape[0])
+    # Homogeneous coordinates: the simplex volume is |det(M)| / (p - 1)!
+    C = np.hstack(
+        (np.ones((candidates.size, 1)), Y[candidates].astype(np.float64))
+    )
+
+    selected = rng.choice(candidates.size, size=n_endmembers, replace=False)
+    M = C[selected].T
+    volume = abs(np.linalg.det(M))
+    for _ in range(max_iter):
+        changed = False
+        for j in range(n_endmembers):
+            # det(M with column j replaced by c) == cofactor_j . c
+            try:
+                cofactor = np.linalg.det(M) * np.linalg.inv(M)[j, :]
+            except np.linalg.LinAlgError:
+                cofactor = np.linalg.pinv(M)[j, :]
+            volumes = np.abs(C @ cofactor)
+            best = int(np.argmax(volumes))
+            if volumes[best] > volume * (1 + 1e-9):
+                selected[j] = best
+                M[:, j] = C[best]
+                volume = abs(np.linalg.det(M))
+                changed = True
+        if not changed:
+            break
+
+    return _to_endmembers(cube, valid[candidates[selected]], "NFINDR")
+
+
+def vca(
+    cube: ImageCube,
+    n_endmembers: int,
+    max_samples: int = 50_000,
+    chunk_size: int = 4_194_304,
+    seed: Optional[int] = None,
+) -> list[EndMember]:
+    """
+    Vertex Component Analysis endmember extraction.
+
+    Pixels are projected into an n_endmembers-dimensional subspace and
+    rescaled onto the projective hyperplane. Endmembers are then found one at
+    a time as the pixel with the largest projection onto a random direction
+    orthogonal to the endmembers found so far.
+
+    Parameters
+    ----------
+    cube: ImageCube
+        Spectral data cube.
+    n_endmembers: int
+        Number of endmembers to extract.
+    max_samples: int, default=50_000
+        Number of randomly sampled pixels used to fit the signal subspace.
+    chunk_size: int, default=4_194_304
+        Number of array elements processed at once. Bounds the memory used.
+    seed: int, optional
+        Seed for the random number generator.
+
+    Returns
+    -------
+    endmembers: list[EndMember]
+        `InSceneEndMember` objects whose `coord` is the (row, column) of the
+        selected pixel.
+    """
+    rng = np.random.default_rng(seed)
+    X, valid = _pixel_matrix(cube)
+    zero, V = _fit_subspace(
+        X, valid, n_endmembers, max_samples, rng, center=False
+    )
+    Y = _project(X, valid, zero, V, chunk_size)
+
+    u = Y.mean(axis=0)
+    scale = Y @ u
+    scale[scale == 0] = np.finfo(np.float32).eps
+    Y /= scale[:, None]
+
+    A = np.zeros((n_endmembers, n_endmembers), dtype=np.float64)
+    A[-1, 0] = 1
+    selected = np.zeros(n_endmembers, dtype=np.intp)
+    for i in range(n_endmembers):
+        w = rng.standard_normal(n_endmembers)
+        f = w - A @ np.linalg.pinv(A) @ w
+        f /= np.linalg.norm(f)
+        v = np.abs(Y @ f.astype(np.float32))
+        selected[i] = int(np.argmax(v))
+        A[:, i] = Y[selected[i]]
+
+    return _to_endmembers(cube, valid[selected], "VCA")
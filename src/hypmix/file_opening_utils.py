@@ -242,6 +242,8 @@ def open_rasterio_cube(path: Path, axis_map: dict[str, int]) -> np.ndarray:
     with rio.open(path, "r") as f:
         cube_array = f.read()
     transpose_order = (axis_order_obj.y, axis_order_obj.x, axis_order_obj.b)
+    # A view: the array keeps rasterio's band-sequential memory layout, which
+    # `ImageCube` records as its interleave.
     cube_array = np.transpose(cube_array, transpose_order)
     return cube_array
 
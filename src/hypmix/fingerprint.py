@@ -0,0 +1,124 @@
+"""
+Result Fingerprints
+
+Content fingerprints that identify the inputs of a model run, so that a
+result already stored in the destination file can be reused instead of
+recomputed.
+"""
+
+# Standard Libraries
+import hashlib
+from pathlib import Path
+from typing import Optional
+
+# Dependencies
+import numpy as np
+import numpy.typing as npt
+
+# Relative Imports
+from .typing import ImageCube
+from .reduction import SpectralSubspace
+from .roi import ROI
+from .sparse_unmixing import SUnSALOptions
+from .robust_unmixing import RobustOptions
+from .model_math import PrecisionPolicy
+from .class_unmixing import EndmemberClasses
+
+
+# Pixel spectra of the identity sample read and hashed at a time.
+SAMPLE_CHUNK = 1024
+
+
+def cube_identity(cube: ImageCube, n_samples: int = 65_536) -> str:
+    """
+    Identity of the source data cube.
+
+    If the cube records the file it was read from, its resolved path, size
+    and modification time are used. Otherwise the shape, dtype and a
+    deterministic, evenly strided sample of `n_samples` pixel spectra are
+    hashed, which avoids hashing the full cube.
+    """
+    if cube.source is not None:
+        p = Path(cube.source).resolve()
+        st = p.stat()
+        return f"path:{p}:{st.st_size}:{st.st_mtime_ns}"
+
+    nrows, ncols, _ = cube.data.shape
+    idx = np.unique(
+        np.linspace(0, nrows * ncols - 1, min(n_samples, nrows * ncols))
+        .round()
+        .astype(np.intp)
+    )
+    rows, cols = np.divmod(idx, ncols)
+    h = hashlib.sha256()
+    h.update(str((cube.data.shape, cube.data.dtype.str)).encode())
+    # Hashed in chunks, so only one chunk of the sample is held at a time.
+    for i in range(0, len(idx), SAMPLE_CHUNK):
+        chunk = slice(i, i + SAMPLE_CHUNK)
+        h.update(np.ascontiguousarray(cube.data[rows[chunk], cols[chunk]]))
+    return f"sample:{h.hexdigest()}"
+
+
+def identity_bytes(cube: ImageCube, n_samples: int = 65_536) -> int:
+    """
+    Peak memory of `cube_identity`: the pixel indices of the sample and
+    one chunk of sampled spectra with its copy.
+    """
+    if cube.source is not None:
+        return 0
+    nrows, ncols, nb = cube.data.shape
+    n = min(n_samples, nrows * ncols)
+    return 6 * n * np.dtype(np.intp).itemsize + 2 * SAMPLE_CHUNK * nb * (
+        cube.data.dtype.itemsize
+    )
+
+
+def model_fingerprint(
+    G: npt.NDArray,
+    endmember_names: list[str],
+    cube: ImageCube,
+    add_to_one: bool = True,
+    subspace: Optional[SpectralSubspace] = None,
+    roi: Optional[ROI] = None,
+    sparse: Optional[SUnSALOptions] = None,
+    robust: Optional[RobustOptions] = None,
+    precision: Optional[PrecisionPolicy] = None,
+    classes: Optional[EndmemberClasses] = None,
+) -> str:
+    """
+    SHA-256 fingerprint of everything that determines a model result: the
+    endmember matrix and names, wavelengths, constraint mode, sparse and
+    robust solver options, float64 refinement, class map and endmember
+    sets, reduction subspace, region of interest and the identity of the
+    source cube.
+    """
+    h = hashlib.sha256()
+
+    def _add(label: str, value: bytes):
+        h.update(label.encode())
+        h.update(len(value).to_bytes(8, "little"))
+        h.update(value)
+
+    _add("G", np.ascontiguousarray(G, dtype=np.float32).tobytes())
+    _add("names", "\x1f".join(endmember_names).encode())
+    _add("wvl", np.ascontiguousarray(cube.wvl, dtype=np.float64).tobytes())
+    _add("add_to_one", str(add_to_one).encode())
+    if sparse is not None:
+        _add("sparse", repr(sparse).encode())
+    if robust is not None:
+        _add("robust", repr(robust).encode())
+    if precision is not None and precision.refine:
+        # Block and sample sizes do not change the result.
+        _add("refine", b"1")
+    if classes is not None:
+        _add("class_map", np.ascontiguousarray(classes.class_map).tobytes())
+        sets = sorted((int(k), sorted(v)) for k, v in classes.sets.items())
+        _add("class_sets", repr(sets).encode())
+    if subspace is not None:
+        _add("basis", np.ascontiguousarray(subspace.basis).tobytes())
+    if roi is not None:
+        _add("roi_window", str(roi.window).encode())
+        if roi.coords is not None:
+            _add("roi_coords", np.ascontiguousarray(roi.coords).tobytes())
+    _add("cube", cube_identity(cube).encode())
+    return h.hexdigest()
@@ -0,0 +1,229 @@
+"""
+Hapke Single-Scattering Albedo
+
+Converts bidirectional reflectance to single-scattering albedo (SSA) and
+back with the isotropic multiple-scattering approximation of Hapke, so that
+intimate mixtures can be unmixed linearly in SSA space. The reflectance
+factor of a particulate surface with SSA w is
+
+    REFF = w / (4 (mu0 + mu)) [(1 + B(g)) P(g) + H(mu0, w) H(mu, w) - 1]
+
+with mu0 and mu the cosines of the incidence and emission angles and H the
+approximation of Hapke (2002). REFF increases monotonically with w, so the
+inversion is tabulated once per viewing geometry: `ssa_table` holds w on
+evenly spaced reflectances, and a lookup is an index computation and one
+linear interpolation. Tables are cached by geometry, so converting a whole
+cube costs one interpolation pass.
+
+Usage::
+
+    lab = HapkeGeometry(incidence=30, emission=0, phase=30)
+    scene = HapkeGeometry(incidence=52.3, emission=4.1, phase=55.0)
+    ssa_cube = cube_to_ssa(cube, scene)
+    ssa_ems = endmembers_to_ssa(endmembers, lab)
+    model = MixtureModel(ssa_ems, ssa_cube)
+"""
+
+# Standard Libraries
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing_extensions import Annotated
+
+# Dependencies
+import numpy as np
+import numpy.typing as npt
+
+# Relative Imports
+from .typing import ImageCube, Spectrum
+from .endmember import EndMember
+
+CACHE_SIZE = 32
+TABLE_SIZE = 4096
+# Values converted per lookup block, bounding temporaries.
+BLOCK_SIZE = 1 << 20
+
+
+@dataclass(frozen=True)
+class HapkeGeometry:
+    """
+    Viewing geometry and fixed photometric terms of a Hapke conversion.
+
+    Attributes
+    ----------
+    incidence: float, default=30
+        Incidence angle i, in degrees.
+    emission: float, default=0
+        Emission angle e, in degrees.
+    phase: float, default=30
+        Phase angle g, in degrees. Only enters through `phase_function` and
+        `opposition`, which are given for this angle.
+    phase_function: float, default=1
+        Single-particle phase function P(g). 1 for isotropic scatterers.
+    opposition: float, default=0
+        Opposition surge B(g). Negligible at phase angles above ~15 degrees.
+    """
+
+    incidence: float = 30.0
+    emission: float = 0.0
+    phase: float = 30.0
+    phase_function: float = 1.0
+    opposition: float = 0.0
+
+    def __post_init__(self):
+        for name in ("incidence", "emission"):
+            angle = getattr(self, name)
+            if not 0 <= angle < 90:
+                raise ValueError(
+                    f"{name} must be in [0, 90) degrees, got {angle}."
+                )
+
+    @property
+    def mu0(self) -> float:
+        return float(np.cos(np.radians(self.incidence)))
+
+    @property
+    def mu(self) -> float:
+        return float(np.cos(np.radians(self.emission)))
+
+
+def _chandrasekhar_h(x: float, w: npt.NDArray) -> npt.NDArray:
+    """Hapke (2002) approximation of the H function."""
+    gamma = np.sqrt(1 - w)
+    r0 = (1 - gamma) / (1 + gamma)
+    log_term = np.log((1 + x) / x)
+    return 1 / (1 - w * x * (r0 + (1 - 2 * r0 * x) / 2 * log_term))
+
+
+def ssa_to_reflectance(
+    ssa: npt.ArrayLike, geometry: HapkeGeometry
+) -> npt.NDArray[np.float32]:
+    """Reflectance factor of surfaces with single-scattering albedo `ssa`."""
+    w = np.clip(np.asarray(ssa, dtype=np.float64), 0, 1)
+    mu0, mu = geometry.mu0, geometry.mu
+    single = (1 + geometry.opposition) * geometry.phase_function
+    multiple = _chandrasekhar_h(mu0, w) * _chandrasekhar_h(mu, w) - 1
+    return (w / (4 * (mu0 + mu)) * (single + multiple)).astype(np.float32)
+
+
+@dataclass
+class SSATable:
+    """
+    Single-scattering albedo tabulated on evenly spaced reflectance
+    factors, so a lookup is an index computation plus one linear
+    interpolation, with no search.
+
+    Attributes
+    ----------
+    step: float
+        Reflectance spacing of the nodes, which start at 0.
+    ssa: NDArray[np.float32, (1,)]
+        Single-scattering albedo at the nodes, from 0 to 1.
+    """
+
+    step: float
+    ssa: Annotated[npt.NDArray[np.float32], (1,)]
+
+    def __post_init__(self):
+        self._slope = np.diff(self.ssa, append=self.ssa[-1])
+
+    def apply(self, reflectance: npt.ArrayLike) -> npt.NDArray[np.float32]:
+        """
+        Single-scattering albedo of an array of reflectance factors.
+        Reflectances beyond the table saturate at w = 0 and w = 1, and NaN
+        stays NaN.
+        """
+        refl = np.asarray(reflectance, dtype=np.float32)
+        out = np.empty(refl.shape, dtype=np.float32)
+        flat_in = refl.reshape(-1)
+        flat_out = out.reshape(-1)
+        last = len(self.ssa) - 1
+        for start in range(0, flat_in.size, BLOCK_SIZE):
+            block = slice(start, start + BLOCK_SIZE)
+            pos = flat_in[block] * np.float32(1 / self.step)
+            np.clip(pos, 0, last, out=pos)
+            i = np.nan_to_num(pos, nan=0).astype(np.intp)
+            pos -= i
+            flat_out[block] = self.ssa[i] + pos * self._slope[i]
+        return out
+
+
+_TABLE_CACHE: OrderedDict[tuple, SSATable] = OrderedDict()
+_TABLE_LOCK = threading.Lock()
+
+
+def ssa_table(
+    geometry: HapkeGeometry, n_nodes: int = TABLE_SIZE
+) -> SSATable:
+    """
+    Inversion table for `geometry`, cached by geometry and `n_nodes`.
+
+    REFF(w) is first sampled densely at w = 1 - (1 - u)^2 for uniform u,
+    following its steepening towards w = 1, and then inverted onto
+    `n_nodes` evenly spaced reflectances. Near w = 1, w is close to
+    quadratic in REFF, so the even spacing loses no accuracy there.
+    """
+    key = (geometry, n_nodes)
+    with _TABLE_LOCK:
+        cached = _TABLE_CACHE.get(key)
+        if cached is not None:
+            _TABLE_CACHE.move_to_end(key)
+            return cached
+
+    u = np.linspace(0, 1, 16 * n_nodes)
+    w = 1 - (1 - u) ** 2
+    refl = ssa_to_reflectance(w, geometry).astype(np.float64)
+    nodes = np.linspace(0, refl[-1], n_nodes)
+    table = SSATable(
+        float(nodes[1]), np.interp(nodes, refl, w).astype(np.float32)
+    )
+
+    with _TABLE_LOCK:
+        _TABLE_CACHE[key] = table
+        if len(_TABLE_CACHE) > CACHE_SIZE:
+            _TABLE_CACHE.popitem(last=False)
+    return table
+
+
+def reflectance_to_ssa(
+    reflectance: npt.ArrayLike, geometry: HapkeGeometry
+) -> npt.NDArray[np.float32]:
+    """
+    Single-scattering albedo of an array of reflectance factors, through the
+    cached `ssa_table` of `geometry`.
+    """
+    return ssa_table(geometry).apply(reflectance)
+
+
+def cube_to_ssa(cube: ImageCube, geometry: HapkeGeometry) -> ImageCube:
+    """
+    Converts a reflectance cube to single-scattering albedo. The result
+    keeps the memory layout of `cube.data`. It does not record the source
+    file of `cube`: its values depend on `geometry`, so result fingerprints
+    must identify it by content.
+    """
+    table = ssa_table(geometry)
+    out = np.empty_like(cube.data, dtype=np.float32)
+    # Row blocks keep the temporaries of the lookup small.
+    rows = max(BLOCK_SIZE // max(out[0].size, 1), 1)
+    for start in range(0, out.shape[0], rows):
+        block = slice(start, start + rows)
+        out[block] = table.apply(cube.data[block])
+    return ImageCube(np.moveaxis(out, -1, 0), cube.wvl, bands_first=True)
+
+
+def endmembers_to_ssa(
+    endmembers: list[EndMember], geometry: HapkeGeometry
+) -> list[EndMember]:
+    """
+    Converts endmember reflectance spectra, measured under `geometry`, to
+    single-scattering albedo.
+    """
+    table = ssa_table(geometry)
+    return [
+        replace(
+            em,
+            spectrum=Spectrum(table.apply(em.spectrum.data), em.spectrum.wvl),
+        )
+        for em in endmembers
+    ]
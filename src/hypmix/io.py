@@ -1,19 +1,35 @@
 # Standard Libraries
+from __future__ import annotations
 from dataclasses import dataclass
 from pathlib import Path
 from enum import Enum
-from typing import Optional
+from typing import TYPE_CHECKING, Optional, Iterator, Any
 
 # Dependencies
-import rasterio as rio  # type: ignore
-from rasterio.crs import CRS  # type: ignore
+import numpy as np
 import numpy.typing as npt
 import h5py as h5  # type: ignore
 
 # Relative Imports
 from .typing import PathLike, Spectrum
 from .endmember import EndMemberGroup, EndMember
-from .model_math import UnMixedCube
+from .model_math import AccuracyReport, UnMixedCube
+from .class_unmixing import EndmemberClasses
+from .roi import ROI, PixelWindow
+from .tiling import Tile
+
+# rasterio (GDAL) is only needed for the GIS export and is imported there.
+if TYPE_CHECKING:
+    from rasterio.windows import Window  # type: ignore
+from .storage import (
+    StorageOptions,
+    band_major_name,
+    create_result_dataset,
+    decode,
+    read_decoded,
+    storage_id,
+    write_rows,
+)
 
 
 type GeotransformType = tuple[float, float, float, float, float, float]
@@ -24,6 +40,94 @@ class UnsupportedFileExtensionError(Exception):
         super().__init__(message)
 
 
+class LazyDataset:
+    """
+    Read-on-access view of an HDF5 dataset. The file is only opened while a
+    slice is read, so a lazy `ModelResult` holds no open file handles.
+
+    Parameters
+    ----------
+    path: PathLike
+        HDF5 file holding the dataset.
+    name: str
+        Full name of the dataset within the file.
+
+    Datasets stored with a codec (see `hypmix.storage`) are decoded to
+    float32 slice by slice. If the dataset has a band-major copy, reads of
+    more pixels than bands (such as a band image) are served from it.
+    """
+
+    def __init__(self, path: PathLike, name: str) -> None:
+        self.path = path
+        self.name = name
+        with h5.File(path, "r") as f:
+            dset = f[name]
+            shape = tuple(dset.shape)  # type: ignore
+            self.dtype = np.dtype(dset.dtype)  # type: ignore
+            self._attrs = dict(dset.attrs)  # type: ignore
+            self._band_major = band_major_name(f, name)
+        if "codec" in self._attrs:
+            self.dtype = np.dtype(np.float32)
+        self.shape: tuple[int, ...] = shape
+
+    @property
+    def ndim(self) -> int:
+        return len(self.shape)
+
+    def _normalize_key(self, key: Any) -> tuple:
+        if not isinstance(key, tuple):
+            key = (key,)
+        if any(k is Ellipsis for k in key):
+            i = next(n for n, k in enumerate(key) if k is Ellipsis)
+            fill = (slice(None),) * (self.ndim - len(key) + 1)
+            key = key[:i] + fill + key[i + 1 :]
+        key = key + (slice(None),) * (self.ndim - len(key))
+        out = []
+        for k, n in zip(key, self.shape):
+            if isinstance(k, slice):
+                out.append(slice(*k.indices(n)))
+            elif isinstance(k, (int, np.integer)):
+                if not -n <= k < n:
+                    raise IndexError(f"Index {k} out of range for size {n}.")
+                out.append(int(k) % n)
+            else:
+                out.append(k)
+        return tuple(out)
+
+    def __getitem__(self, key: Any) -> npt.NDArray:
+        key = self._normalize_key(key)
+        with h5.File(self.path, "r") as f:
+            if self._prefers_band_major(key):
+                bands = f[self._band_major]  # type: ignore
+                raw = bands[(key[-1], *key[:-1])]  # type: ignore
+                if isinstance(key[-1], slice):
+                    raw = np.moveaxis(raw, 0, -1)
+            else:
+                raw = f[self.name][key]  # type: ignore
+        return decode(raw, self._attrs)
+
+    def _prefers_band_major(self, key: tuple) -> bool:
+        if self._band_major is None or self.ndim != 3:
+            return False
+        counts = []
+        for k in key:
+            if isinstance(k, slice):
+                counts.append(len(range(k.start, k.stop, k.step)))
+            elif isinstance(k, int):
+                counts.append(1)
+            else:
+                return False
+        n_rows, n_cols, n_bands = counts
+        return n_rows * n_cols > n_bands
+
+    def __array__(self, dtype=None, copy=None) -> npt.NDArray:
+        arr = self[...]
+        return arr if dtype is None else arr.astype(dtype)
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+
 @dataclass
 class ModelResult:
     savefile: PathLike
@@ -31,6 +135,9 @@ class ModelResult:
     unmixed_image: UnMixedCube
     endmembers: EndMemberGroup
     rsquared: npt.NDArray
+    roi: Optional[ROI] = None
+    fingerprint: Optional[str] = None
+    classes: Optional[EndmemberClasses] = None
 
 
 class SaveMode(Enum):
@@ -39,7 +146,27 @@ class SaveMode(Enum):
     CSV = ".csv"
 
 
-def save_model_result(res: ModelResult):
+class GISFormat(Enum):
+    ENVI = ".bsq"
+    COG = ".tif"
+
+
+def save_model_result(
+    res: ModelResult, storage: Optional[StorageOptions] = None
+):
+    """
+    Saves a model result. HDF5 is the only supported format. Saving is
+    skipped if the file already holds the result (same fingerprint) written
+    with the same `storage`.
+
+    Parameters
+    ----------
+    res: ModelResult
+        Result to save to `res.savefile`.
+    storage: StorageOptions, optional
+        Codec for the result datasets (int16 scale/offset, float16 or the
+        HDF5 scale-offset filter). Defaults to float32.
+    """
     file_ext = Path(res.savefile).suffix
 
     try:
@@ -56,26 +183,49 @@ def save_model_result(res: ModelResult):
                 open_flag = "w"
 
             with h5.File(res.savefile, open_flag) as f:
-                try:
-                    g = f.create_group(res.modelID)
-                except ValueError:
+                if (
+                    res.fingerprint is not None
+                    and res.modelID in f
+                    and f[res.modelID].attrs.get("fingerprint")
+                    == res.fingerprint
+                    and f[res.modelID].attrs.get("complete", True)
+                    and f[res.modelID].attrs.get("storage_options")
+                    == storage_id(storage)
+                ):
+                    # Identical result is already stored, with the same
+                    # codec.
+                    return
+                # A lazy result reads from the group it replaces, so the new
+                # group is written under another name and swapped in after.
+                tmp = f"{res.modelID}.saving"
+                if tmp in f:
+                    del f[tmp]
+                g = f.create_group(tmp)
+
+                _write_endmembers(g, res.endmembers)
+                for name, arr in (
+                    ("fractions", res.unmixed_image.fracs),
+                    ("residuals", res.unmixed_image.res),
+                    ("model", res.unmixed_image.model),
+                ):
+                    create_result_dataset(g, name, storage, data=arr)
+                create_result_dataset(
+                    g, "rsquared", storage, data=res.rsquared
+                )
+                if res.unmixed_image.basis is not None:
+                    g.create_dataset("basis", data=res.unmixed_image.basis)
+                _write_roi(g, res.roi)
+                _write_accuracy(g, res.unmixed_image.accuracy)
+                if res.classes is not None:
+                    _write_class_sets(g, res.classes, res.endmembers)
+                    g.create_dataset("class_map", data=res.classes.class_map)
+                if res.fingerprint is not None:
+                    g.attrs["fingerprint"] = res.fingerprint
+                g.attrs["storage_options"] = storage_id(storage)
+                if res.modelID in f:
                     del f[res.modelID]
-                    g = f.create_group(res.modelID)
-
-                g.attrs["wavelengths"] = res.endmembers.endmember_list[
-                    0
-                ].spectrum.wvl
-                gg = g.create_group("endmembers")
-                for n, name in enumerate(res.endmembers.endmember_name_list):
-                    gg.create_dataset(
-                        name,
-                        data=res.endmembers.endmember_list[n].spectrum.data,
-                    )
-                    gg[name].attrs["index"] = n
-                g.create_dataset("fractions", data=res.unmixed_image.fracs)
-                g.create_dataset("residuals", data=res.unmixed_image.res)
-                g.create_dataset("model", data=res.unmixed_image.model)
-                g.create_dataset("rsquared", data=res.rsquared)
+                f.move(tmp, res.modelID)
+            _reopen_lazy(res)
         case SaveMode.SMA:
             raise NotImplementedError(
                 "Saving to .sma has not been implemented."
@@ -86,7 +236,138 @@ def save_model_result(res: ModelResult):
             )
 
 
-def load_model_result(p: PathLike, model_name: str):
+def _reopen_lazy(res: ModelResult):
+    """
+    Re-opens the lazy datasets of `res` that were read from the group it was
+    just saved over, since they hold the attributes of the replaced data.
+    """
+
+    def reopen(arr: Any) -> Any:
+        if (
+            isinstance(arr, LazyDataset)
+            and Path(arr.path).resolve() == Path(res.savefile).resolve()
+            and arr.name.lstrip("/").startswith(f"{res.modelID}/")
+        ):
+            return LazyDataset(arr.path, arr.name)
+        return arr
+
+    u = res.unmixed_image
+    u.model, u.fracs, u.res = reopen(u.model), reopen(u.fracs), reopen(u.res)
+    res.rsquared = reopen(res.rsquared)
+    if res.classes is not None:
+        res.classes.class_map = reopen(res.classes.class_map)
+
+
+def _write_endmembers(g: h5.Group, endmembers: EndMemberGroup):
+    g.attrs["wavelengths"] = endmembers.wvl
+    gg = g.create_group("endmembers")
+    for n, name in enumerate(endmembers.endmember_name_list):
+        gg.create_dataset(name, data=endmembers.endmember_array[:, n])
+        gg[name].attrs["index"] = n
+
+
+def _write_roi(g: h5.Group, roi: Optional[ROI]):
+    if roi is None:
+        g.attrs["storage"] = "dense"
+        return
+    g.attrs["storage"] = "sparse" if roi.is_sparse else "window"
+    g.attrs["full_shape"] = roi.full_shape
+    g.attrs["roi_window"] = (
+        roi.window.row_off,
+        roi.window.col_off,
+        roi.window.height,
+        roi.window.width,
+    )
+    if roi.coords is not None:
+        g.create_dataset("coords", data=roi.coords)
+
+
+def _read_roi(g: h5.Group) -> Optional[ROI]:
+    storage = g.attrs.get("storage", "dense")
+    if storage == "dense":
+        return None
+    full_shape = tuple(int(i) for i in g.attrs["full_shape"])  # type: ignore
+    window = PixelWindow(*(int(i) for i in g.attrs["roi_window"]))  # type: ignore # noqa
+    coords = g["coords"][...] if storage == "sparse" else None  # type: ignore
+    return ROI(full_shape, window, coords)  # type: ignore
+
+
+def _write_class_sets(
+    g: h5.Group, classes: EndmemberClasses, endmembers: EndMemberGroup
+):
+    """
+    Stores the endmember index of every class: a (classes x endmembers)
+    mask, with the class ids as an attribute.
+    """
+    ids, mask = classes.membership(endmembers.endmember_name_list)
+    dset = g.create_dataset("class_endmembers", data=mask)
+    dset.attrs["class_ids"] = ids
+
+
+def _read_classes(
+    g: h5.Group, p: PathLike, lazy: bool
+) -> Optional[EndmemberClasses]:
+    if "class_endmembers" not in g:
+        return None
+    ems = g["endmembers"]
+    names = sorted(ems, key=lambda n: ems[n].attrs["index"])  # type: ignore
+    dset = g["class_endmembers"]
+    mask = dset[...]  # type: ignore
+    sets = {
+        int(cid): tuple(n for n, used in zip(names, row) if used)
+        for cid, row in zip(dset.attrs["class_ids"], mask)  # type: ignore
+    }
+    if lazy:
+        class_map = LazyDataset(p, f"{g.name}/class_map")
+    else:
+        class_map = g["class_map"][...]  # type: ignore
+    return EndmemberClasses(class_map, sets)  # type: ignore
+
+
+def _write_accuracy(g: h5.Group, report: Optional[AccuracyReport]):
+    if report is None:
+        return
+    g.attrs["accuracy_condition"] = report.condition
+    g.attrs["accuracy_error_bound"] = report.error_bound
+    g.attrs["accuracy_max_error"] = report.max_error
+    g.attrs["accuracy_refined"] = report.refined
+
+
+def _read_accuracy(g: h5.Group) -> Optional[AccuracyReport]:
+    if "accuracy_condition" not in g.attrs:
+        return None
+    return AccuracyReport(
+        float(g.attrs["accuracy_condition"]),  # type: ignore
+        float(g.attrs["accuracy_error_bound"]),  # type: ignore
+        float(g.attrs["accuracy_max_error"]),  # type: ignore
+        bool(g.attrs["accuracy_refined"]),
+    )
+
+
+def load_model_result(
+    p: PathLike, model_name: str, densify: bool = False, lazy: bool = False
+):
+    """
+    Loads a model result saved with `save_model_result`.
+
+    Parameters
+    ----------
+    p: PathLike
+        Path to the HDF5 result file.
+    model_name: str
+        Name of the model group.
+    densify: bool, default=False
+        Results restricted to a sparse region of interest are stored with one
+        row per pixel. If True, they are scattered into (rows, columns, ...)
+        arrays covering the region's window, with NaN outside the region.
+    lazy: bool, default=False
+        If True, the result cubes are returned as `LazyDataset` views that
+        read from the file on slicing. Ignored for sparse results when
+        `densify` is True.
+
+    The fractions keep the offset column as their last column, as in the
+    result of `MixtureModel.run`, so a loaded result saves unchanged.
+    """
     with h5.File(p) as f:
         g = f[model_name]
         endmember_list_with_idx = [
@@ -105,55 +386,326 @@ def load_model_result(p: PathLike, model_name: str):
 
         endmember_grp = EndMemberGroup(endmember_list_sorted)
 
+        basis = g["basis"][...] if "basis" in g else None  # type: ignore
+        roi = _read_roi(g)  # type: ignore
+
+        lazy = lazy and not (densify and roi is not None and roi.is_sparse)
+        if lazy:
+            unmixed = UnMixedCube(
+                LazyDataset(p, f"{model_name}/model"),  # type: ignore
+                LazyDataset(p, f"{model_name}/fractions"),  # type: ignore
+                LazyDataset(p, f"{model_name}/residuals"),  # type: ignore
+                basis=basis,
+                accuracy=_read_accuracy(g),  # type: ignore
+            )
+            rsquared = LazyDataset(p, f"{model_name}/rsquared")
+        else:
+            unmixed = UnMixedCube(
+                read_decoded(g["model"]),  # type: ignore
+                read_decoded(g["fractions"]),  # type: ignore
+                read_decoded(g["residuals"]),  # type: ignore
+                basis=basis,
+                accuracy=_read_accuracy(g),  # type: ignore
+            )
+            rsquared = g["rsquared"][...]  # type: ignore
+
+        classes = _read_classes(g, p, lazy)  # type: ignore
+
+        if densify and roi is not None and roi.is_sparse:
+            unmixed.model = roi.scatter(unmixed.model)
+            unmixed.fracs = roi.scatter(unmixed.fracs)
+            unmixed.res = roi.scatter(unmixed.res)
+            rsquared = roi.scatter(rsquared)  # type: ignore
+            if classes is not None:
+                # Pixels outside the region get class -1.
+                classes.class_map = roi.scatter(
+                    classes.class_map, fill=-1  # type: ignore
+                ).astype(classes.class_map.dtype)
+
         return ModelResult(
             p,
             model_name,
-            UnMixedCube(
-                g["model"][...],  # type: ignore
-                g["fractions"][:, :, :-1],  # type: ignore
-                g["residuals"][...],  # type: ignore
-            ),
+            unmixed,
             endmember_grp,
-            g["rsquared"][...],  # type: ignore
+            rsquared,  # type: ignore
+            roi=roi,
+            fingerprint=g.attrs.get("fingerprint"),  # type: ignore
+            classes=classes,
         )
 
 
+class StreamingResultWriter:
+    """
+    Writes a model result into an HDF5 group one tile at a time.
+
+    Next to the partially written datasets the group holds a completion
+    bitmap, `tiles_done`, with one entry per tile. An entry is only set after
+    the tile's data has been written and flushed. Opening a writer on a group
+    with the same fingerprint and tiling resumes it, and `pending` then
+    returns only the tiles that still need to be computed.
+
+    Parameters
+    ----------
+    path: PathLike
+        HDF5 result file.
+    modelID: str
+        Name of the model group.
+    pixel_shape: tuple[int, ...]
+        Per-pixel shape of the result datasets (see `tiling.result_shape`).
+    tiles: list[Tile]
+        Tiling of the first axis of `pixel_shape`.
+    endmembers: EndMemberGroup
+        Model endmembers.
+    fingerprint: str
+        Fingerprint of the run.
+    roi: ROI, optional
+        Region of interest the run is restricted to.
+    resume: bool, default=True
+        Resume a matching interrupted run instead of starting over.
+    storage: StorageOptions, optional
+        Codec for the result datasets. A resumed run keeps the codec it was
+        started with.
+    classes: EndmemberClasses, optional
+        Class map and endmember sets of a class-map run. The class of every
+        pixel is then written with each tile.
+    """
+
+    def __init__(
+        self,
+        path: PathLike,
+        modelID: str,
+        pixel_shape: tuple[int, ...],
+        tiles: list[Tile],
+        endmembers: EndMemberGroup,
+        fingerprint: str,
+        roi: Optional[ROI] = None,
+        resume: bool = True,
+        storage: Optional[StorageOptions] = None,
+        classes: Optional[EndmemberClasses] = None,
+    ) -> None:
+        self.path = path
+        self.modelID = modelID
+        self.pixel_shape = pixel_shape
+        self.tiles = tiles
+        self.storage = storage
+
+        open_flag = "r+" if Path(path).is_file() else "w"
+        self._file = h5.File(path, open_flag)
+        g = self._file.get(modelID)
+        if (
+            resume
+            and g is not None
+            and g.attrs.get("fingerprint") == fingerprint
+            and "tiles_done" in g
+            and g["tiles_done"].shape == (len(tiles),)  # type: ignore
+            and tuple(g.attrs.get("tile_bounds", ())) == self._bounds()
+        ):
+            self.group: h5.Group = g  # type: ignore
+            return
+
+        if g is not None:
+            del self._file[modelID]
+        g = self._file.create_group(modelID)
+        _write_endmembers(g, endmembers)
+        _write_roi(g, roi)
+        g.attrs["fingerprint"] = fingerprint
+        g.attrs["storage_options"] = storage_id(storage)
+        g.attrs["complete"] = False
+        g.attrs["tile_bounds"] = self._bounds()
+        g.create_dataset("tiles_done", shape=(len(tiles),), dtype=np.uint8)
+        if classes is not None:
+            _write_class_sets(g, classes, endmembers)
+            g.create_dataset(
+                "class_map",
+                shape=pixel_shape,
+                dtype=classes.class_map.dtype,
+                fillvalue=-1,
+            )
+        self._file.flush()
+        self.group = g
+
+    def _bounds(self) -> tuple[int, ...]:
+        return tuple(t.stop for t in self.tiles)
+
+    def pending(self) -> list[Tile]:
+        done = self.group["tiles_done"][...]  # type: ignore
+        return [t for t in self.tiles if not done[t.index]]
+
+    def _dataset(self, name: str, channels: tuple[int, ...]):
+        if name not in self.group:
+            create_result_dataset(
+                self.group,
+                name,
+                self.storage,
+                shape=(*self.pixel_shape, *channels),
+            )
+        return self.group[name]
+
+    def write(
+        self,
+        tile: Tile,
+        unmixed: UnMixedCube,
+        rsquared: npt.NDArray,
+        labels: Optional[npt.NDArray] = None,
+    ):
+        """
+        Writes a solved tile, and the classes of its pixels for class-map
+        runs, and marks it complete.
+        """
+        rows = slice(tile.start, tile.stop)
+        for name, arr in (
+            ("fractions", unmixed.fracs),
+            ("residuals", unmixed.res),
+            ("model", unmixed.model),
+        ):
+            self._dataset(name, np.shape(arr)[-1:])
+            write_rows(self.group, name, rows, arr)
+        self._dataset("rsquared", ())
+        write_rows(self.group, "rsquared", rows, rsquared)
+        if labels is not None:
+            self.group["class_map"][rows] = labels.reshape(  # type: ignore
+                len(tile), *self.pixel_shape[1:]
+            )
+        if unmixed.basis is not None and "basis" not in self.group:
+            self.group.create_dataset("basis", data=unmixed.basis)
+        if unmixed.accuracy is not None:
+            # The group reports the worst tile.
+            stored = _read_accuracy(self.group)
+            report = unmixed.accuracy
+            _write_accuracy(
+                self.group,
+                report if stored is None else stored.merge(report),
+            )
+        self._file.flush()
+
+        self.group["tiles_done"][tile.index] = 1  # type: ignore
+        self._file.flush()
+
+    def finalize(self):
+        self.group.attrs["complete"] = True
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self) -> "StreamingResultWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def find_stored_result(
+    p: PathLike, model_name: str, fingerprint: str
+) -> Optional[ModelResult]:
+    """
+    Returns the stored result `model_name` of file `p`, loaded lazily, if
+    its fingerprint matches. Otherwise returns None.
+    """
+    if Path(p).suffix != SaveMode.HDF5.value or not Path(p).is_file():
+        return None
+    with h5.File(p, "r") as f:
+        if model_name not in f:
+            return None
+        g = f[model_name]
+        if g.attrs.get("fingerprint") != fingerprint:
+            return None
+        if not g.attrs.get("complete", True):
+            return None
+    return load_model_result(p, model_name, lazy=True)
+
+
 def write_model_to_gis(
     model: ModelResult,
     geotransform: GeotransformType,
     crs: str,
     save_directory: str | Path,
     name_prefix: Optional[str] = None,
+    gis_format: GISFormat = GISFormat.ENVI,
+    block_size: int = 512,
+    num_threads: Optional[int] = None,
+    compress: str = "deflate",
 ):
+    """
+    Writes the fractions and residual of a model result to GIS-readable
+    rasters, one band per endmember. Results of a window region of interest
+    are placed at the window's position.
+
+    Parameters
+    ----------
+    model: ModelResult
+        Model result to export.
+    geotransform: GeotransformType
+        Affine geotransform of the full data cube.
+    crs: str
+        Coordinate reference system as WKT.
+    save_directory: str or Path
+        Directory the rasters are written to.
+    name_prefix: str, optional
+        Prefix for the output file names. Defaults to the modelID.
+    gis_format: GISFormat, default=GISFormat.ENVI
+        `ENVI` writes whole bands from the in-memory fractions. `COG` reads
+        the fractions block by block from the saved HDF5 result and writes
+        tiled, compressed, Cloud-Optimized GeoTIFFs with internal overviews,
+        so memory use is bounded by `block_size`. Results of a sparse region
+        of interest can only be exported as ENVI.
+    block_size: int, default=512
+        Tile edge length (pixels) of the COG export. Must be a multiple of 16.
+    num_threads: int, optional
+        Number of GDAL worker threads used to compress tiles and build
+        overviews during the COG export. Defaults to single-threaded.
+    compress: str, default="deflate"
+        GeoTIFF compression codec of the COG export.
+    """
+    import rasterio as rio  # type: ignore
+    from rasterio.crs import CRS  # type: ignore
+
+    if name_prefix is not None:
+        file_name = f"{name_prefix}_"
+    else:
+        file_name = f"{model.modelID}_"
+
+    if gis_format is GISFormat.COG:
+        _write_model_to_cog(
+            model,
+            geotransform,
+            crs,
+            Path(save_directory),
+            file_name,
+            block_size,
+            num_threads,
+            compress,
+        )
+        return
+
+    fracs = model.unmixed_image.fracs
+    rsquared = model.rsquared
+    if np.ndim(fracs) == 2:
+        # Sparse region: place the pixels into the region's window.
+        assert model.roi is not None
+        fracs = model.roi.scatter(np.asarray(fracs), fill=-999)
+        rsquared = model.roi.scatter(np.asarray(rsquared), fill=-999)
+    band_names = model.endmembers.endmember_name_list
     profile = {
         "driver": "ENVI",
-        "height": model.unmixed_image.fracs.shape[0],
-        "width": model.unmixed_image.fracs.shape[1],
-        "count": model.unmixed_image.fracs.shape[2],
-        "transform": geotransform,
+        "height": fracs.shape[0],
+        "width": fracs.shape[1],
+        "count": len(band_names),
+        "transform": _raster_transform(geotransform, model.roi),
         "crs": CRS.from_wkt(crs),
         "dtype": "float32",
         "nodata": -999,
     }
 
-    if name_prefix is not None:
-        file_name = f"{name_prefix}_"
-    else:
-        file_name = f"{model.modelID}_"
     with rio.open(
         Path(save_directory, f"{file_name}fractions").with_suffix(".bsq"),
         "w",
         **profile,
     ) as f:
-        for n in range(model.unmixed_image.fracs.shape[-1]):
-            f.write(model.unmixed_image.fracs[:, :, n], n + 1)
-    with open(
-        Path(save_directory, f"{file_name}fractions").with_suffix(".hdr"), "a"
-    ) as f:
-        f.write("band_names = {\n")
-        for i in model.endmembers.endmember_name_list:
-            f.write(f"    {i},\n")
-        f.write("}")
+        # The driver writes the descriptions as the header's band names.
+        for n, name in enumerate(band_names):
+            f.write(fracs[:, :, n], n + 1)
+            f.set_band_description(n + 1, name)
 
     profile["count"] = 1
     with rio.open(
@@ -161,4 +713,170 @@ def write_model_to_gis(
         "w",
         **profile,
     ) as f:
-        f.write(model.rsquared, 1)
+        f.write(rsquared, 1)
+
+
+def _raster_transform(
+    geotransform: GeotransformType, roi: Optional[ROI]
+) -> GeotransformType:
+    """
+    Geotransform of the raster a result covers: that of the scene, shifted
+    to the window of a region of interest.
+    """
+    if roi is None:
+        return geotransform
+    a, b, c, d, e, f = geotransform
+    row, col = roi.window.row_off, roi.window.col_off
+    return (a, b, c + a * col + b * row, d, e, f + d * col + e * row)
+
+
+def _iter_windows(
+    height: int, width: int, block_size: int
+) -> Iterator[Window]:
+    from rasterio.windows import Window  # type: ignore
+
+    for row in range(0, height, block_size):
+        for col in range(0, width, block_size):
+            yield Window(
+                col,
+                row,
+                min(block_size, width - col),
+                min(block_size, height - row),
+            )
+
+
+def _overview_factors(height: int, width: int, block_size: int) -> list[int]:
+    factors: list[int] = []
+    factor = 2
+    while max(height, width) / factor >= block_size:
+        factors.append(factor)
+        factor *= 2
+    return factors
+
+
+def _write_dataset_to_cog(
+    dset: h5.Dataset,
+    count: int,
+    dst: Path,
+    profile: dict,
+    band_names: list[str],
+    block_size: int,
+):
+    """
+    Streams the first `count` bands of a (y, x, b) or (y, x) HDF5 dataset
+    into a tiled GeoTIFF, builds its overviews and rewrites it with a COG
+    layout (overviews and tile index ahead of the image data).
+    """
+    import rasterio as rio  # type: ignore
+    from rasterio.enums import Resampling  # type: ignore
+    from rasterio.shutil import copy as rio_copy  # type: ignore
+
+    copy_opts = {
+        k: v
+        for k, v in profile.items()
+        if k
+        in (
+            "tiled",
+            "blockxsize",
+            "blockysize",
+            "compress",
+            "interleave",
+            "num_threads",
+        )
+    }
+    tmp = dst.with_suffix(".tmp.tif")
+    try:
+        with rio.open(tmp, "w", **profile) as f:
+            for window in _iter_windows(
+                profile["height"], profile["width"], block_size
+            ):
+                rows, cols = window.toslices()
+                if dset.ndim == 2:
+                    block = read_decoded(dset, (rows, cols))[None, :, :]
+                else:
+                    block = read_decoded(dset, (rows, cols, slice(0, count)))
+                    block = np.moveaxis(block, -1, 0)
+                f.write(block.astype(np.float32, copy=False), window=window)
+            for n, name in enumerate(band_names):
+                f.set_band_description(n + 1, name)
+            factors = _overview_factors(
+                profile["height"], profile["width"], block_size
+            )
+            if len(factors) > 0:
+                f.build_overviews(factors, Resampling.average)
+                f.update_tags(ns="rio_overview", resampling="average")
+
+        rio_copy(
+            tmp, dst, driver="GTiff", copy_src_overviews=True, **copy_opts
+        )
+    finally:
+        # Also clears the partial file of a failed write.
+        tmp.unlink(missing_ok=True)
+
+
+def _write_model_to_cog(
+    model: ModelResult,
+    geotransform: GeotransformType,
+    crs: str,
+    save_directory: Path,
+    file_name: str,
+    block_size: int,
+    num_threads: Optional[int],
+    compress: str,
+):
+    import rasterio as rio  # type: ignore
+    from rasterio.crs import CRS  # type: ignore
+
+    if block_size % 16 != 0:
+        raise ValueError(
+            f"block_size must be a multiple of 16, got {block_size}."
+        )
+
+    if model.roi is not None and model.roi.is_sparse:
+        raise ValueError(
+            "Results of a sparse region of interest cannot be exported as "
+            "COG; export them with GISFormat.ENVI, which places the pixels "
+            "into the region's window."
+        )
+
+    threads = "1" if num_threads is None else str(num_threads)
+    with rio.Env(GDAL_NUM_THREADS=threads), h5.File(model.savefile, "r") as f:
+        g = f[model.modelID]
+        fracs = g["fractions"]
+        height, width = fracs.shape[:2]  # type: ignore
+        band_names = model.endmembers.endmember_name_list
+        profile = {
+            "driver": "GTiff",
+            "height": height,
+            "width": width,
+            "count": len(band_names),
+            "transform": _raster_transform(geotransform, model.roi),
+            "crs": CRS.from_wkt(crs),
+            "dtype": "float32",
+            "nodata": -999,
+            "tiled": True,
+            "blockxsize": block_size,
+            "blockysize": block_size,
+            "compress": compress,
+            "interleave": "band",
+            "bigtiff": "IF_SAFER",
+            "num_threads": threads,
+        }
+        _write_dataset_to_cog(
+            fracs,  # type: ignore
+            len(band_names),
+            Path(save_directory, f"{file_name}fractions.tif"),
+            profile,
+            band_names,
+            block_size,
+        )
+
+        profile["count"] = 1
+        _write_dataset_to_cog(
+            g["rsquared"],  # type: ignore
+            1,
+            Path(save_directory, f"{file_name}residual.tif"),
+            profile,
+            ["rsquared"],
+            block_size,
+        )
@@ -0,0 +1,193 @@
+"""
+Spectral Libraries
+
+Container for large spectral libraries. All spectra live in one contiguous
+(spectra x bands) array, which can be memory-mapped straight from an HDF5
+file, with a name-to-index map and shared wavelength metadata. Subsets are
+gathered into an `EndMemberGroup` with a single fancy-indexing operation and
+no per-spectrum Python objects.
+
+Usage::
+
+    lib = SpectralLibrary.from_arrays(names, arr, wvl)
+    lib.save("library.hdf5")
+
+    lib = SpectralLibrary.open("library.hdf5")
+    grp = lib.subset(["olivine", "pyroxene", "plagioclase"])
+    model = MixtureModel(grp, cube)
+"""
+
+# Standard Libraries
+from pathlib import Path
+from typing import Sequence, Optional
+from typing_extensions import Annotated
+
+# Dependencies
+import numpy as np
+import numpy.typing as npt
+import h5py as h5  # type: ignore
+
+# Relative Imports
+from .typing import PathLike, SpectrumLike
+from .endmember import EndMember, EndMemberGroup
+from .resampling import ResampleMethod, resampling_matrix
+
+
+class SpectralLibrary:
+    """
+    Parameters
+    ----------
+    names: list[str]
+        Unique name of every spectrum.
+    spectra: NDArray[(2,)]
+        (spectra x bands) array. May be a `np.memmap`.
+    wvl: NDArray[(1,)]
+        Wavelengths shared by every spectrum.
+    """
+
+    def __init__(
+        self,
+        names: Sequence[str],
+        spectra: Annotated[npt.NDArray, (2,)],
+        wvl: SpectrumLike,
+    ) -> None:
+        if spectra.ndim != 2 or spectra.shape[0] != len(names):
+            raise ValueError(
+                f"Expected a ({len(names)} x bands) spectra array, got shape "
+                f"{spectra.shape}."
+            )
+        if spectra.shape[1] != len(wvl):
+            raise ValueError(
+                f"Spectra have {spectra.shape[1]} bands but {len(wvl)} "
+                "wavelengths were given."
+            )
+        self.names = list(names)
+        self.spectra = spectra
+        self.wvl = np.asarray(wvl)
+        self._index = {name: n for n, name in enumerate(self.names)}
+        if len(self._index) != len(self.names):
+            raise ValueError("Spectrum names must be unique.")
+
+    @classmethod
+    def from_arrays(
+        cls, names: Sequence[str], arr: np.ndarray, wvl: np.ndarray
+    ) -> "SpectralLibrary":
+        """
+        Bulk import of a (spectra x bands) array, as taken by
+        `read_endmember_set`.
+        """
+        return cls(names, np.ascontiguousarray(arr, dtype=np.float32), wvl)
+
+    @classmethod
+    def from_endmembers(
+        cls, endmember_list: list[EndMember]
+    ) -> "SpectralLibrary":
+        arr = np.stack([em.spectrum.data for em in endmember_list])
+        return cls.from_arrays(
+            [em.name for em in endmember_list],
+            arr,
+            endmember_list[0].spectrum.wvl,
+        )
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._index
+
+    def index(self, names: Sequence[str]) -> npt.NDArray[np.intp]:
+        """Row indices of the named spectra."""
+        try:
+            return np.fromiter(
+                (self._index[n] for n in names),
+                dtype=np.intp,
+                count=len(names),
+            )
+        except KeyError as e:
+            raise KeyError(f"{e.args[0]} is not in the library.") from None
+
+    def subset(
+        self, selection: Sequence[str] | npt.NDArray[np.integer]
+    ) -> EndMemberGroup:
+        """
+        Gathers spectra, by name or row index, into an `EndMemberGroup`.
+        Only the selected rows are read from a memory-mapped library.
+        """
+        if len(selection) > 0 and isinstance(selection[0], str):
+            idx = self.index(selection)  # type: ignore
+        else:
+            idx = np.asarray(selection, dtype=np.intp)
+        return EndMemberGroup.from_array(
+            [self.names[i] for i in idx], self.spectra[idx].T, self.wvl
+        )
+
+    def as_group(self) -> EndMemberGroup:
+        """The whole library as an `EndMemberGroup`."""
+        return EndMemberGroup.from_array(
+            self.names, np.asarray(self.spectra).T, self.wvl
+        )
+
+    def resample(
+        self,
+        wvl: SpectrumLike,
+        method: ResampleMethod = ResampleMethod.LINEAR,
+        fwhm: Optional[float | npt.NDArray] = None,
+    ) -> "SpectralLibrary":
+        """
+        Resamples the whole library onto new wavelengths with one product
+        against a cached resampling matrix.
+        """
+        matrix = resampling_matrix(self.wvl, wvl, method, fwhm)
+        return SpectralLibrary(self.names, matrix.apply(self.spectra), wvl)
+
+    def save(self, path: PathLike, name: str = "library") -> None:
+        """
+        Writes the library to group `name` of an HDF5 file. The spectra are
+        stored as one contiguous, uncompressed dataset so they can be
+        memory-mapped by `SpectralLibrary.open`.
+        """
+        open_flag = "r+" if Path(path).is_file() else "w"
+        with h5.File(path, open_flag) as f:
+            if name in f:
+                del f[name]
+            g = f.create_group(name)
+            g.attrs["wavelengths"] = self.wvl
+            g.create_dataset("spectra", data=np.asarray(self.spectra))
+            g.create_dataset(
+                "names", data=self.names, dtype=h5.string_dtype()
+            )
+
+    @classmethod
+    def open(
+        cls, path: PathLike, name: str = "library", mmap: bool = True
+    ) -> "SpectralLibrary":
+        """
+        Opens a library written by `SpectralLibrary.save`.
+
+        Parameters
+        ----------
+        path: PathLike
+            HDF5 file holding the library.
+        name: str, default="library"
+            Group the library was saved to.
+        mmap: bool, default=True
+            Memory-map the spectra instead of reading them. Falls back to
+            reading if the dataset is chunked or compressed.
+        """
+        with h5.File(path, "r") as f:
+            g = f[name]
+            wvl = g.attrs["wavelengths"][...]  # type: ignore
+            names = list(g["names"].asstr()[...])  # type: ignore
+            dset = g["spectra"]
+            offset = dset.id.get_offset()  # type: ignore
+            if mmap and dset.chunks is None and offset is not None:  # type: ignore # noqa
+                spectra = np.memmap(
+                    path,
+                    mode="r",
+                    dtype=dset.dtype,  # type: ignore
+                    shape=dset.shape,  # type: ignore
+                    offset=offset,
+                )
+            else:
+                spectra = dset[...]  # type: ignore
+        return cls(names, spectra, wvl)
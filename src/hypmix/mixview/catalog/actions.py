@@ -32,3 +32,5 @@ class ActionCatalog:
     open_model = ActionSpec(text="Hypmix Model", callback_name="load_model")
     open_data = ActionSpec(text="Data", callback_name="load_data")
     set_base = ActionSpec(text="Set Base", callback_name="set_base")
+    run_model = ActionSpec(text="Run Model", callback_name="run_model")
+    cancel_run = ActionSpec(text="Cancel Run", callback_name="cancel_run")
@@ -10,12 +10,19 @@ from PySide6.QtWidgets import (
     QMenu,
     QFileDialog,
     QDockWidget,
+    QInputDialog,
+    QMessageBox,
 )
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QThread
 import pyqtgraph as pg  # type: ignore
 import numpy as np
 
-from hypmix.io import load_model_result
+from hypmix.io import load_model_result, ModelResult
+from hypmix.comparison import is_comparison, load_comparison
+from hypmix.library import SpectralLibrary
+from hypmix.progress import TileProgress
+from hypmix.run_model import MixtureModel
+from hypmix.typing import ImageCube
 
 # Local Imports
 from .image_view_container import ImViewContainer
@@ -24,9 +31,10 @@ from .endmember_viewer import EndmemberViewerWidget
 from .model_viewer import ModelViewerWidget
 from .catalog.actions import ActionCatalog
 from .catalog.handlers import SignalHandlers
+from .run_worker import ModelRunWorker, start_worker
 
 # Top-Level Imports
-from hypmix.file_opening_utils import open_cube
+from hypmix.file_opening_utils import open_cube, open_wvl
 
 USER_ROLE = Qt.ItemDataRole.UserRole
 VERSION_NUM = "0.2.0"
@@ -58,6 +66,12 @@ class MixView(QMainWindow):
         self.em_view = EndmemberViewerWidget()
         self.model_view = ModelViewerWidget()
         self.tree_dock: QDockWidget | None = None
+        self.data_cube: np.ndarray | None = None
+        self.run_worker: ModelRunWorker | None = None
+        self.run_thread: QThread | None = None
+        self._preview_frac: np.ndarray | None = None
+        self._preview_resi: np.ndarray | None = None
+        self._preview_shown = False
 
         self.frac_container = ImViewContainer(self.frac_view, parent=self)
         self.resi_container = ImViewContainer(
@@ -109,8 +123,10 @@ class MixView(QMainWindow):
 
         file_menu = QMenu("File")
         data_menu = QMenu("Data")
+        model_menu = QMenu("Model")
         menubar.addMenu(file_menu)
         menubar.addMenu(data_menu)
+        menubar.addMenu(model_menu)
 
         open_menu = QMenu("Open")
         file_menu.addMenu(open_menu)
@@ -126,6 +142,9 @@ class MixView(QMainWindow):
         data_menu.addAction(em_dock.toggleViewAction())
         data_menu.addAction(model_dock.toggleViewAction())
 
+        model_menu.addAction(ActionCatalog.run_model.build(main_widget, self))
+        model_menu.addAction(ActionCatalog.cancel_run.build(main_widget, self))
+
         self.model_tree.tree.itemSelectionChanged.connect(self.set_model)
 
         if frac is not None:
@@ -212,6 +231,7 @@ class MixView(QMainWindow):
         self.resi_view.setLevels(lo, hi)
 
     def set_data(self, cube: np.ndarray):
+        self.data_cube = cube
         self.model_view.set_data(cube)
 
     def set_base(self):
@@ -222,12 +242,224 @@ class MixView(QMainWindow):
         selection = self.model_tree.get_selection_path()
         if selection is None:
             return
-        model = load_model_result(selection.fp, selection.model)
-        self.set_frac(model.unmixed_image.fracs)
-        self.set_resi(model.unmixed_image.res)
+        if is_comparison(selection.fp, selection.model):
+            self.set_comparison()
+            return
+        # The model cube stays on disk and is read one spectrum at a time
+        # under the cursor; only the two displayed cubes are read whole.
+        model = load_model_result(
+            selection.fp, selection.model, densify=True, lazy=True
+        )
+        # Without the offset column, as in the run preview.
+        self.set_frac(model.unmixed_image.fracs[..., :-1])
+        self.set_resi(model.unmixed_image.res[...])
         self.frac_container.connect_title(model.endmembers.endmember_name_list)
-        wvl = list(model.endmembers.endmember_list[0].spectrum.wvl)
-        wvl = [f"{str(i)} nm" for i in wvl]
-        self.resi_container.connect_title(wvl)
+        if model.unmixed_image.basis is not None:
+            ncomp = model.unmixed_image.basis.shape[1]
+            lbls = [f"Component {i + 1}" for i in range(ncomp)]
+            lbls.append("Sum-to-one")
+            self.resi_container.connect_title(lbls)
+        else:
+            wvl = list(model.endmembers.endmember_list[0].spectrum.wvl)
+            wvl = [f"{str(i)} nm" for i in wvl]
+            self.resi_container.connect_title(wvl)
         self.em_view.show_endmembers(model)
         self.model_view.set_model(model)
+
+    def set_comparison(self) -> None:
+        """
+        Shows the selected model comparison: the best-fitting model per pixel
+        in the fraction view, and the fraction differences to the reference
+        model (or, without shared endmembers, each model's RMS residual) in
+        the residual view.
+        """
+        selection = self.model_tree.get_selection_path()
+        if selection is None:
+            return
+        comp = load_comparison(selection.fp, selection.model, densify=True)
+        best = np.where(comp.best_model < 0, np.nan, comp.best_model)
+        self.frac_view.setImage(
+            best[..., None].astype(np.float32), axes={"y": 0, "x": 1, "t": 2}
+        )
+        self.frac_view.setLevels(0, len(comp.models) - 1)
+        names = ", ".join(f"{n}: {m}" for n, m in enumerate(comp.models))
+        self.frac_container.connect_title([f"Best model ({names})"])
+
+        if len(comp.fraction_diffs) > 0:
+            lbls = [
+                f"{m} - {comp.reference}: {em}"
+                for m, (ems, _) in comp.fraction_diffs.items()
+                for em in ems
+            ]
+            diffs = np.concatenate(
+                [d for _, d in comp.fraction_diffs.values()], axis=-1
+            )
+            self.resi_view.setImage(diffs, axes={"y": 0, "x": 1, "t": 2})
+            finite = np.abs(diffs[np.isfinite(diffs)])
+            hi = np.percentile(finite, 99.5) if finite.size > 0 else 1
+            self.resi_view.setLevels(-hi, hi)
+            self.resi_container.connect_title(lbls)
+        else:
+            self.set_resi(comp.rsquared)
+            self.resi_container.connect_title(
+                [f"RMS residual: {m}" for m in comp.models]
+            )
+        self.model_view.set_comparison(comp)
+        win = ", ".join(
+            f"{m} {100 * w:.0f}%"
+            for m, w in zip(comp.models, comp.summary.win_fraction)
+        )
+        self.statusBar().showMessage(f"Best fit: {win}")
+
+    def run_model(
+        self,
+        *,
+        wvl_fp: Path | None = None,
+        library_fp: Path | None = None,
+        dst: Path | None = None,
+        model_name: str | None = None,
+        endmember_names: list[str] | None = None,
+        tile_rows: int = 64,
+    ):
+        """
+        Unmixes the loaded data cube against endmembers from a spectral
+        library in a worker thread. Fraction and residual views fill in
+        tile by tile while the run progresses.
+        """
+        if self.run_worker is not None:
+            QMessageBox.information(
+                self, "Run Model", "A model run is already in progress."
+            )
+            return
+        if self.data_cube is None:
+            QMessageBox.warning(
+                self, "Run Model", "Open a data cube before running a model."
+            )
+            return
+
+        if wvl_fp is None:
+            fp_str, fp_type = QFileDialog.getOpenFileName(
+                caption="Select Data Wavelengths",
+                filter=("Wavelength Files (*.wvl *.hdr *.txt *.csv)"),
+                dir=str(self.state.base_dir),
+            )
+            if not fp_str:
+                return
+            wvl_fp = Path(fp_str)
+        if library_fp is None:
+            fp_str, fp_type = QFileDialog.getOpenFileName(
+                caption="Select Endmember Library",
+                filter=("HDF5 Files (*.hdf5)"),
+                dir=str(self.state.base_dir),
+            )
+            if not fp_str:
+                return
+            library_fp = Path(fp_str)
+        if endmember_names is None:
+            text, ok = QInputDialog.getText(
+                self,
+                "Run Model",
+                "Endmembers (comma separated, blank for the whole library):",
+            )
+            if not ok:
+                return
+            endmember_names = [i.strip() for i in text.split(",") if i.strip()]
+        if dst is None:
+            fp_str, fp_type = QFileDialog.getSaveFileName(
+                caption="Save Model Result",
+                filter=("HDF5 Files (*.hdf5)"),
+                dir=str(self.state.base_dir),
+            )
+            if not fp_str:
+                return
+            dst = Path(fp_str)
+        if model_name is None:
+            model_name, ok = QInputDialog.getText(
+                self, "Run Model", "Model name:"
+            )
+            if not ok or not model_name:
+                return
+
+        try:
+            library = SpectralLibrary.open(library_fp)
+            if endmember_names:
+                group = library.subset(endmember_names)
+            else:
+                group = library.as_group()
+            cube = ImageCube(self.data_cube, open_wvl(wvl_fp))
+            model = MixtureModel(group, cube)
+        except (OSError, KeyError, ValueError) as e:
+            QMessageBox.critical(self, "Run Model", str(e))
+            return
+
+        nrows, ncols, nbands = cube.data.shape
+        names = model.endmembers.endmember_name_list
+        self._preview_frac = np.full(
+            (nrows, ncols, len(names)), np.nan, dtype=np.float32
+        )
+        self._preview_resi = np.full(
+            (nrows, ncols, nbands + 1), np.nan, dtype=np.float32
+        )
+        self._preview_shown = False
+        self.frac_container.connect_title(names)
+        wvl = [f"{str(i)} nm" for i in cube.wvl]
+        self.resi_container.connect_title(wvl + ["Sum-to-one"])
+
+        worker = ModelRunWorker(model, dst, model_name, tile_rows)
+        worker.tile_done.connect(self.show_run_tile)
+        worker.finished.connect(self.finish_run)
+        worker.failed.connect(self.fail_run)
+        self.run_worker = worker
+        self.run_thread = start_worker(worker, self)
+        self.statusBar().showMessage(f"Running {model_name}...")
+
+    def cancel_run(self):
+        if self.run_worker is not None:
+            self.run_worker.cancel.cancel()
+
+    def show_run_tile(self, event: TileProgress):
+        if self._preview_frac is None or self._preview_resi is None:
+            return
+        if event.unmixed is not None:
+            rows = slice(event.tile.start, event.tile.stop)
+            self._preview_frac[rows] = event.unmixed.fracs[..., :-1]
+            self._preview_resi[rows] = event.unmixed.res
+        if not self._preview_shown:
+            self.set_frac(self._preview_frac)
+            self.set_resi(self._preview_resi)
+            self._preview_shown = True
+        else:
+            self._refresh_view(self.frac_view, self._preview_frac)
+            self._refresh_view(self.resi_view, self._preview_resi)
+        eta = "--" if event.eta is None else f"{event.eta:.0f} s"
+        self.statusBar().showMessage(
+            f"Tile {event.tiles_done}/{event.tiles_total} "
+            f"({100 * event.fraction_done:.0f}%), ETA {eta}"
+        )
+
+    def _refresh_view(self, view: pg.ImageView, cube: np.ndarray):
+        """Redraws a partially filled cube, keeping band, levels and zoom."""
+        idx = view.currentIndex
+        view.setImage(
+            cube,
+            axes={"y": 0, "x": 1, "t": 2},
+            autoRange=False,
+            autoLevels=False,
+            autoHistogramRange=False,
+        )
+        view.setCurrentIndex(idx)
+
+    def finish_run(self, result: ModelResult):
+        self._clear_run()
+        self.statusBar().showMessage(f"Finished {result.modelID}.", 5000)
+        self.model_tree.add_model(Path(result.savefile))
+
+    def fail_run(self, message: str):
+        self._clear_run()
+        self.statusBar().showMessage(message, 5000)
+
+    def _clear_run(self):
+        self.run_worker = None
+        self.run_thread = None
+        self._preview_frac = None
+        self._preview_resi = None
@@ -4,6 +4,8 @@ import pyqtgraph as pg  # type: ignore
 import numpy as np
 from hypmix.util_classes import CursorInfo
 from hypmix.io import ModelResult
+from hypmix.comparison import ModelComparison
+from hypmix.typing import ImageCubeLike
 import cmap
 
 
@@ -28,20 +30,32 @@ class ModelViewerWidget(QWidget):
         self.setLayout(layout)
 
         self._data_set = False
+        self.offset = (0, 0)
         self._bar_legend: pg.LegendItem | None = None
+        self.comparison: ModelComparison | None = None
 
     def set_model(self, model: ModelResult):
         if self._bar_legend is not None:
             self.bar_plot.removeItem(self._bar_legend)
+        self.comparison = None
+        self.bar_items = []
         self.wvl: np.ndarray = model.endmembers.endmember_list[0].spectrum.wvl
-        self.model_cube: np.ndarray = model.unmixed_image.model
+        # Lazy for results loaded with `lazy=True`: only the spectrum under
+        # the cursor is read.
+        self.model_cube: ImageCubeLike = model.unmixed_image.model
         self.frac_cube = model.unmixed_image.fracs
+        self.basis = model.unmixed_image.basis
+        if model.roi is not None:
+            self.offset = (model.roi.window.row_off, model.roi.window.col_off)
+        else:
+            self.offset = (0, 0)
         self._num_endmembers = len(model.endmembers.endmember_list)
         item = self.bar_plot.getPlotItem()
         if item is None:
             return
         self._bar_legend = item.addLegend()
         item.clear()
+        item.getAxis("bottom").setTicks(None)
 
         base_cmap = cmap.Colormap("crameri:hawaii")
         ncolors = len(model.endmembers.endmember_list)
@@ -55,6 +69,32 @@ class ModelViewerWidget(QWidget):
             self.bar_items.append(_bar)
             self.bar_plot.addItem(_bar)
 
+    def set_comparison(self, comp: ModelComparison):
+        """
+        Shows a model comparison: one bar per model with its RMS residual at
+        the cursor, the best-fitting model highlighted.
+        """
+        if self._bar_legend is not None:
+            self.bar_plot.removeItem(self._bar_legend)
+            self._bar_legend = None
+        self.comparison = comp
+        self.wvl = comp.wavelengths
+        self.bar_items = []
+        self.model_item.setData()
+        if comp.roi is not None:
+            self.offset = (comp.roi.window.row_off, comp.roi.window.col_off)
+        else:
+            self.offset = (0, 0)
+        item = self.bar_plot.getPlotItem()
+        if item is None:
+            return
+        item.clear()
+        item.getAxis("bottom").setTicks([list(enumerate(comp.models))])
+        for n in range(len(comp.models)):
+            _bar = pg.BarGraphItem(x=[n], height=0, width=0.8, brush="gray")
+            self.bar_items.append(_bar)
+            self.bar_plot.addItem(_bar)
+
     def set_data(self, data: np.ndarray):
         if data is not None:
             self.spec_cube = data
@@ -66,17 +106,31 @@ class ModelViewerWidget(QWidget):
         if self._data_set:
             self.spec_item.setData(
                 x=self.wvl,
-                y=self.spec_cube[ci.yint, ci.xint, :],
+                y=self.spec_cube[
+                    ci.yint + self.offset[0], ci.xint + self.offset[1], :
+                ],
                 pen=pg.mkPen(style=Qt.PenStyle.DashLine, width=1),
             )
+        if self.comparison is not None:
+            self._update_comparison(ci)
+            return
+        model_spec = self.model_cube[ci.yint, ci.xint, :-1]
+        if self.basis is not None:
+            model_spec = self.basis @ model_spec
         self.model_item.setData(
             x=self.wvl,
-            y=self.model_cube[ci.yint, ci.xint, :-1],
+            y=model_spec,
             pen=pg.mkPen(color="red", width=1),
         )
 
-        _sum = 0
-        for n, i in enumerate(self.bar_items):
-            h = self.frac_cube[ci.yint, ci.xint, n]
-            _sum += h
+        fracs = self.frac_cube[ci.yint, ci.xint]
+        for h, i in zip(fracs, self.bar_items):
             i.setOpts(height=[h])
+
+    def _update_comparison(self, ci: CursorInfo):
+        assert self.comparison is not None
+        rsq = self.comparison.rsquared[ci.yint, ci.xint]
+        best = self.comparison.best_model[ci.yint, ci.xint]
+        for n, i in enumerate(self.bar_items):
+            h = rsq[n] if np.isfinite(rsq[n]) else 0
+            i.setOpts(height=[h], brush="red" if n == best else "gray")
@@ -0,0 +1,73 @@
+# Built-Ins
+from pathlib import Path
+
+# Dependencies
+from PySide6.QtCore import QObject, QThread, Signal, Slot
+
+# Top-Level Imports
+from hypmix.run_model import MixtureModel
+from hypmix.progress import CancelToken, RunCancelledError
+
+
+class ModelRunWorker(QObject):
+    """
+    Runs a `MixtureModel` tile by tile off the GUI thread.
+
+    `tile_done` carries the `TileProgress` event of every completed tile,
+    including the solved tile, so the window can fill in its image views as
+    the run progresses. `finished` carries the `ModelResult` and `failed` an
+    error message. Cancelled runs stay checkpointed in `dst_path` and resume
+    when run again.
+    """
+
+    tile_done = Signal(object)
+    finished = Signal(object)
+    failed = Signal(str)
+
+    def __init__(
+        self,
+        model: MixtureModel,
+        dst_path: Path,
+        modelID: str,
+        tile_rows: int = 64,
+    ) -> None:
+        super().__init__()
+        self.model = model
+        self.dst_path = dst_path
+        self.modelID = modelID
+        self.tile_rows = tile_rows
+        self.cancel = CancelToken()
+
+    @Slot()
+    def run(self) -> None:
+        events = self.model.run_iter(
+            self.dst_path,
+            self.modelID,
+            tile_rows=self.tile_rows,
+            cancel=self.cancel,
+        )
+        try:
+            while True:
+                try:
+                    event = next(events)
+                except StopIteration as stop:
+                    self.finished.emit(stop.value)
+                    return
+                self.tile_done.emit(event)
+        except RunCancelledError as e:
+            self.failed.emit(str(e))
+        except Exception as e:
+            self.failed.emit(f"{type(e).__name__}: {e}")
+
+
+def start_worker(worker: ModelRunWorker, parent: QObject) -> QThread:
+    """Moves `worker` to a new thread, starts it, and cleans up on exit."""
+    thread = QThread(parent)
+    worker.moveToThread(thread)
+    thread.started.connect(worker.run)
+    worker.finished.connect(thread.quit)
+    worker.failed.connect(thread.quit)
+    thread.finished.connect(worker.deleteLater)
+    thread.finished.connect(thread.deleteLater)
+    thread.start()
+    return thread
@@ -1,14 +1,25 @@
 # Standard Libraries
+import threading
+from collections import OrderedDict
 from dataclasses import dataclass
 from typing_extensions import Annotated
-from typing import Tuple
+from typing import Iterable, Tuple, Optional
 
 # Dependencies
 import numpy as np
 import numpy.typing as npt
 
 # Relative Imports
-from .typing import ImageCubeLike
+from .typing import ImageCubeLike, ImageLike, Interleave, memory_interleave
+from .reduction import SpectralSubspace
+from .solver_backends import (
+    BLOCK_BYTES,
+    NumpyBackend,
+    SolverBackend,
+    get_backend,
+)
+
+CACHE_SIZE = 32
 
 
 @dataclass
@@ -31,6 +42,69 @@ class MixedCube:
     d: Annotated[npt.NDArray[np.float32], (3,)]
 
 
+@dataclass(frozen=True)
+class PrecisionPolicy:
+    """
+    How a least squares solve trades precision for bandwidth.
+
+    The solve matrix is always factorized in float64 (by SVD, which does not
+    square the condition number as the normal equations do) and the bulk
+    projection of the data always runs in float32. Outputs are float32
+    whatever the dtype of the data; other dtypes are cast block by block
+    rather than copied whole.
+
+    Attributes
+    ----------
+    refine: bool, default=False
+        Apply one step of float64 iterative refinement to the fractions:
+        the residual of the float32 solution is recomputed in float64 and
+        solved for a correction. Worth it for ill-conditioned endmember
+        sets, at about the cost of a second solve.
+    block_size: int, default=65536
+        Pixels per block for casts and refinement.
+    sample_size: int, default=1024
+        Pixels on which the error of an unrefined solve is measured for the
+        accuracy report.
+    """
+
+    refine: bool = False
+    block_size: int = 65536
+    sample_size: int = 1024
+
+
+@dataclass
+class AccuracyReport:
+    """
+    Attributes
+    ----------
+    condition: float
+        2-norm condition number of the design matrix that was solved.
+    error_bound: float
+        `condition` times the float32 machine epsilon, the expected relative
+        error of an unrefined float32 solve.
+    max_error: float
+        Largest change of any fraction made by float64 refinement: over all
+        pixels if the solve was refined, otherwise over a sample of pixels
+        (the error the float32 solution had there).
+    refined: bool
+        Whether the fractions were refined.
+    """
+
+    condition: float
+    error_bound: float
+    max_error: float
+    refined: bool
+
+    def merge(self, other: "AccuracyReport") -> "AccuracyReport":
+        """Worst case of two reports, e.g. of two tiles of one run."""
+        return AccuracyReport(
+            float(max(self.condition, other.condition)),
+            float(max(self.error_bound, other.error_bound)),
+            float(max(self.max_error, other.max_error)),
+            bool(self.refined and other.refined),
+        )
+
+
 @dataclass
 class UnMixedCube:
     """
@@ -43,47 +117,432 @@ class UnMixedCube:
         endmembers that best fits the actual data.
     fracs: NDArray[np.float32, (3,)]
         3D array representing the modeled fractions of endmembers at all
-        pixels.
+        pixels. The last column is the fitted constant offset.
     res: NDArray[np.float32, (2,)]
         Pixel-by-pixel model residuals. That is, a Spectrum-Like vector for
         each pixel that represents model - data in each spectral band.
+    basis: NDArray[np.float32, (2,)], optional
+        Set when the cube was unmixed in a reduced subspace. `model` and `res`
+        then hold (bands x k) basis coefficients instead of band values, so
+        band-space values are `model[..., :k] @ basis.T`.
+    res_perp: NDArray[np.float32, (2,)], optional
+        Set when the cube was unmixed in a reduced subspace. Norm of the part
+        of each residual that lies outside the subspace.
+    accuracy: AccuracyReport, optional
+        Numerical accuracy of a least squares solve.
     """
 
     model: ImageCubeLike
     fracs: ImageCubeLike
     res: ImageCubeLike
+    basis: Optional[Annotated[npt.NDArray[np.float32], (2,)]] = None
+    res_perp: Optional[ImageLike] = None
+    accuracy: Optional[AccuracyReport] = None
 
 
-def _solve_cube(
+def _augment(
     G: Annotated[npt.NDArray[np.float32], (2,)],
-    d: Annotated[npt.NDArray[np.float32], (3,)],
-) -> Tuple[ImageCubeLike, ImageCubeLike, ImageCubeLike]:
-    prefix = np.linalg.inv(G.T @ G) @ G.T
+    offset: Optional[npt.NDArray] = None,
+) -> Annotated[npt.NDArray[np.float32], (2,)]:
+    """
+    Appends the constant offset column (ones unless `offset` is given) and
+    the sum-to-one row to a design matrix.
+    """
+    nb, nm = G.shape
+    G_aug = np.zeros((nb + 1, nm + 1), dtype=np.float32)
+    G_aug[:nb, :nm] = G
+    G_aug[:nb, nm] = 1 if offset is None else np.ravel(offset)
+    G_aug[nb, :nm] = 1
+    return G_aug
 
-    fracs = np.einsum("ij,...j->...i", prefix, d)
 
-    model = np.einsum("ij,...j->...i", G, fracs)
+@dataclass
+class Factorization:
+    """
+    float32 solve matrix of a design matrix, with its float64 original and
+    condition. See `factorize`.
+    """
 
-    res = model - d
+    prefix: Annotated[npt.NDArray[np.float32], (2,)]
+    prefix64: Annotated[npt.NDArray[np.float64], (2,)]
+    condition: float
 
-    return model, fracs, res
 
+_FACTOR_CACHE: OrderedDict[tuple, Factorization] = OrderedDict()
+# Tiles are solved on several threads.
+_FACTOR_LOCK = threading.Lock()
 
-def unmix_spectral_cube(mixed_cube: MixedCube, add_to_one: bool = True):
-    G = mixed_cube.G
-    d = mixed_cube.d
 
+def _factor(G: Annotated[npt.NDArray[np.float32], (2,)]) -> Factorization:
+    """
+    Pseudo-inverse of `G` by a float64 SVD, cached by design matrix so the
+    tiles of a run factorize once.
+    """
+    key = (G.shape, G.dtype.str, np.ascontiguousarray(G).tobytes())
+    with _FACTOR_LOCK:
+        cached = _FACTOR_CACHE.get(key)
+        if cached is not None:
+            _FACTOR_CACHE.move_to_end(key)
+            return cached
+
+    U, sv, Vt = np.linalg.svd(G.astype(np.float64), full_matrices=False)
+    if sv[-1] == 0:
+        raise np.linalg.LinAlgError("Singular matrix")
+    prefix64 = (Vt.T / sv) @ U.T
+    factor = Factorization(
+        prefix64.astype(np.float32), prefix64, sv[0] / sv[-1]
+    )
+
+    with _FACTOR_LOCK:
+        _FACTOR_CACHE[key] = factor
+        if len(_FACTOR_CACHE) > CACHE_SIZE:
+            _FACTOR_CACHE.popitem(last=False)
+    return factor
+
+
+def factorize(
+    G: Annotated[npt.NDArray[np.float32], (2,)], add_to_one: bool = True
+) -> Factorization:
+    """
+    Factorization of the least squares system `unmix_spectral_cube` solves
+    for the design matrix `G`. Pass it as `factor` to solve many cubes with
+    the same `G` without relying on the factorization cache, e.g. for the
+    endmember sets of a class-map run.
+
+    Raises
+    ------
+    LinAlgError
+        If the system is singular.
+    """
+    return _factor(_augment(G) if add_to_one else G)
+
+
+def _refine_block(
+    G64: Annotated[npt.NDArray[np.float64], (2,)],
+    prefix64: Annotated[npt.NDArray[np.float64], (2,)],
+    x: Annotated[npt.NDArray[np.float32], (2,)],
+    y: Annotated[npt.NDArray, (2,)],
+    add_to_one: bool,
+    apply: bool = True,
+) -> float:
+    """
+    One float64 refinement step for a (pixels x C) block of solutions `x`
+    of the (pixels x bands) data `y`, updated in place if `apply`. Returns
+    the largest correction.
+    """
+    nb = y.shape[-1]
+    x64 = x.astype(np.float64)
+    r = np.empty((x.shape[0], G64.shape[0]))
+    np.subtract(y, x64 @ G64[:nb].T, out=r[:, :nb])
     if add_to_one:
-        G_aug = np.hstack((G, np.ones([G.shape[0], 1])), dtype=np.float32)
-        bottom_row = np.append(np.ones(G.shape[1]), 0)
-        G_aug = np.vstack((G_aug, bottom_row), dtype=np.float32)
+        r[:, nb] = 1 - x64 @ G64[nb]
+    delta = r @ prefix64.T
+    if apply:
+        x[...] = x64 + delta
+    return float(np.max(np.abs(delta))) if delta.size else 0.0
+
 
-        d_aug = np.concat(
-            [d, np.ones(d.shape[:2])[:, :, None]], axis=2, dtype=np.float32
+def _refine(
+    G: Annotated[npt.NDArray[np.float32], (2,)],
+    factor: Factorization,
+    blocks: Iterable[tuple[npt.NDArray, npt.NDArray]],
+    add_to_one: bool,
+    apply: bool,
+) -> float:
+    """
+    Refines (pixels x C) fraction blocks against their (pixels x bands)
+    data blocks and returns the largest correction.
+    """
+    G64 = G.astype(np.float64)
+    max_error = 0.0
+    for x, y in blocks:
+        err = _refine_block(G64, factor.prefix64, x, y, add_to_one, apply)
+        max_error = max(max_error, err)
+    return max_error
+
+
+def _report(
+    factor: Factorization, max_error: float, refined: bool
+) -> AccuracyReport:
+    return AccuracyReport(
+        float(factor.condition),
+        float(factor.condition) * float(np.finfo(np.float32).eps),
+        float(max_error),
+        bool(refined),
+    )
+
+
+def _sample(n: int, policy: PrecisionPolicy) -> npt.NDArray[np.intp]:
+    """Evenly strided pixel indices for measuring an unrefined solve."""
+    return np.unique(
+        np.linspace(0, max(n - 1, 0), min(policy.sample_size, n)).astype(
+            np.intp
         )
+    )
 
-        model, fracs, res = _solve_cube(G_aug, d_aug)
+
+def _solve_cube(
+    G: Annotated[npt.NDArray[np.float32], (2,)],
+    d: Annotated[npt.NDArray, (3,)],
+    add_to_one: bool = False,
+    policy: PrecisionPolicy = PrecisionPolicy(),
+    backend: SolverBackend = NumpyBackend(),
+    factor: Optional[Factorization] = None,
+) -> Tuple[ImageCubeLike, ImageCubeLike, ImageCubeLike, AccuracyReport]:
+    """
+    Pixel-major solve for data whose band axis is last in memory (BIP) or
+    that has no zero-copy matrix view (BIL), with the kernels of `backend`.
+
+    If `add_to_one`, `G` is the augmented design matrix and `d` is implicitly
+    extended with a trailing 1 for the sum-to-one row, so no augmented copy
+    of the data is formed.
+    """
+    if factor is None:
+        factor = _factor(G)
+    prefix = factor.prefix
+    nb = d.shape[-1]
+
+    if not policy.refine:
+        fracs, model, res = backend.solve(prefix, G, d, add_to_one)
+        npix = int(np.prod(d.shape[:-1]))
+        idx = np.unravel_index(_sample(npix, policy), d.shape[:-1])
+        max_error = _refine(
+            G, factor, [(fracs[idx], d[idx])], add_to_one, apply=False
+        )
+        return model, fracs, res, _report(factor, max_error, False)
+
+    fracs = backend.project(prefix, d, add_to_one)
+    nc = fracs.shape[-1]
+    # Whole rows per block; `fracs` is contiguous, so its blocks are updated
+    # in place through the reshaped views.
+    per_row = max(int(np.prod(d.shape[1:-1])), 1)
+    rows = max(policy.block_size // per_row, 1)
+    blocks = (
+        (
+            fracs[i : i + rows].reshape(-1, nc),
+            d[i : i + rows].reshape(-1, nb),
+        )
+        for i in range(0, d.shape[0], rows)
+    )
+    max_error = _refine(G, factor, blocks, add_to_one, apply=True)
+    model, res = backend.reconstruct(G, fracs, d, add_to_one)
+    return model, fracs, res, _report(factor, max_error, True)
+
+
+def _solve_band_major(
+    G: Annotated[npt.NDArray[np.float32], (2,)],
+    d: Annotated[npt.NDArray, (3,)],
+    add_to_one: bool = False,
+    policy: PrecisionPolicy = PrecisionPolicy(),
+    factor: Optional[Factorization] = None,
+) -> Tuple[ImageCubeLike, ImageCubeLike, ImageCubeLike, AccuracyReport]:
+    """
+    Solve for data whose band axis is outermost in memory (BSQ). The cube is
+    viewed as a (bands x pixels) matrix and solved with plain GEMMs; outputs
+    are returned as (rows, columns, ...) views of band-major arrays.
+    """
+    if factor is None:
+        factor = _factor(G)
+    prefix = factor.prefix
+    nrows, ncols, nb = d.shape
+    # A view for whole BSQ cubes, a single copy for windows of them.
+    dt = np.moveaxis(d, -1, 0).reshape(nb, -1)
+
+    if dt.dtype == np.float32:
+        fracs = prefix[:, :nb] @ dt
+    else:
+        # Cast one block of pixels at a time rather than the whole cube.
+        fracs = np.empty((prefix.shape[0], dt.shape[1]), dtype=np.float32)
+        for start in range(0, dt.shape[1], policy.block_size):
+            sl = slice(start, start + policy.block_size)
+            fracs[:, sl] = prefix[:, :nb] @ dt[:, sl].astype(np.float32)
+    if add_to_one:
+        fracs += prefix[:, nb, None]
+
+    npix = dt.shape[1]
+    if policy.refine:
+        # Transposed views, so refinement updates `fracs` in place.
+        step = policy.block_size
+        blocks = (
+            (fracs[:, i : i + step].T, dt[:, i : i + step].T)
+            for i in range(0, npix, step)
+        )
+    else:
+        idx = _sample(npix, policy)
+        blocks = iter([(fracs[:, idx].T, dt[:, idx].T)])
+    max_error = _refine(G, factor, blocks, add_to_one, policy.refine)
+    report = _report(factor, max_error, policy.refine)
+
+    model = G @ fracs
+
+    res = np.empty_like(model)
+    np.subtract(model[:nb], dt, out=res[:nb], casting="same_kind")
+    if add_to_one:
+        np.subtract(model[nb], 1, out=res[nb])
+
+    def _to_cube(a: npt.NDArray) -> ImageCubeLike:
+        return np.moveaxis(a.reshape(-1, nrows, ncols), 0, -1)
+
+    return _to_cube(model), _to_cube(fracs), _to_cube(res), report
+
+
+def _solve(
+    G: Annotated[npt.NDArray[np.float32], (2,)],
+    d: Annotated[npt.NDArray, (3,)],
+    add_to_one: bool = False,
+    policy: PrecisionPolicy = PrecisionPolicy(),
+    backend: SolverBackend = NumpyBackend(),
+    factor: Optional[Factorization] = None,
+) -> Tuple[ImageCubeLike, ImageCubeLike, ImageCubeLike, AccuracyReport]:
+    """
+    Picks the solve kernel that matches the memory layout of `d`. Band-major
+    solves are plain GEMMs and always run on NumPy.
+    """
+    if memory_interleave(d) is Interleave.BSQ:
+        return _solve_band_major(G, d, add_to_one, policy, factor)
+    return _solve_cube(G, d, add_to_one, policy, backend, factor)
+
+
+def _reduced_basis(
+    G: Annotated[npt.NDArray[np.float32], (2,)],
+    subspace: SpectralSubspace,
+    add_to_one: bool,
+) -> Annotated[npt.NDArray[np.float64], (2,)]:
+    """
+    Orthonormal basis spanning the endmembers (and the constant offset
+    column when `add_to_one`) plus the fitted subspace. Because the design
+    matrix lies inside it, the reduced solve gives the same fractions as the
+    full solve.
+    """
+    cols = [G, subspace.basis]
+    if add_to_one:
+        cols.insert(1, np.ones([G.shape[0], 1]))
+    U, s, _ = np.linalg.svd(
+        np.hstack(cols, dtype=np.float64), full_matrices=False
+    )
+    rank = np.sum(s > s[0] * max(U.shape) * np.finfo(np.float32).eps)
+    return U[:, :rank]
+
+
+def _project(
+    d: Annotated[npt.NDArray, (3,)],
+    U: Annotated[npt.NDArray[np.float64], (2,)],
+) -> tuple[
+    Annotated[npt.NDArray[np.float32], (3,)],
+    Annotated[npt.NDArray[np.float32], (2,)],
+]:
+    """
+    Projects every pixel of `d` onto the orthonormal columns of `U`.
+    Returns the coefficients and the norm of the part of each pixel outside
+    their span, both formed in float64 a block of pixels at a time. The
+    outside part is taken directly as d - U z: the difference of the norms
+    of d and z cancels once it is small.
+    """
+    nrows, ncols, nb = d.shape
+    z = np.empty((nrows, ncols, U.shape[1]), dtype=np.float32)
+    res_perp = np.empty((nrows, ncols), dtype=np.float32)
+    # Whole rows per block, or part of a row if one row is too large.
+    pixels = max(BLOCK_BYTES // (8 * nb), 1)
+    cols = min(pixels, ncols)
+    rows = max(pixels // ncols, 1)
+    for i in range(0, nrows, rows):
+        for j in range(0, ncols, cols):
+            block = (slice(i, i + rows), slice(j, j + cols))
+            y = np.asarray(d[block], dtype=np.float64)
+            shape = y.shape[:2]
+            y = y.reshape(-1, nb)
+            zb = y @ U
+            y -= zb @ U.T
+            z[block] = zb.reshape(*shape, -1)
+            res_perp[block] = np.sqrt(
+                np.einsum("ij,ij->i", y, y)
+            ).reshape(shape)
+    return z, res_perp
+
+
+def _unmix_reduced(
+    G: Annotated[npt.NDArray[np.float32], (2,)],
+    d: Annotated[npt.NDArray, (3,)],
+    subspace: SpectralSubspace,
+    add_to_one: bool,
+    policy: PrecisionPolicy,
+    backend: SolverBackend,
+) -> UnMixedCube:
+    U = _reduced_basis(G, subspace, add_to_one)
+    z, res_perp = _project(d, U)
+
+    if add_to_one:
+        G_red = _augment(U.T @ G, U.T @ np.ones(G.shape[0]))
     else:
-        model, fracs, res = _solve_cube(G, d)
+        G_red = (U.T @ G).astype(np.float32)
+
+    model, fracs, res, report = _solve(G_red, z, add_to_one, policy, backend)
+
+    return UnMixedCube(
+        model,
+        fracs,
+        res,
+        basis=U.astype(np.float32),
+        res_perp=res_perp,
+        accuracy=report,
+    )
+
+
+def unmix_spectral_cube(
+    mixed_cube: MixedCube,
+    add_to_one: bool = True,
+    subspace: Optional[SpectralSubspace] = None,
+    precision: Optional[PrecisionPolicy] = None,
+    backend: Optional[str] = None,
+    factor: Optional[Factorization] = None,
+) -> UnMixedCube:
+    """
+    Solves for the endmember fractions of every pixel.
+
+    The solve kernel is chosen from the memory layout of the data cube, so
+    BSQ cubes are solved band-major and BIP cubes pixel-major without first
+    being transposed or copied.
+
+    Parameters
+    ----------
+    mixed_cube: MixedCube
+        Design matrix and data cube.
+    add_to_one: bool, default=True
+        Add a sum-to-one row and a constant offset column to the system.
+    subspace: SpectralSubspace, optional
+        If given, data and endmembers are projected onto the span of the
+        endmembers plus this subspace (k columns) and solved there.
+        Fractions are unchanged, while the model and residual cubes are kept
+        as k subspace coefficients instead of band values, which cuts their
+        memory and I/O. It does not cut FLOPs: the projection and the
+        out-of-subspace residual cost about 2 k multiply-adds per band and
+        pixel, against 2 (endmembers + 1) for the full solve, and k is at
+        least endmembers + 1.
+    precision: PrecisionPolicy, optional
+        Precision of the solve (see `PrecisionPolicy`). Outputs are float32
+        in every case, and the result carries an `AccuracyReport`.
+    backend: str, optional
+        Name of the solver backend (see `hypmix.solver_backends`). Defaults
+        to the most preferred installed backend.
+    factor: Factorization, optional
+        `factorize(mixed_cube.G, add_to_one)`, computed ahead of time.
+        Cannot be combined with `subspace`.
+    """
+    G = mixed_cube.G
+    d = mixed_cube.d
+    if precision is None:
+        precision = PrecisionPolicy()
+    solver = get_backend(backend)
+
+    if subspace is not None:
+        if factor is not None:
+            raise ValueError("A subspace solve cannot take a factorization.")
+        return _unmix_reduced(G, d, subspace, add_to_one, precision, solver)
+
+    if add_to_one:
+        G = _augment(G)
+    model, fracs, res, report = _solve(
+        G, d, add_to_one, precision, solver, factor
+    )
 
-    return UnMixedCube(model, fracs, res)
+    return UnMixedCube(model, fracs, res, accuracy=report)
@@ -0,0 +1,181 @@
+"""
+Numba Solver Backend
+
+Compiled kernels for `hypmix.solver_backends`. The fused solve makes one pass
+over the data: each image row is read in memory order (so BIL rows are not
+read across their stride) into a float32 buffer, and every pixel of it is
+projected onto the solve matrix and its model and residual formed while the
+row is still in cache, with no cube-sized temporaries.
+
+Kernels release the GIL instead of spawning their own threads, so the tiles
+of a run are solved in parallel by its `workers`. They are compiled on first
+use and cached on disk. Reductions may be reassociated (so they vectorize),
+but NaN and infinity keep their IEEE behaviour, so NaN pixels stay NaN.
+"""
+
+# Dependencies
+import numba as nb  # type: ignore
+import numpy as np
+
+# Relative Imports
+from .solver_backends import _as_cube
+
+FASTMATH = {"reassoc", "contract", "arcp"}
+_jit = nb.njit(nogil=True, cache=True, fastmath=FASTMATH)
+# Elementwise kernels have nothing to vectorize and match NumPy exactly.
+_exact_jit = nb.njit(nogil=True, cache=True)
+
+
+@_jit
+def _load_row(d, r, buf):
+    """Row `r` of `d` as a contiguous float32 (columns x bands) buffer."""
+    ncols, nbands = buf.shape
+    if d.strides[2] <= d.strides[1]:
+        for c in range(ncols):
+            for j in range(nbands):
+                buf[c, j] = d[r, c, j]
+    else:
+        # Band-interleaved rows are read in memory order.
+        for j in range(nbands):
+            for c in range(ncols):
+                buf[c, j] = d[r, c, j]
+
+
+@_jit
+def _project_pixel(prefix, y, add_to_one, x):
+    nbands = y.shape[0]
+    for i in range(prefix.shape[0]):
+        acc = np.float32(0)
+        for j in range(nbands):
+            acc += prefix[i, j] * y[j]
+        if add_to_one:
+            acc += prefix[i, nbands]
+        x[i] = acc
+
+
+@_jit
+def _reconstruct_pixel(G, x, y, add_to_one, model, res):
+    nbands = y.shape[0]
+    for k in range(G.shape[0]):
+        acc = np.float32(0)
+        for i in range(G.shape[1]):
+            acc += G[k, i] * x[i]
+        model[k] = acc
+        if k < nbands:
+            res[k] = acc - y[k]
+        elif add_to_one:
+            res[k] = acc - np.float32(1)
+
+
+@_jit
+def _project(prefix, d, add_to_one, fracs):
+    buf = np.empty(d.shape[1:], np.float32)
+    for r in range(d.shape[0]):
+        _load_row(d, r, buf)
+        for c in range(d.shape[1]):
+            _project_pixel(prefix, buf[c], add_to_one, fracs[r, c])
+
+
+@_jit
+def _reconstruct(G, fracs, d, add_to_one, model, res):
+    buf = np.empty(d.shape[1:], np.float32)
+    for r in range(d.shape[0]):
+        _load_row(d, r, buf)
+        for c in range(d.shape[1]):
+            _reconstruct_pixel(
+                G, fracs[r, c], buf[c], add_to_one, model[r, c], res[r, c]
+            )
+
+
+@_jit
+def _solve(prefix, G, d, add_to_one, fracs, model, res):
+    buf = np.empty(d.shape[1:], np.float32)
+    for r in range(d.shape[0]):
+        _load_row(d, r, buf)
+        for c in range(d.shape[1]):
+            _project_pixel(prefix, buf[c], add_to_one, fracs[r, c])
+            _reconstruct_pixel(
+                G, fracs[r, c], buf[c], add_to_one, model[r, c], res[r, c]
+            )
+
+
+@_jit
+def _rss(res, out):
+    for r in range(res.shape[0]):
+        for c in range(res.shape[1]):
+            acc = 0.0
+            for k in range(res.shape[2]):
+                v = np.float64(res[r, c, k])
+                acc += v * v
+            out[r, c] = acc
+
+
+@_exact_jit
+def _shrink(X, D, thresh, Z):
+    for p in range(X.shape[0]):
+        for i in range(X.shape[1]):
+            z = X[p, i] - D[p, i] - thresh
+            if z < 0:
+                z = np.float32(0)
+            Z[p, i] = z
+            D[p, i] -= X[p, i] - z
+
+
+class NumbaBackend:
+    """Compiled, fused kernels (requires numba)."""
+
+    name = "numba"
+
+    def project(self, prefix, d, add_to_one):
+        cube = _as_cube(d)
+        fracs = np.empty((*cube.shape[:2], prefix.shape[0]), np.float32)
+        _project(np.ascontiguousarray(prefix), cube, add_to_one, fracs)
+        return fracs.reshape(*d.shape[:-1], -1)
+
+    def reconstruct(self, G, fracs, d, add_to_one):
+        cube = _as_cube(d)
+        shape = (*cube.shape[:2], G.shape[0])
+        model = np.empty(shape, np.float32)
+        res = np.empty(shape, np.float32)
+        _reconstruct(
+            np.ascontiguousarray(G),
+            _as_cube(fracs),
+            cube,
+            add_to_one,
+            model,
+            res,
+        )
+        out = (*d.shape[:-1], -1)
+        return model.reshape(out), res.reshape(out)
+
+    def solve(self, prefix, G, d, add_to_one):
+        cube = _as_cube(d)
+        fracs = np.empty((*cube.shape[:2], prefix.shape[0]), np.float32)
+        shape = (*cube.shape[:2], G.shape[0])
+        model = np.empty(shape, np.float32)
+        res = np.empty(shape, np.float32)
+        _solve(
+            np.ascontiguousarray(prefix),
+            np.ascontiguousarray(G),
+            cube,
+            add_to_one,
+            fracs,
+            model,
+            res,
+        )
+        out = (*d.shape[:-1], -1)
+        return fracs.reshape(out), model.reshape(out), res.reshape(out)
+
+    def rms(self, res, res_perp=None):
+        cube = _as_cube(res)
+        rss = np.empty(cube.shape[:2], np.float64)
+        _rss(cube, rss)
+        rss = rss.reshape(res.shape[:-1])
+        if res_perp is not None:
+            rss += np.square(res_perp, dtype=np.float64)
+        return np.sqrt(rss).astype(np.float32)
+
+    def shrink(self, X, D, thresh):
+        Z = np.empty_like(X)
+        _shrink(X, D, X.dtype.type(thresh), Z)
+        return Z
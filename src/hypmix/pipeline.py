@@ -0,0 +1,216 @@
+"""
+Pipelined Tile Runs
+
+Overlaps the three stages of a tiled run, so a run reading from disk takes
+about as long as the slower of reading and solving instead of their sum:
+
+- `TileReader` reads tiles ahead on a background thread into a fixed pool of
+  reusable tile buffers, which bounds the data held in memory.
+- The calling thread hands the tiles to the solve workers.
+- `TileWriter` writes solved tiles on a background thread, taking at most
+  `depth` tiles ahead of the one being written.
+
+Tiles move through every stage in order, so results are written (and
+checkpointed) in the same order as an unpipelined run. An error on either
+background thread is raised on the calling thread the next time it hands a
+tile to or takes a tile from that stage.
+
+Usage::
+
+    res = model.run("results.hdf5", "m1", tile_rows=256, pipeline=True)
+"""
+
+# Standard Libraries
+import threading
+from abc import ABC, abstractmethod
+from queue import Full, Queue
+from typing import Callable, Iterable, Optional
+
+# Dependencies
+import numpy as np
+import numpy.typing as npt
+
+# Relative Imports
+from .tiling import Tile
+
+# Tiles read ahead of the solves, and solved tiles queued for writing.
+PIPELINE_DEPTH = 2
+
+# Marks the end of a queue.
+_DONE = object()
+
+
+class _Stage(threading.Thread, ABC):
+    """
+    Daemon thread that runs `work` and keeps the exception it stopped
+    with.
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name=name, daemon=True)
+        self.error: Optional[BaseException] = None
+
+    def run(self):
+        try:
+            self.work()
+        except BaseException as e:
+            self.error = e
+            self.failed()
+
+    @abstractmethod
+    def work(self):
+        """Body of the stage thread."""
+
+    def failed(self):
+        """Called on the stage thread after `work` raised."""
+
+    def raise_error(self):
+        if self.error is not None:
+            raise self.error
+
+
+class TileReader(_Stage):
+    """
+    Reads `tiles` in order on a background thread.
+
+    Every tile is copied into one of `n_buffers` buffers, each sized for the
+    largest tile, and the buffer is reused once `release` returns it. The
+    reader waits for a free buffer, so at most `n_buffers` tiles are held
+    at a time.
+
+    Parameters
+    ----------
+    read: callable
+        Reads a tile, returning its (rows, columns, bands) data and the
+        classes of its pixels (or None). Data views of a memory-mapped
+        cube are only read from disk when copied into the buffer.
+    tiles: iterable of Tile
+        Tiles to read.
+    n_buffers: int
+        Number of tile buffers.
+    """
+
+    def __init__(
+        self,
+        read: Callable[[Tile], tuple[npt.NDArray, Optional[npt.NDArray]]],
+        tiles: Iterable[Tile],
+        n_buffers: int,
+    ):
+        super().__init__("hypmix-reader")
+        self._read = read
+        self.tiles = list(tiles)
+        self._rows = max((len(tile) for tile in self.tiles), default=0)
+        self._free: Queue = Queue(maxsize=n_buffers)
+        for _ in range(n_buffers):
+            self._free.put(None)
+        self._ready: Queue = Queue()
+        self._closing = threading.Event()
+
+    def work(self):
+        for tile in self.tiles:
+            buffer = self._free.get()
+            if self._closing.is_set():
+                return
+            d, labels = self._read(tile)
+            if buffer is None:
+                buffer = np.empty((self._rows, *d.shape[1:]), dtype=d.dtype)
+            view = buffer[: d.shape[0]]
+            np.copyto(view, d)
+            self._ready.put((tile, view, labels, buffer))
+        self._ready.put(_DONE)
+
+    def failed(self):
+        self._ready.put(_DONE)
+
+    def get(
+        self,
+    ) -> Optional[tuple[Tile, npt.NDArray, Optional[npt.NDArray], object]]:
+        """
+        Next tile as (tile, data, labels, buffer), or None once every tile
+        has been read. Pass `buffer` to `release` when `data` is no longer
+        used.
+        """
+        item = self._ready.get()
+        if item is _DONE:
+            self._ready.put(_DONE)
+            self.raise_error()
+            return None
+        return item
+
+    def release(self, buffer: object):
+        self._free.put(buffer)
+
+    def close(self):
+        """Stops reading ahead and waits for the reader thread."""
+        self._closing.set()
+        try:
+            # Wakes a reader waiting for a buffer; a full pool means it is
+            # not waiting.
+            self._free.put_nowait(None)
+        except Full:
+            pass
+        self.join()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TileWriter(_Stage):
+    """
+    Calls `write` on a background thread for every item passed to `put`, in
+    order. `put` blocks while `depth` items are waiting to be written.
+    Written items are returned by `written`.
+    """
+
+    def __init__(self, write: Callable[..., None], depth: int):
+        super().__init__("hypmix-writer")
+        self._write = write
+        self._queue: Queue = Queue(maxsize=depth)
+        self._written: Queue = Queue()
+
+    def work(self):
+        while True:
+            item = self._queue.get()
+            if item is _DONE:
+                return
+            self._write(*item)
+            self._written.put(item)
+
+    def failed(self):
+        # Keep draining so `put` and `close` never block on a dead writer.
+        while self._queue.get() is not _DONE:
+            pass
+
+    def put(self, *item):
+        self.raise_error()
+        self._queue.put(item)
+
+    def written(self) -> list[tuple]:
+        """Items written since the last call, in order."""
+        items = []
+        while not self._written.empty():
+            items.append(self._written.get())
+        return items
+
+    def close(self):
+        """Writes the queued items and waits for the writer thread."""
+        self._queue.put(_DONE)
+        self.join()
+        self.raise_error()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        if exc[0] is None:
+            self.close()
+        else:
+            # Queued tiles are still written, so completed work stays
+            # checkpointed, but the original error propagates.
+            self._queue.put(_DONE)
+            self.join()
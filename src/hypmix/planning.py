@@ -0,0 +1,407 @@
+"""
+Run Planning
+
+Estimates the peak memory and floating point work of a model run from the
+shape of the problem alone, and picks a tile size and worker count that keep
+a tiled run within a memory budget. `MixtureModel.plan` returns the plan as a
+dry run; `MixtureModel.run(memory_budget=...)` applies it.
+
+Usage::
+
+    plan = model.plan(memory_budget=2 * 1024**3)
+    print(plan.report())
+    res = model.run("results.hdf5", "m1", memory_budget=2 * 1024**3)
+"""
+
+# Standard Libraries
+import os
+from dataclasses import dataclass, replace
+from typing import Optional
+
+# Dependencies
+import numpy as np
+import numpy.typing as npt
+
+# Relative Imports
+from .model_math import PrecisionPolicy
+from .sparse_unmixing import SUnSALOptions
+from .robust_unmixing import RobustOptions, WeightMode
+from .solver_backends import BLOCK_BYTES
+
+F32 = np.dtype(np.float32).itemsize
+F64 = np.dtype(np.float64).itemsize
+
+
+class MemoryBudgetError(Exception):
+    def __init__(self, message: str) -> None:
+        super().__init__(message)
+
+
+@dataclass
+class PixelCost:
+    """
+    Attributes
+    ----------
+    bytes: int
+        Peak working memory per pixel of a tile: the tile data, the solved
+        outputs and the temporaries that coexist with them.
+    output_bytes: int
+        Part of `bytes` taken by the result arrays.
+    flops: float
+        Floating point operations per pixel.
+    fixed_bytes: int
+        Memory that does not scale with the tile size (design matrices and
+        cached factorizations).
+    data_bytes: int
+        Part of `bytes` taken by the tile data.
+    worker_bytes: int
+        Memory every concurrent solve holds whatever the tile size: blocked
+        temporaries and the pixel sample of the accuracy report.
+    setup_bytes: int
+        Memory used before the first tile is solved and released after,
+        such as the sample hashed for the result fingerprint.
+    """
+
+    bytes: int
+    output_bytes: int
+    flops: float
+    fixed_bytes: int
+    data_bytes: int = 0
+    worker_bytes: int = 0
+    setup_bytes: int = 0
+
+
+def _check_bytes(
+    n_rows: int, n_cols: int, n_bands: int, precision: PrecisionPolicy
+) -> tuple[int, int]:
+    """
+    Memory of the accuracy check of an (n_rows x n_cols) least squares
+    solve, as (per tile pixel, per worker): a float64 refinement step over
+    blocks of the tile when the solve is refined, and otherwise over a
+    gathered sample of pixels.
+    """
+    step = (n_rows + 3 * n_cols) * F64
+    if precision.refine:
+        return step, 0
+    sample = step + n_cols * F32 + n_bands * F64
+    return 0, precision.sample_size * sample
+
+
+def pixel_cost(
+    n_bands: int,
+    n_endmembers: int,
+    dtype: npt.DTypeLike = np.float32,
+    add_to_one: bool = True,
+    subspace_dim: Optional[int] = None,
+    sparse: Optional[SUnSALOptions] = None,
+    robust: Optional[RobustOptions] = None,
+    precision: Optional[PrecisionPolicy] = None,
+) -> PixelCost:
+    """
+    Per-pixel memory and work of one solve, following the solve kernels in
+    `hypmix.model_math`, `hypmix.sparse_unmixing` and
+    `hypmix.robust_unmixing`.
+
+    Parameters
+    ----------
+    n_bands: int
+        Number of bands of the data cube.
+    n_endmembers: int
+        Number of endmembers (library spectra for sparse runs).
+    dtype: dtype, default=np.float32
+        Data type of the cube.
+    add_to_one: bool, default=True
+        Whether the sum-to-one row and offset column are part of the solve.
+    subspace_dim: int, optional
+        Number of components of a reduction subspace, if one is used.
+    sparse: SUnSALOptions, optional
+        Options of a sparse (SUnSAL) run.
+    robust: RobustOptions, optional
+        Options of a robust (IRLS) run. Work is estimated for `max_iter`
+        iterations of every pixel, an upper bound.
+    precision: PrecisionPolicy, optional
+        Precision of a least squares solve. Defaults to `PrecisionPolicy()`.
+    """
+    if precision is None:
+        precision = PrecisionPolicy()
+    B, M = n_bands, n_endmembers
+    data = B * np.dtype(dtype).itemsize
+
+    if sparse is not None:
+        L = M
+        # fracs, model, res and res**2 for every pixel of the tile. The ADMM
+        # iterates (AtY, X, Z, Z_prev, D and one product) only exist for one
+        # block at a time, so they count with the factorization as fixed.
+        outputs = (L + 1 + 2 * (B + 1)) * F32
+        flops = 4 * B * L + sparse.max_iter * (2 * L * L + 8 * L)
+        fixed = (B * L + 3 * L * L) * F64
+        return PixelCost(
+            data + outputs + (B + 1) * F32 + F32,
+            outputs,
+            float(flops),
+            fixed,
+            data,
+            6 * L * F32 * sparse.block_size,
+        )
+
+    C = M + 1 if add_to_one else M
+    if robust is not None:
+        Ba = B + 1
+        C = M + 1
+        # Same outputs as least squares. The block holds the augmented data,
+        # two iterates, and about eight band-sized temporaries while the
+        # residuals are turned into quantized weights; rare weight patterns
+        # stack their (C x Ba) solve matrices.
+        outputs = (C + 2 * Ba + 1) * F32
+        block = (Ba + 2 * C + 8 * B) * F32 + 2 * B
+        iteration = 4 * Ba * C + 12 * B
+        if robust.weights is WeightMode.PIXEL:
+            block += 2 * C * Ba * F64
+            iteration += 2 * B * C * C
+        flops = 2 * Ba * C + robust.max_iter * iteration
+        fixed = 3 * Ba * C * F32
+        return PixelCost(
+            data + outputs + Ba * F32,
+            outputs,
+            float(flops),
+            fixed,
+            data,
+            block * robust.block_size,
+        )
+
+    if subspace_dim is not None:
+        # Projected coefficients and a solve in k dims. The data is
+        # projected, and its out-of-subspace residual formed, in float64
+        # blocks of about BLOCK_BYTES.
+        k = C + subspace_dim
+        ka = k + 1 if add_to_one else k
+        outputs = (C + 2 * ka + 1) * F32
+        check, sample = _check_bytes(ka, C, k, precision)
+        temps = k * F32 + ka * F32 + check
+        flops = 4 * B * k + 2 * B + 2 * C * k + 2 * ka * C + 3 * ka
+        fixed = (B * k + k * k) * F64
+        worker = 3 * BLOCK_BYTES + sample
+        return PixelCost(
+            data + outputs + temps + F32,
+            outputs,
+            float(flops),
+            fixed,
+            data,
+            worker,
+        )
+
+    Ba = B + 1 if add_to_one else B
+    # fracs, model, res and rsquared; res**2 is a full temporary. The
+    # kernels copy blocks of about BLOCK_BYTES that are not laid out as a
+    # pixel matrix.
+    check, sample = _check_bytes(Ba, C, B, precision)
+    outputs = (C + 2 * Ba + 1) * F32
+    temps = Ba * F32 + check
+    flops = 2 * C * B + 2 * Ba * C + 3 * Ba
+    fixed = 3 * Ba * C * F32
+    worker = BLOCK_BYTES + sample
+    return PixelCost(
+        data + outputs + temps, outputs, float(flops), fixed, data, worker
+    )
+
+
+def class_gather_cost(cost: PixelCost, n_bands: int) -> PixelCost:
+    """
+    Cost of a class-map run (see `hypmix.class_unmixing`) that solves with
+    `cost`. Pixels are sorted by class, and each class is gathered and
+    solved as one batch, so a gathered copy of the data, the batch outputs
+    and the sort indices coexist with the tile.
+    """
+    gather = n_bands * F32 + cost.output_bytes + 3 * np.dtype(np.intp).itemsize
+    return replace(cost, bytes=cost.bytes + gather)
+
+
+@dataclass
+class RunPlan:
+    """
+    Attributes
+    ----------
+    n_rows: int
+        Result rows of the run (pixels, for sparse regions).
+    pixels_per_row: int
+        Pixels in one result row.
+    cost: PixelCost
+        Per-pixel cost of the solve.
+    tile_rows: int
+        Rows solved per tile.
+    workers: int
+        Tiles solved concurrently.
+    memory_budget: int or None
+        Budget the plan was made for, in bytes.
+    prefetch: int
+        Tiles a pipelined run reads ahead of and queues behind the solves
+        (see `hypmix.pipeline`); 0 for unpipelined runs.
+    """
+
+    n_rows: int
+    pixels_per_row: int
+    cost: PixelCost
+    tile_rows: int
+    workers: int
+    memory_budget: Optional[int] = None
+    prefetch: int = 0
+
+    @property
+    def n_pixels(self) -> int:
+        return self.n_rows * self.pixels_per_row
+
+    @property
+    def n_tiles(self) -> int:
+        return -(-self.n_rows // self.tile_rows)
+
+    @property
+    def peak_bytes(self) -> int:
+        """Peak memory of a tiled run with this plan."""
+        tile_pixels = self.tile_rows * self.pixels_per_row
+        return _peak_bytes(
+            self.cost,
+            self.workers * self.cost.worker_bytes
+            + tile_pixels
+            * _tile_bytes(self.cost, self.workers, self.prefetch),
+        )
+
+    @property
+    def untiled_bytes(self) -> int:
+        """Peak memory of solving the whole run at once."""
+        return _peak_bytes(
+            self.cost,
+            self.cost.worker_bytes + self.n_pixels * self.cost.bytes,
+        )
+
+    @property
+    def output_bytes(self) -> int:
+        """Size of the result arrays of the whole run."""
+        return self.n_pixels * self.cost.output_bytes
+
+    @property
+    def flops(self) -> float:
+        return self.n_pixels * self.cost.flops
+
+    @property
+    def fits(self) -> bool:
+        return self.memory_budget is None or (
+            self.peak_bytes <= self.memory_budget
+        )
+
+    def report(self) -> str:
+        """Human-readable dry-run report."""
+        lines = [
+            f"pixels:          {self.n_pixels:,} ({self.n_rows:,} rows)",
+            f"work:            {self.flops / 1e9:,.2f} GFLOP",
+            f"result size:     {_fmt_bytes(self.output_bytes)}",
+            f"untiled peak:    {_fmt_bytes(self.untiled_bytes)}",
+            f"tile rows:       {self.tile_rows:,} ({self.n_tiles:,} tiles)",
+            f"workers:         {self.workers}",
+        ]
+        if self.prefetch:
+            lines.append(f"pipeline depth:  {self.prefetch}")
+        lines.append(f"tiled peak:      {_fmt_bytes(self.peak_bytes)}")
+        if self.memory_budget is not None:
+            status = "fits" if self.fits else "DOES NOT FIT"
+            lines.append(
+                f"memory budget:   {_fmt_bytes(self.memory_budget)} ({status})"
+            )
+        return "\n".join(lines)
+
+    def __str__(self) -> str:
+        return self.report()
+
+
+def _fmt_bytes(n: float) -> str:
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if abs(n) < 1024:
+            return f"{n:,.1f} {unit}"
+        n /= 1024
+    return f"{n:,.1f} TiB"
+
+
+def _peak_bytes(cost: PixelCost, solve_bytes: int) -> int:
+    """Peak memory of a run whose solves take `solve_bytes`."""
+    return cost.fixed_bytes + max(cost.setup_bytes, solve_bytes)
+
+
+def _tile_bytes(cost: PixelCost, workers: int, prefetch: int) -> int:
+    """
+    Memory per tile pixel of a run. A pipelined run also holds `prefetch`
+    tiles of data read ahead, and up to `prefetch` solved tiles queued for
+    the writer, the one being written and the one last written, until it is
+    reported.
+    """
+    pipeline = 0
+    if prefetch:
+        pipeline = prefetch * cost.data_bytes + (prefetch + 2) * (
+            cost.output_bytes
+        )
+    return workers * cost.bytes + pipeline
+
+
+def plan_run(
+    n_rows: int,
+    pixels_per_row: int,
+    cost: PixelCost,
+    memory_budget: Optional[int] = None,
+    workers: Optional[int] = None,
+    tile_rows: Optional[int] = None,
+    min_tile_rows: int = 16,
+    prefetch: int = 0,
+) -> RunPlan:
+    """
+    Chooses a tile size and worker count for a run.
+
+    Without a budget the whole run is one tile. With a budget, the largest
+    worker count (up to the number of CPUs) whose tiles still hold at least
+    `min_tile_rows` rows is used, and tiles are made as large as the budget
+    allows. A given `workers` is used as is, and a given `tile_rows` caps
+    the tile size. `prefetch` is the depth of a pipelined run, whose extra
+    tiles count against the budget.
+
+    Raises
+    ------
+    MemoryBudgetError
+        If not even a single row per tile fits in the budget.
+    """
+    if memory_budget is None:
+        rows = n_rows if tile_rows is None else tile_rows
+        return RunPlan(
+            n_rows, pixels_per_row, cost, rows, workers or 1, None, prefetch
+        )
+
+    row_bytes = cost.worker_bytes + pixels_per_row * _tile_bytes(
+        cost, 1, prefetch
+    )
+    if _peak_bytes(cost, row_bytes) > memory_budget:
+        raise MemoryBudgetError(
+            f"A memory budget of {_fmt_bytes(memory_budget)} cannot hold a "
+            f"single row ({_fmt_bytes(_peak_bytes(cost, row_bytes))})."
+        )
+
+    if workers is not None:
+        candidates = [workers]
+    else:
+        candidates = list(range(os.cpu_count() or 1, 0, -1))
+
+    for w in candidates:
+        available = max(
+            memory_budget - cost.fixed_bytes - w * cost.worker_bytes, 0
+        )
+        rows = available // (pixels_per_row * _tile_bytes(cost, w, prefetch))
+        if tile_rows is not None:
+            rows = min(rows, tile_rows)
+        # No more than one tile per worker is ever needed.
+        rows = min(rows, -(-n_rows // w))
+        if rows >= min(min_tile_rows, n_rows) or w == candidates[-1]:
+            break
+
+    if rows < 1:
+        raise MemoryBudgetError(
+            f"A memory budget of {_fmt_bytes(memory_budget)} cannot hold "
+            f"one row for each of {w} workers."
+        )
+    return RunPlan(
+        n_rows, pixels_per_row, cost, int(rows), w, memory_budget, prefetch
+    )
@@ -0,0 +1,161 @@
+"""
+Progress Reporting and Cancellation
+
+Tiled model runs report a `TileProgress` event after every completed tile
+and check a `CancelToken` before starting the next one. Because tiles are
+checkpointed, a cancelled run can later be resumed by running it again.
+
+Usage::
+
+    token = CancelToken()
+    res = model.run(
+        "results.hdf5", "m1", tile_rows=256,
+        progress=print_progress, cancel=token,
+    )
+
+    # or, as an iterator of events
+    for event in model.run_iter("results.hdf5", "m1", tile_rows=256):
+        print(event.fraction_done, event.eta)
+"""
+
+# Standard Libraries
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+# Relative Imports
+from .tiling import Tile
+from .model_math import UnMixedCube
+
+
+class RunCancelledError(Exception):
+    def __init__(self, message: str) -> None:
+        super().__init__(message)
+
+
+class CancelToken:
+    """
+    Thread-safe flag used to cooperatively stop a model run between tiles.
+    """
+
+    def __init__(self) -> None:
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def raise_if_cancelled(self) -> None:
+        if self.cancelled:
+            raise RunCancelledError("The model run was cancelled.")
+
+
+@dataclass
+class TileProgress:
+    """
+    Attributes
+    ----------
+    tile: Tile
+        The tile that just completed.
+    tiles_done: int
+        Number of completed tiles, including tiles resumed from a checkpoint.
+    tiles_total: int
+        Number of tiles in the run.
+    pixels_done: int
+        Number of completed pixels, including resumed ones.
+    pixels_total: int
+        Number of pixels in the run.
+    elapsed: float
+        Seconds since the run started.
+    throughput: float
+        Pixels solved per second in this session.
+    eta: float or None
+        Estimated seconds until the run completes.
+    unmixed: UnMixedCube, optional
+        The solved tile, for progressive display. It is not kept by the
+        run, so consumers may hold on to it.
+    """
+
+    tile: Tile
+    tiles_done: int
+    tiles_total: int
+    pixels_done: int
+    pixels_total: int
+    elapsed: float
+    throughput: float
+    eta: Optional[float]
+    unmixed: Optional[UnMixedCube] = None
+
+    @property
+    def fraction_done(self) -> float:
+        return self.pixels_done / max(self.pixels_total, 1)
+
+
+type ProgressCallback = Callable[[TileProgress], None]
+
+
+class ProgressTracker:
+    """
+    Turns tile completions into `TileProgress` events.
+
+    Parameters
+    ----------
+    tiles: list[Tile]
+        All tiles of the run.
+    pending: list[Tile]
+        Tiles that still have to be computed.
+    pixels_per_row: int
+        Number of pixels in one result row of a tile.
+    """
+
+    def __init__(
+        self, tiles: list[Tile], pending: list[Tile], pixels_per_row: int
+    ) -> None:
+        self.tiles_total = len(tiles)
+        self.pixels_per_row = pixels_per_row
+        self.pixels_total = sum(len(t) for t in tiles) * pixels_per_row
+        pending_pixels = sum(len(t) for t in pending) * pixels_per_row
+        self.tiles_done = self.tiles_total - len(pending)
+        self.pixels_done = self.pixels_total - pending_pixels
+        self._session_pixels = 0
+        self._start = time.perf_counter()
+
+    def update(
+        self, tile: Tile, unmixed: Optional[UnMixedCube] = None
+    ) -> TileProgress:
+        n = len(tile) * self.pixels_per_row
+        self.tiles_done += 1
+        self.pixels_done += n
+        self._session_pixels += n
+        elapsed = time.perf_counter() - self._start
+        throughput = self._session_pixels / elapsed if elapsed > 0 else 0.0
+        remaining = self.pixels_total - self.pixels_done
+        eta = remaining / throughput if throughput > 0 else None
+        return TileProgress(
+            tile,
+            self.tiles_done,
+            self.tiles_total,
+            self.pixels_done,
+            self.pixels_total,
+            elapsed,
+            throughput,
+            eta,
+            unmixed,
+        )
+
+
+def print_progress(p: TileProgress) -> None:
+    """Progress callback that keeps a one-line status on stderr."""
+    eta = "--" if p.eta is None else f"{p.eta:.0f}s"
+    sys.stderr.write(
+        f"\r{100 * p.fraction_done:5.1f}% | tile {p.tiles_done}/"
+        f"{p.tiles_total} | {p.throughput:,.0f} px/s | ETA {eta}   "
+    )
+    if p.tiles_done == p.tiles_total:
+        sys.stderr.write("\n")
+    sys.stderr.flush()
@@ -0,0 +1,149 @@
+"""
+Spectral Dimensionality Reduction
+
+Fits a low-dimensional band subspace (PCA or MNF) on a random sample of
+pixels so that `MixtureModel.run` can carry out the solve in k components
+instead of the full band dimension.
+
+Available Functions::
+
+    subspace = fit_subspace(cube, 5, ReductionMethod.MNF)
+    res = model.run("results.hdf5", "reduced_model", subspace=subspace)
+"""
+
+# Standard Libraries
+from dataclasses import dataclass
+from enum import Enum
+from typing import Optional
+from typing_extensions import Annotated
+
+# Dependencies
+import numpy as np
+import numpy.typing as npt
+
+# Relative Imports
+from .typing import ImageCube
+
+
+class ReductionMethod(Enum):
+    PCA = "pca"
+    MNF = "mnf"
+
+
+@dataclass
+class SpectralSubspace:
+    """
+    Orthonormal band-space basis the unmixing solve is carried out in.
+
+    Attributes
+    ----------
+    basis: NDArray[np.float32, (2,)]
+        (bands x k) matrix with orthonormal columns.
+    method: ReductionMethod
+        Method used to choose the subspace.
+    """
+
+    basis: Annotated[npt.NDArray[np.float32], (2,)]
+    method: ReductionMethod
+
+    @property
+    def n_components(self) -> int:
+        return self.basis.shape[1]
+
+
+def _sample_pixels(
+    cube: ImageCube,
+    max_samples: int,
+    rng: np.random.Generator,
+    neighbours: bool,
+) -> tuple[npt.NDArray[np.float64], Optional[npt.NDArray[np.float64]]]:
+    """
+    Draws random pixels, and their right-hand neighbours if `neighbours`,
+    keeping only the samples that are finite in every band.
+    """
+    nrows, ncols, _ = cube.data.shape
+    last = ncols - 1 if neighbours else ncols
+    n = min(max_samples, nrows * last)
+    rows = rng.integers(0, nrows, size=n)
+    cols = rng.integers(0, max(last, 1), size=n)
+    X = cube.data[rows, cols, :].astype(np.float64)
+    valid = np.isfinite(X).all(axis=1)
+    if not neighbours:
+        return X[valid], None
+    Xn = cube.data[rows, cols + 1, :].astype(np.float64)
+    valid &= np.isfinite(Xn).all(axis=1)
+    return X[valid], Xn[valid]
+
+
+def fit_subspace(
+    cube: ImageCube,
+    n_components: int,
+    method: ReductionMethod = ReductionMethod.PCA,
+    max_samples: int = 50_000,
+    seed: Optional[int] = None,
+) -> SpectralSubspace:
+    """
+    Fits a spectral subspace on a random sample of pixels.
+
+    Parameters
+    ----------
+    cube: ImageCube
+        Spectral data cube.
+    n_components: int
+        Number of components to keep.
+    method: ReductionMethod, default=ReductionMethod.PCA
+        `PCA` keeps the directions of largest variance. `MNF` keeps the
+        directions of largest signal-to-noise ratio, with the noise
+        covariance estimated from differences of horizontally adjacent
+        pixels, so it needs a cube at least two columns wide.
+    max_samples: int, default=50_000
+        Number of randomly sampled pixels used for the fit.
+    seed: int, optional
+        Seed for the random number generator.
+
+    Returns
+    -------
+    subspace: SpectralSubspace
+        Orthonormal basis of the fitted subspace.
+
+    Raises
+    ------
+    ValueError
+        If too few sampled pixels (MNF: adjacent pixel pairs) are finite
+        in every band to fit `n_components`.
+    """
+    rng = np.random.default_rng(seed)
+    mnf = method is ReductionMethod.MNF
+    X, Xn = _sample_pixels(cube, max_samples, rng, neighbours=mnf)
+    # MNF covariances need one more sample than their rank.
+    needed = n_components + 1 if mnf else n_components
+    if X.shape[0] < needed:
+        what = "pairs of horizontally adjacent pixels" if mnf else "pixels"
+        raise ValueError(
+            f"Fitting {n_components} {method.name} components needs at "
+            f"least {needed} valid {what}, but only {X.shape[0]} were "
+            "sampled."
+        )
+    Xc = X - X.mean(axis=0)
+
+    match method:
+        case ReductionMethod.PCA:
+            _, _, Vt = np.linalg.svd(Xc, full_matrices=False)
+            loadings = Vt[:n_components].T
+        case ReductionMethod.MNF:
+            cov = Xc.T @ Xc / (Xc.shape[0] - 1)
+            assert Xn is not None
+            noise = (X - Xn) / np.sqrt(2)
+            noise_cov = noise.T @ noise / (noise.shape[0] - 1)
+            noise_cov += 1e-12 * np.trace(noise_cov) * np.eye(len(noise_cov))
+            L = np.linalg.cholesky(noise_cov)
+            L_inv = np.linalg.inv(L)
+            _, U = np.linalg.eigh(L_inv @ cov @ L_inv.T)
+            # Generalized eigenvectors, largest SNR first.
+            V = L_inv.T @ U[:, ::-1][:, :n_components]
+            # Columns of noise_cov @ V reconstruct the data from the MNF
+            # components, so they span the selected subspace.
+            loadings = noise_cov @ V
+
+    basis, _ = np.linalg.qr(loadings)
+    return SpectralSubspace(basis.astype(np.float32), method)
@@ -0,0 +1,226 @@
+"""
+Spectral Resampling
+
+Resamples spectra from one set of wavelengths onto another, either by
+linear interpolation or by convolution with Gaussian band-pass functions.
+Each resampling is expressed as a sparse (target bands x source bands)
+matrix that is cached by its source and target wavelengths, so a whole
+library can be resampled with one matrix product and the matrix is reused
+for every scene from the same sensor.
+
+Usage::
+
+    data = resample_spectra(lab_spectra, lab_wvl, cube.wvl)
+    data = resample_spectra(
+        lab_spectra, lab_wvl, cube.wvl, ResampleMethod.GAUSSIAN, fwhm
+    )
+"""
+
+# Standard Libraries
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from enum import Enum
+from typing import Optional
+from typing_extensions import Annotated
+
+# Dependencies
+import numpy as np
+import numpy.typing as npt
+
+# Relative Imports
+from .typing import SpectrumLike
+
+FWHM_TO_SIGMA = 1 / (2 * np.sqrt(2 * np.log(2)))
+CACHE_SIZE = 32
+
+
+class ResampleMethod(Enum):
+    LINEAR = "linear"
+    GAUSSIAN = "gaussian"
+
+
+@dataclass
+class ResamplingMatrix:
+    """
+    Sparse resampling matrix stored row-wise with a fixed number of
+    non-zeros per row (ELLPACK layout).
+
+    Attributes
+    ----------
+    indices: NDArray[np.intp, (2,)]
+        (target bands x k) source band index of each non-zero.
+    weights: NDArray[np.float64, (2,)]
+        (target bands x k) weight of each non-zero. Padding has weight 0.
+    n_source: int
+        Number of source bands.
+    """
+
+    indices: Annotated[npt.NDArray[np.intp], (2,)]
+    weights: Annotated[npt.NDArray[np.float64], (2,)]
+    n_source: int
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return (self.indices.shape[0], self.n_source)
+
+    def apply(self, spectra: npt.NDArray) -> npt.NDArray[np.float32]:
+        """
+        Resamples a (..., source bands) array of spectra to
+        (..., target bands).
+        """
+        spectra = np.asarray(spectra)
+        out = np.zeros((*spectra.shape[:-1], self.shape[0]))
+        # One gather per non-zero slot keeps temporaries at the output size.
+        for j in range(self.indices.shape[1]):
+            out += spectra[..., self.indices[:, j]] * self.weights[:, j]
+        return out.astype(np.float32)
+
+    def to_dense(self) -> Annotated[npt.NDArray[np.float64], (2,)]:
+        dense = np.zeros(self.shape)
+        rows = np.repeat(np.arange(self.shape[0]), self.indices.shape[1])
+        np.add.at(dense, (rows, self.indices.ravel()), self.weights.ravel())
+        return dense
+
+
+_MATRIX_CACHE: OrderedDict[tuple, ResamplingMatrix] = OrderedDict()
+# Tiles are solved on several threads.
+_MATRIX_LOCK = threading.Lock()
+
+
+def _check_range(src: np.ndarray, dst: np.ndarray) -> None:
+    outside = (dst < src[0]) | (dst > src[-1])
+    if np.any(outside):
+        raise ValueError(
+            f"Target wavelengths {dst[outside]} fall outside of the source "
+            f"range [{src[0]}, {src[-1]}]."
+        )
+
+
+def _linear_matrix(src: np.ndarray, dst: np.ndarray) -> ResamplingMatrix:
+    _check_range(src, dst)
+    hi = np.clip(np.searchsorted(src, dst), 1, len(src) - 1)
+    lo = hi - 1
+    t = (dst - src[lo]) / (src[hi] - src[lo])
+    return ResamplingMatrix(
+        np.stack((lo, hi), axis=1), np.stack((1 - t, t), axis=1), len(src)
+    )
+
+
+def _gaussian_matrix(
+    src: np.ndarray, dst: np.ndarray, fwhm: np.ndarray
+) -> ResamplingMatrix:
+    _check_range(src, dst)
+    sigma = fwhm * FWHM_TO_SIGMA
+    lo = np.searchsorted(src, dst - 3 * sigma)
+    hi = np.searchsorted(src, dst + 3 * sigma, side="right")
+    k = max(int(np.max(hi - lo)), 1)
+
+    idx = lo[:, None] + np.arange(k)
+    inside = idx < hi[:, None]
+    idx = np.clip(idx, 0, len(src) - 1)
+    # Gaussian response times the width of each source sample.
+    width = np.gradient(src)[idx]
+    weights = np.exp(-0.5 * ((src[idx] - dst[:, None]) / sigma[:, None]) ** 2)
+    weights = np.where(inside, weights * width, 0)
+    total = weights.sum(axis=1)
+
+    # Band-passes narrower than the source sampling fall back to linear
+    # interpolation.
+    undersampled = total == 0
+    if np.any(undersampled):
+        lin = _linear_matrix(src, dst[undersampled])
+        pad = k - 2
+        if pad < 0:
+            idx = np.pad(idx, ((0, 0), (0, -pad)))
+            weights = np.pad(weights, ((0, 0), (0, -pad)))
+            pad = 0
+        idx[undersampled] = np.pad(lin.indices, ((0, 0), (0, pad)))
+        weights[undersampled] = np.pad(lin.weights, ((0, 0), (0, pad)))
+        total[undersampled] = 1
+
+    return ResamplingMatrix(idx, weights / total[:, None], len(src))
+
+
+def resampling_matrix(
+    src_wvl: SpectrumLike,
+    dst_wvl: SpectrumLike,
+    method: ResampleMethod = ResampleMethod.LINEAR,
+    fwhm: Optional[float | npt.NDArray] = None,
+) -> ResamplingMatrix:
+    """
+    Sparse matrix that resamples spectra from `src_wvl` to `dst_wvl`.
+    Matrices are cached by (method, source wavelengths, target wavelengths,
+    fwhm).
+
+    Parameters
+    ----------
+    src_wvl: NDArray[(1,)]
+        Source wavelengths.
+    dst_wvl: NDArray[(1,)]
+        Target wavelengths. Must lie within the source range.
+    method: ResampleMethod, default=ResampleMethod.LINEAR
+        `LINEAR` interpolates between the two neighbouring source bands.
+        `GAUSSIAN` convolves with a Gaussian band-pass of width `fwhm`
+        centered on each target band.
+    fwhm: float or NDArray[(1,)], optional
+        Full width at half maximum of each target band, in the units of the
+        wavelengths. Defaults to the target band spacing.
+
+    Raises
+    ------
+    ValueError
+        If a target wavelength lies outside of the source range.
+    """
+    src = np.asarray(src_wvl, dtype=np.float64)
+    dst = np.asarray(dst_wvl, dtype=np.float64)
+    fwhm_arr: Optional[np.ndarray] = None
+    fwhm_key: Optional[bytes] = None
+    if method is ResampleMethod.GAUSSIAN:
+        if fwhm is None:
+            fwhm_arr = np.gradient(dst) if len(dst) > 1 else np.ones(1)
+        else:
+            fwhm_arr = np.broadcast_to(
+                np.asarray(fwhm, dtype=np.float64), dst.shape
+            )
+        fwhm_key = fwhm_arr.tobytes()
+
+    key = (method.value, src.tobytes(), dst.tobytes(), fwhm_key)
+    with _MATRIX_LOCK:
+        cached = _MATRIX_CACHE.get(key)
+        if cached is not None:
+            _MATRIX_CACHE.move_to_end(key)
+            return cached
+
+    order = np.argsort(src, kind="stable")
+    src_sorted = src[order]
+    if fwhm_arr is not None:
+        matrix = _gaussian_matrix(src_sorted, dst, fwhm_arr)
+    else:
+        matrix = _linear_matrix(src_sorted, dst)
+    # Point back at the caller's (possibly unsorted) band order.
+    matrix.indices = order[matrix.indices]
+
+    with _MATRIX_LOCK:
+        _MATRIX_CACHE[key] = matrix
+        if len(_MATRIX_CACHE) > CACHE_SIZE:
+            _MATRIX_CACHE.popitem(last=False)
+    return matrix
+
+
+def needs_resampling(src_wvl: SpectrumLike, dst_wvl: SpectrumLike) -> bool:
+    return len(src_wvl) != len(dst_wvl) or not np.allclose(src_wvl, dst_wvl)
+
+
+def resample_spectra(
+    spectra: npt.NDArray,
+    src_wvl: SpectrumLike,
+    dst_wvl: SpectrumLike,
+    method: ResampleMethod = ResampleMethod.LINEAR,
+    fwhm: Optional[float | npt.NDArray] = None,
+) -> npt.NDArray[np.float32]:
+    """
+    Resamples a (..., source bands) array of spectra onto `dst_wvl` with a
+    cached `resampling_matrix`.
+    """
+    return resampling_matrix(src_wvl, dst_wvl, method, fwhm).apply(spectra)
@@ -0,0 +1,304 @@
+"""
+Robust Unmixing
+
+Iteratively reweighted least squares (IRLS) with a Huber or Tukey loss, so
+that noisy bands (detector edges, calibration artifacts) stop dominating the
+fit. Each iteration weights the augmented system (with its sum-to-one row)
+by the loss of the standardized residuals and re-solves::
+
+    x = (G^T W G)^-1 G^T W d
+
+Weights are either one per band, shared by a block of pixels, or one per
+band of every pixel. Per-pixel weights are quantized to a few levels, and
+pixels are grouped by their weight pattern, so each distinct pattern is
+factorized once and its pixels solved with one product. The factorizations
+are reused across iterations and blocks. Patterns beyond the `max_patterns`
+most frequent ones are solved together as one stacked batch.
+
+Usage::
+
+    res = model.run("results.hdf5", "robust", robust=RobustOptions())
+    res = model.run(
+        "results.hdf5",
+        "robust_bands",
+        robust=RobustOptions(loss=RobustLoss.TUKEY, weights=WeightMode.BAND),
+    )
+"""
+
+# Standard Libraries
+from dataclasses import dataclass
+from enum import Enum
+from typing import Optional
+from typing_extensions import Annotated
+
+# Dependencies
+import numpy as np
+import numpy.typing as npt
+
+# Relative Imports
+from .model_math import MixedCube, UnMixedCube, _augment
+
+# Rescales the median absolute deviation to a Gaussian standard deviation.
+MAD_TO_SIGMA = 1.4826
+# Relative ridge added to weighted normal matrices.
+RIDGE = 1e-9
+
+
+class RobustLoss(Enum):
+    HUBER = "huber"
+    TUKEY = "tukey"
+
+
+class WeightMode(Enum):
+    BAND = "band"
+    PIXEL = "pixel"
+
+
+@dataclass(frozen=True)
+class RobustOptions:
+    """
+    Parameters
+    ----------
+    loss: RobustLoss, default=RobustLoss.HUBER
+        Loss whose IRLS weights are used. Huber down-weights outliers by
+        1 / |u|, Tukey's biweight rejects them entirely beyond `tuning`.
+    tuning: float, optional
+        Tuning constant in units of the residual scale. Defaults to 1.345
+        (Huber) or 4.685 (Tukey), the 95% Gaussian efficiency values.
+    weights: WeightMode, default=WeightMode.PIXEL
+        `PIXEL` weights every band of every pixel by its own standardized
+        residual. `BAND` gives each band one weight per block of pixels,
+        from the spread of its residuals relative to the other bands.
+    band_weights: tuple[float, ...], optional
+        Fixed prior weight of each band (e.g. 0 for known bad bands),
+        multiplied into the robust weights before they are quantized.
+    max_iter: int, default=20
+        Maximum number of reweighting iterations per block.
+    tol: float, default=1e-4
+        A pixel (a block, for `BAND` weights) stops once no fraction
+        changes by more than `tol`, or its quantized weights stop changing.
+    levels: int, default=8
+        Number of levels per-pixel weights are quantized to. Fewer levels
+        give fewer distinct weight patterns to factorize.
+    max_patterns: int, default=64
+        Distinct weight patterns per iteration that get a reusable
+        factorization. Pixels with rarer patterns are solved together as a
+        stacked batch.
+    block_size: int, default=4096
+        Number of pixels solved together.
+    min_scale: float, default=1e-6
+        Lower bound of the residual scale, in data units, so that perfect
+        fits do not standardize to infinity.
+    """
+
+    loss: RobustLoss = RobustLoss.HUBER
+    tuning: Optional[float] = None
+    weights: WeightMode = WeightMode.PIXEL
+    band_weights: Optional[tuple[float, ...]] = None
+    max_iter: int = 20
+    tol: float = 1e-4
+    levels: int = 8
+    max_patterns: int = 64
+    block_size: int = 4096
+    min_scale: float = 1e-6
+
+
+DEFAULT_TUNING = {RobustLoss.HUBER: 1.345, RobustLoss.TUKEY: 4.685}
+
+
+def loss_weights(u: npt.NDArray, opts: RobustOptions) -> npt.NDArray:
+    """IRLS weights of standardized residuals `u`."""
+    c = opts.tuning if opts.tuning is not None else DEFAULT_TUNING[opts.loss]
+    a = np.abs(u)
+    if opts.loss is RobustLoss.HUBER:
+        return np.minimum(1, c / np.maximum(a, 1e-12)).astype(np.float32)
+    return np.where(a < c, (1 - (a / c) ** 2) ** 2, 0).astype(np.float32)
+
+
+def _weighted_prefix(
+    G: Annotated[npt.NDArray[np.float32], (2,)], w: npt.NDArray
+) -> Annotated[npt.NDArray[np.float32], (2,)]:
+    """
+    (G^T W G)^-1 G^T W for one weight vector `w`, or for a stack of them.
+    A tiny ridge keeps patterns that reject too many bands solvable.
+    """
+    G64 = G.astype(np.float64)
+    GtW = np.swapaxes(G64 * w.astype(np.float64)[..., :, None], -1, -2)
+    N = GtW @ G64
+    ridge = RIDGE * np.trace(N, axis1=-2, axis2=-1) / N.shape[-1]
+    N += ridge[..., None, None] * np.eye(N.shape[-1])
+    return np.linalg.solve(N, GtW).astype(np.float32)
+
+
+class _PrefixCache:
+    """Weighted solve matrices of one run, keyed by weight pattern."""
+
+    def __init__(self, G: npt.NDArray, levels: int):
+        self.G = G
+        self.levels = levels
+        self._prefix: dict[bytes, npt.NDArray] = {}
+
+    def get(self, code: npt.NDArray[np.uint8]) -> npt.NDArray:
+        key = code.tobytes()
+        prefix = self._prefix.get(key)
+        if prefix is None:
+            prefix = _weighted_prefix(self.G, self.weights(code))
+            self._prefix[key] = prefix
+        return prefix
+
+    def weights(self, codes: npt.NDArray[np.uint8]) -> npt.NDArray:
+        """Weights of quantized `codes`, plus the sum-to-one row weight."""
+        w = codes.astype(np.float32) / (self.levels - 1)
+        ones = np.ones((*w.shape[:-1], 1), dtype=np.float32)
+        return np.concatenate((w, ones), axis=-1)
+
+
+def _solve_patterns(
+    Y: npt.NDArray,
+    codes: npt.NDArray[np.uint8],
+    cache: _PrefixCache,
+    opts: RobustOptions,
+) -> npt.NDArray:
+    """
+    Solves every pixel of the augmented block `Y` with the weights of its
+    quantized pattern in `codes`. Returns (pixels x C) coefficients.
+    """
+    patterns, inverse, counts = np.unique(
+        codes, axis=0, return_inverse=True, return_counts=True
+    )
+    inverse = inverse.reshape(-1)
+    X = np.empty((Y.shape[0], cache.G.shape[1]), dtype=np.float32)
+    order = np.argsort(counts)[::-1]
+    for p in order[: opts.max_patterns]:
+        idx = np.flatnonzero(inverse == p)
+        X[idx] = Y[idx] @ cache.get(patterns[p]).T
+    rare = np.isin(inverse, order[opts.max_patterns :])
+    if np.any(rare):
+        prefix = _weighted_prefix(cache.G, cache.weights(codes[rare]))
+        X[rare] = np.einsum("nij,nj->ni", prefix, Y[rare])
+    return X
+
+
+def _irls_bands(
+    Y: Annotated[npt.NDArray[np.float32], (2,)],
+    G: Annotated[npt.NDArray[np.float32], (2,)],
+    prior: Optional[npt.NDArray],
+    opts: RobustOptions,
+) -> Annotated[npt.NDArray[np.float32], (2,)]:
+    """
+    IRLS with one weight per band on an augmented (pixels x bands + 1)
+    block. Every iteration is a single factorization and product.
+    """
+    nb = G.shape[0] - 1
+    w = np.ones(nb, dtype=np.float32) if prior is None else prior
+    X = Y @ _weighted_prefix(G, np.append(w, 1)).T
+    for _ in range(opts.max_iter):
+        R = (X @ G.T - Y)[:, :nb]
+        band_scale = MAD_TO_SIGMA * np.median(np.abs(R), axis=0)
+        scale = max(float(np.median(band_scale)), opts.min_scale)
+        w = loss_weights(band_scale / scale, opts)
+        if prior is not None:
+            w = w * prior
+        X_new = Y @ _weighted_prefix(G, np.append(w, 1)).T
+        change = float(np.max(np.abs(X_new - X)))
+        X = X_new
+        if change < opts.tol:
+            break
+    return X
+
+
+def _irls_pixels(
+    Y: Annotated[npt.NDArray[np.float32], (2,)],
+    cache: _PrefixCache,
+    prior: Optional[npt.NDArray],
+    opts: RobustOptions,
+) -> Annotated[npt.NDArray[np.float32], (2,)]:
+    """
+    IRLS with per-pixel weights on an augmented (pixels x bands + 1) block.
+
+    A pixel whose quantized weight pattern does not change keeps its
+    solution, so each iteration only re-solves the pixels that are still
+    moving.
+    """
+    G = cache.G
+    nb = G.shape[0] - 1
+    top = opts.levels - 1
+
+    w = np.ones(nb, dtype=np.float32) if prior is None else prior
+    codes = np.tile(np.rint(w * top).astype(np.uint8), (Y.shape[0], 1))
+    X = Y @ cache.get(codes[0]).T
+    active = np.arange(Y.shape[0])
+    for _ in range(opts.max_iter):
+        R = (X[active] @ G.T - Y[active])[:, :nb]
+        scale = MAD_TO_SIGMA * np.median(np.abs(R), axis=1, keepdims=True)
+        w = loss_weights(R / np.maximum(scale, opts.min_scale), opts)
+        if prior is not None:
+            w = w * prior
+        new_codes = np.rint(w * top).astype(np.uint8)
+        changed = np.any(new_codes != codes[active], axis=1)
+        active = active[changed]
+        if active.size == 0:
+            break
+        codes[active] = new_codes[changed]
+        X_new = _solve_patterns(Y[active], codes[active], cache, opts)
+        moved = np.max(np.abs(X_new - X[active]), axis=1) >= opts.tol
+        X[active] = X_new
+        active = active[moved]
+        if active.size == 0:
+            break
+    return X
+
+
+def unmix_robust(mixed_cube: MixedCube, opts: RobustOptions) -> UnMixedCube:
+    """
+    Robust unmixing of every pixel with the sum-to-one constraint.
+
+    The result has the layout of `unmix_spectral_cube`: the fractions carry
+    the trailing offset column and the model and residual the trailing
+    sum-to-one row.
+    """
+    G = _augment(mixed_cube.G)
+    d = mixed_cube.d
+    nb = G.shape[0] - 1
+    nc = G.shape[1]
+    cache = _PrefixCache(G, opts.levels)
+    prior = None
+    if opts.band_weights is not None:
+        prior = np.asarray(opts.band_weights, dtype=np.float32)
+        if prior.shape != (nb,):
+            raise ValueError(
+                f"band_weights has {prior.size} entries for {nb} bands."
+            )
+
+    pixels = d.reshape(-1, nb)
+    npix = pixels.shape[0]
+    fracs = np.full((npix, nc), np.nan, dtype=np.float32)
+    model = np.full((npix, nb + 1), np.nan, dtype=np.float32)
+    res = np.full((npix, nb + 1), np.nan, dtype=np.float32)
+
+    for start in range(0, npix, opts.block_size):
+        stop = min(start + opts.block_size, npix)
+        block = pixels[start:stop]
+        valid = np.isfinite(block).all(axis=1)
+        if not np.any(valid):
+            continue
+        rows = np.flatnonzero(valid) + start
+        Y = np.empty((rows.size, nb + 1), dtype=np.float32)
+        Y[:, :nb] = block[valid]
+        Y[:, nb] = 1
+
+        if opts.weights is WeightMode.BAND:
+            X = _irls_bands(Y, G, prior, opts)
+        else:
+            X = _irls_pixels(Y, cache, prior, opts)
+        M = X @ G.T
+        fracs[rows] = X
+        model[rows] = M
+        res[rows] = M - Y
+
+    shape = d.shape[:-1]
+    return UnMixedCube(
+        model.reshape(*shape, nb + 1),
+        fracs.reshape(*shape, nc),
+        res.reshape(*shape, nb + 1),
+    )
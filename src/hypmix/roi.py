@@ -0,0 +1,162 @@
+"""
+Regions of Interest
+
+Restricts unmixing to part of a scene. A selection can be given as a
+`PixelWindow`, a boolean mask or a list of (row, column) pixel coordinates.
+Windows are solved and stored as a clipped dense block with a recorded
+offset, while masks and coordinate lists are solved and stored sparsely as
+coordinates plus per-pixel values.
+
+Usage::
+
+    window = PixelWindow(100, 250, 512, 512)
+    res = model.run("results.hdf5", "crater", roi=window)
+    res = model.run("results.hdf5", "unit_a", roi=unit_mask)
+"""
+
+# Standard Libraries
+from dataclasses import dataclass
+from typing import Optional, Sequence
+from typing_extensions import Annotated
+
+# Dependencies
+import numpy as np
+import numpy.typing as npt
+
+
+@dataclass
+class PixelWindow:
+    """
+    Rectangular block of pixels.
+
+    Attributes
+    ----------
+    row_off: int
+        First row of the window.
+    col_off: int
+        First column of the window.
+    height: int
+        Number of rows.
+    width: int
+        Number of columns.
+    """
+
+    row_off: int
+    col_off: int
+    height: int
+    width: int
+
+    def slices(self) -> tuple[slice, slice]:
+        return (
+            slice(self.row_off, self.row_off + self.height),
+            slice(self.col_off, self.col_off + self.width),
+        )
+
+
+type ROILike = PixelWindow | npt.NDArray[np.bool_] | Sequence[tuple[int, int]]
+
+
+@dataclass
+class ROI:
+    """
+    Normalized region of interest.
+
+    Attributes
+    ----------
+    full_shape: tuple[int, int]
+        (rows, columns) of the full scene.
+    window: PixelWindow
+        Window holding the region. For sparse regions this is the bounding
+        box of the selected pixels.
+    coords: NDArray[np.intp, (2,)], optional
+        (N x 2) array of the (row, column) of each selected pixel. None if
+        the whole window is selected.
+    """
+
+    full_shape: tuple[int, int]
+    window: PixelWindow
+    coords: Optional[Annotated[npt.NDArray[np.intp], (2,)]] = None
+
+    @property
+    def is_sparse(self) -> bool:
+        return self.coords is not None
+
+    def read(self, data: npt.NDArray) -> npt.NDArray:
+        """
+        Reads only the selected pixels of a (rows, columns, bands) cube. Sparse
+        regions are returned as an (N, 1, bands) cube.
+        """
+        if self.coords is not None:
+            return data[self.coords[:, 0], self.coords[:, 1], :][:, None, :]
+        return data[self.window.slices()]
+
+    def scatter(
+        self, values: npt.NDArray, fill: float = np.nan
+    ) -> npt.NDArray:
+        """
+        Places per-pixel values of a sparse region, shaped (N, ...), into an
+        array covering the region's window, filling unselected pixels.
+        """
+        if self.coords is None:
+            return values
+        out = np.full(
+            (self.window.height, self.window.width, *values.shape[1:]),
+            fill,
+            dtype=np.result_type(values.dtype, np.float32),
+        )
+        out[
+            self.coords[:, 0] - self.window.row_off,
+            self.coords[:, 1] - self.window.col_off,
+        ] = values
+        return out
+
+
+def make_roi(selection: ROILike, full_shape: tuple[int, int]) -> ROI:
+    """
+    Builds an `ROI` from a window, a boolean mask or a list of pixel
+    coordinates.
+
+    Raises
+    ------
+    ValueError
+        If the selection is empty, does not match the scene shape or falls
+        outside the scene.
+    """
+    nrows, ncols = full_shape
+    if isinstance(selection, PixelWindow):
+        if (
+            selection.row_off < 0
+            or selection.col_off < 0
+            or selection.height <= 0
+            or selection.width <= 0
+            or selection.row_off + selection.height > nrows
+            or selection.col_off + selection.width > ncols
+        ):
+            raise ValueError(
+                f"{selection} does not fit in a scene of shape {full_shape}."
+            )
+        return ROI(full_shape, selection)
+
+    arr = np.asarray(selection)
+    if arr.dtype == np.bool_:
+        if arr.shape != tuple(full_shape):
+            raise ValueError(
+                f"Mask of shape {arr.shape} does not match the scene shape "
+                f"{full_shape}."
+            )
+        coords = np.argwhere(arr)
+    else:
+        coords = arr.astype(np.intp).reshape(-1, 2)
+        if np.any(coords < 0) or np.any(coords >= (nrows, ncols)):
+            raise ValueError("Pixel coordinates fall outside of the scene.")
+        coords = np.unique(coords, axis=0)
+
+    if coords.shape[0] == 0:
+        raise ValueError("The region of interest selects no pixels.")
+
+    lo = coords.min(axis=0)
+    hi = coords.max(axis=0)
+    window = PixelWindow(
+        int(lo[0]), int(lo[1]), int(hi[0] - lo[0] + 1), int(hi[1] - lo[1] + 1)
+    )
+    return ROI(full_shape, window, coords)
@@ -1,14 +1,46 @@
 # Standard Libraries
-from dataclasses import dataclass, field
+from __future__ import annotations
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from typing import TYPE_CHECKING, Any, Callable, Optional, Generator
 
 # Dependencies
 import numpy as np
 
 # Relative Imports
 from .typing import ImageCube, Spectrum, PathLike
-from .io import ModelResult
-from .model_math import unmix_spectral_cube, MixedCube
+from .model_math import (
+    unmix_spectral_cube,
+    factorize,
+    MixedCube,
+    PrecisionPolicy,
+    UnMixedCube,
+)
 from .endmember import EndMember, EndMemberGroup
+from .reduction import SpectralSubspace
+from .roi import ROI, ROILike, make_roi
+from .tiling import Tile, plan_tiles, read_tile, result_shape
+from .progress import (
+    CancelToken,
+    ProgressCallback,
+    ProgressTracker,
+    TileProgress,
+)
+from .fingerprint import identity_bytes, model_fingerprint
+from .planning import RunPlan, class_gather_cost, pixel_cost, plan_run
+from .storage import StorageOptions
+
+# `io` (h5py) is imported when a run starts, so importing the model does not
+# load HDF5.
+if TYPE_CHECKING:
+    from .io import ModelResult
+from .resampling import ResampleMethod, needs_resampling, resample_spectra
+from .sparse_unmixing import SUnSALOptions, factorize_sparse, unmix_sparse
+from .robust_unmixing import RobustOptions, unmix_robust
+from .class_unmixing import EndmemberClasses, unmix_by_class
+from .solver_backends import get_backend
+from .pipeline import PIPELINE_DEPTH, TileReader, TileWriter
 
 
 class EndmemberAlreadyExistsError(Exception):
@@ -29,27 +61,106 @@ class MixtureModel:
     """
     Parameters
     ----------
-    endmembers: list[EndMember]
-        List of model endmembers to use.
+    endmembers: EndMemberGroup or list[EndMember]
+        Model endmembers. A group, such as a `SpectralLibrary` subset, is
+        used as one (bands x endmembers) array, without per-spectrum
+        objects. The model holds its endmembers as an `EndMemberGroup`.
     data_cube: ImageCube
         Spectral data cube.
+    resample_method: ResampleMethod, default=ResampleMethod.LINEAR
+        How endmember spectra that are not sampled on `data_cube.wvl` are
+        resampled onto it.
+    fwhm: float or NDArray, optional
+        Band-pass widths of the data cube bands, used by
+        `ResampleMethod.GAUSSIAN`.
+    precision: PrecisionPolicy, default=PrecisionPolicy()
+        Precision of least squares solves. Set `refine=True` for
+        ill-conditioned endmember sets.
+    backend: str, optional
+        Solver backend for the per-pixel kernels (see
+        `hypmix.solver_backends`). Defaults to the most preferred installed
+        backend. Backends agree to float32 rounding, so the choice does not
+        enter the result fingerprint.
     """
 
-    endmembers: list[EndMember]
+    endmembers: EndMemberGroup | list[EndMember]
     data_cube: ImageCube
     state: ModelState = field(default_factory=ModelState)
+    resample_method: ResampleMethod = ResampleMethod.LINEAR
+    fwhm: Optional[float | np.ndarray] = None
+    precision: PrecisionPolicy = field(default_factory=PrecisionPolicy)
+    backend: Optional[str] = None
 
     def __post_init__(self):
-        if self.data_cube.bands_first:
-            self.data_cube.data = np.transpose(self.data_cube.data, (1, 2, 0))
+        if isinstance(self.endmembers, EndMemberGroup):
+            self.endmembers = self._resample_group(self.endmembers)
+        elif len(self.endmembers) > 0:
+            self.endmembers = EndMemberGroup(
+                self._resample_endmembers(self.endmembers)
+            )
+        else:
+            self.endmembers = EndMemberGroup.from_array(
+                [],
+                np.empty((len(self.data_cube.wvl), 0)),
+                self.data_cube.wvl,
+            )
         self.state.endmember_count = len(self.endmembers)
 
+    def _resample_group(self, group: EndMemberGroup) -> EndMemberGroup:
+        """
+        Copy of `group` on the cube wavelengths, resampled as a whole if
+        needed. The spectra are only copied when resampled.
+        """
+        arr = group.endmember_array
+        if needs_resampling(group.wvl, self.data_cube.wvl):
+            arr = resample_spectra(
+                arr.T,
+                group.wvl,
+                self.data_cube.wvl,
+                self.resample_method,
+                self.fwhm,
+            ).T
+        return EndMemberGroup.from_array(
+            group.endmember_name_list, arr, self.data_cube.wvl
+        )
+
+    def _resample_endmembers(
+        self, endmembers: list[EndMember]
+    ) -> list[EndMember]:
+        """
+        Resamples every endmember that is not sampled on the cube
+        wavelengths. Endmembers sharing source wavelengths are resampled
+        together with one product against a cached resampling matrix.
+        """
+        groups: dict[bytes, list[int]] = {}
+        for n, em in enumerate(endmembers):
+            if needs_resampling(em.spectrum.wvl, self.data_cube.wvl):
+                key = np.asarray(em.spectrum.wvl, dtype=np.float64).tobytes()
+                groups.setdefault(key, []).append(n)
+
+        out = list(endmembers)
+        for idx in groups.values():
+            src_wvl = endmembers[idx[0]].spectrum.wvl
+            spectra = np.stack([endmembers[i].spectrum.data for i in idx])
+            resampled = resample_spectra(
+                spectra,
+                src_wvl,
+                self.data_cube.wvl,
+                self.resample_method,
+                self.fwhm,
+            )
+            for i, spec in zip(idx, resampled):
+                out[i] = replace(
+                    endmembers[i], spectrum=Spectrum(spec, self.data_cube.wvl)
+                )
+        return out
+
     def add_endmember(self, endmember: EndMember) -> None:
-        if endmember.name in [i.name for i in self.endmembers]:
+        if endmember.name in self.endmembers.endmember_name_list:
             raise EndmemberAlreadyExistsError(
                 f"{endmember} has the same name as an existing endmember."
             )
-        self.endmembers.append(endmember)
+        self.endmembers.append(*self._resample_endmembers([endmember]))
         self.state.endmember_count += 1
 
     def add_virtual_reflector(self):
@@ -100,22 +211,643 @@ class MixtureModel:
                 "Virtual blackbody already exists in this model."
             )
 
-    def run(self, dst_path: PathLike, modelID: str) -> ModelResult:
-        G = np.empty(
-            [len(self.data_cube.wvl), len(self.endmembers)], dtype=np.float32
+    def _design_matrix(self) -> np.ndarray:
+        return self.endmembers.endmember_array
+
+    def _solve(
+        self,
+        G: np.ndarray,
+        d: np.ndarray,
+        subspace: Optional[SpectralSubspace],
+        sparse: Optional[SUnSALOptions],
+        robust: Optional[RobustOptions],
+        region: Optional[ROI],
+        columns: Optional[dict[int, np.ndarray]] = None,
+        labels: Optional[np.ndarray] = None,
+        factors: Optional[dict[int, Any]] = None,
+    ) -> tuple[UnMixedCube, np.ndarray]:
+        """
+        Unmixes a block of data and computes its RMS residual. With
+        `columns`, every pixel is unmixed with the design matrix columns of
+        its class in `labels`, using the class factorizations `factors`
+        (see `_class_factors`).
+        """
+
+        def unmix(mixed_cube: MixedCube, factor: Any = None) -> UnMixedCube:
+            if sparse is not None:
+                return unmix_sparse(
+                    mixed_cube, sparse, self.backend, factor=factor
+                )
+            if robust is not None:
+                return unmix_robust(mixed_cube, robust)
+            return unmix_spectral_cube(
+                mixed_cube,
+                subspace=subspace,
+                precision=self.precision,
+                backend=self.backend,
+                factor=factor,
+            )
+
+        if columns is not None and labels is not None:
+            unmixed_cube = unmix_by_class(
+                G, d, labels, columns, unmix, factors
+            )
+        else:
+            unmixed_cube = unmix(MixedCube(G, d))
+        rsquared = get_backend(self.backend).rms(
+            unmixed_cube.res, unmixed_cube.res_perp
+        )
+
+        if region is not None and region.is_sparse:
+            # (N, 1, ...) -> (N, ...)
+            unmixed_cube.model = unmixed_cube.model[:, 0]
+            unmixed_cube.fracs = unmixed_cube.fracs[:, 0]
+            unmixed_cube.res = unmixed_cube.res[:, 0]
+            rsquared = rsquared[:, 0]
+
+        return unmixed_cube, rsquared
+
+    def run(
+        self,
+        dst_path: PathLike,
+        modelID: str,
+        subspace: Optional[SpectralSubspace] = None,
+        roi: Optional[ROILike] = None,
+        reuse: bool = True,
+        sparse: Optional[SUnSALOptions] = None,
+        tile_rows: Optional[int] = None,
+        progress: Optional[ProgressCallback] = None,
+        cancel: Optional[CancelToken] = None,
+        memory_budget: Optional[int] = None,
+        workers: Optional[int] = None,
+        storage: Optional[StorageOptions] = None,
+        robust: Optional[RobustOptions] = None,
+        classes: Optional[EndmemberClasses] = None,
+        pipeline: bool = False,
+    ) -> ModelResult:
+        """
+        Unmixes the data cube.
+
+        Parameters
+        ----------
+        dst_path: PathLike
+            File the result will be saved to.
+        modelID: str
+            Name of the model result.
+        subspace: SpectralSubspace, optional
+            Reduced subspace (see `hypmix.reduction.fit_subspace`) to carry
+            out the solve in. The model and residual cubes of the result
+            are then stored as subspace coefficients.
+        roi: PixelWindow, boolean mask or list of (row, column), optional
+            Restricts the solve to part of the scene. A window gives a
+            result clipped to the window, while a mask or coordinate list
+            gives a sparse result with one row per selected pixel.
+        reuse: bool, default=True
+            If `dst_path` already holds a `modelID` result whose fingerprint
+            (endmembers, wavelengths, constraints, subspace, region and
+            source cube identity) matches this run, return it lazily instead
+            of recomputing. For tiled runs, an interrupted run with the same
+            fingerprint is resumed from its completed tiles.
+        sparse: SUnSALOptions, optional
+            Solve with L1-penalized, non-negative sparse regression (SUnSAL)
+            instead of least squares. Intended for models whose endmembers
+            are a large spectral library. Cannot be combined with
+            `subspace`.
+        tile_rows: int, optional
+            If given, the cube is solved in tiles of `tile_rows` rows (or
+            pixels, for sparse regions) that are written straight to
+            `dst_path` as they complete, together with a tile completion
+            journal. The returned result is loaded lazily from `dst_path`
+            and does not need to be saved with `save_model_result`.
+        progress: callable, optional
+            Called with a `TileProgress` event (pixels done, throughput,
+            ETA) after every completed tile. Untiled runs report a single
+            event.
+        cancel: CancelToken, optional
+            Checked before every tile. Once cancelled, the run stops with a
+            `RunCancelledError`; completed tiles stay checkpointed, so
+            running again resumes the run.
+        memory_budget: int, optional
+            Peak memory, in bytes, the run may use. The run is then tiled,
+            with the tile size and worker count chosen by `plan` (a given
+            `tile_rows` caps the tile size). Raises `MemoryBudgetError` if
+            the budget cannot hold a single row.
+        workers: int, optional
+            Number of tiles solved concurrently in a tiled run. Defaults to
+            1, or to the planned count when `memory_budget` is given.
+        storage: StorageOptions, optional
+            Codec of the result datasets written by a tiled run. Untiled
+            results take it in `save_model_result` instead.
+        robust: RobustOptions, optional
+            Solve with iteratively reweighted least squares under a Huber
+            or Tukey loss, which down-weights noisy bands and outlying
+            values. Cannot be combined with `subspace` or `sparse`.
+        classes: EndmemberClasses, optional
+            Unmixes each pixel with the endmember set of its class in a
+            class raster instead of with every model endmember. Fractions
+            cover all model endmembers, with 0 for those outside a pixel's
+            set. Cannot be combined with `subspace`.
+        pipeline: bool, default=False
+            Overlaps the reads, solves and writes of a tiled run (see
+            `hypmix.pipeline`): tiles are read ahead on one thread and
+            written on another while the workers solve, so a run bound by
+            disk I/O takes about as long as its I/O or its solves, not
+            both. Holds `hypmix.pipeline.PIPELINE_DEPTH` more input and
+            output tiles in memory, which `memory_budget` plans for.
+        """
+        events = self.run_iter(
+            dst_path,
+            modelID,
+            subspace=subspace,
+            roi=roi,
+            reuse=reuse,
+            sparse=sparse,
+            tile_rows=tile_rows,
+            cancel=cancel,
+            memory_budget=memory_budget,
+            workers=workers,
+            storage=storage,
+            robust=robust,
+            classes=classes,
+            pipeline=pipeline,
+        )
+        while True:
+            try:
+                event = next(events)
+            except StopIteration as stop:
+                return stop.value
+            if progress is not None:
+                progress(event)
+            del event
+
+    def run_iter(
+        self,
+        dst_path: PathLike,
+        modelID: str,
+        subspace: Optional[SpectralSubspace] = None,
+        roi: Optional[ROILike] = None,
+        reuse: bool = True,
+        sparse: Optional[SUnSALOptions] = None,
+        tile_rows: Optional[int] = None,
+        cancel: Optional[CancelToken] = None,
+        memory_budget: Optional[int] = None,
+        workers: Optional[int] = None,
+        storage: Optional[StorageOptions] = None,
+        robust: Optional[RobustOptions] = None,
+        classes: Optional[EndmemberClasses] = None,
+        pipeline: bool = False,
+    ) -> Generator[TileProgress, None, ModelResult]:
+        """
+        Unmixes the data cube as an iterator of `TileProgress` events, one
+        per completed tile. Parameters are those of `run`. The
+        `ModelResult` is the generator's return value (see `run`, which
+        drives this iterator).
+        """
+        from .io import ModelResult, find_stored_result
+
+        if sparse is not None and subspace is not None:
+            raise ValueError("Sparse unmixing does not support a subspace.")
+        if robust is not None and (sparse is not None or subspace is not None):
+            raise ValueError(
+                "Robust unmixing does not support a subspace or sparse mode."
+            )
+        columns = None
+        if classes is not None:
+            if subspace is not None:
+                raise ValueError(
+                    "Class-map unmixing does not support a subspace."
+                )
+            scene_shape = self.data_cube.data.shape[:2]
+            if classes.class_map.shape != scene_shape:
+                raise ValueError(
+                    f"The class map is {classes.class_map.shape}, but the "
+                    f"data cube is {scene_shape}."
+                )
+            columns = classes.columns(self.endmembers.endmember_name_list)
+
+        G = self._design_matrix()
+        if roi is None:
+            region = None
+        else:
+            region = make_roi(roi, self.data_cube.data.shape[:2])
+
+        fingerprint = self._fingerprint(
+            G, region, subspace, sparse, robust, classes
+        )
+        if reuse:
+            stored = find_stored_result(dst_path, modelID, fingerprint)
+            if stored is not None:
+                return stored
+
+        if memory_budget is not None:
+            plan = self._plan(
+                G,
+                region,
+                subspace,
+                sparse,
+                memory_budget,
+                workers,
+                tile_rows,
+                robust,
+                classes,
+                pipeline,
+            )
+            tile_rows, workers = plan.tile_rows, plan.workers
+        if workers is None:
+            workers = 1
+
+        factors = None
+        if columns is not None:
+            factors = self._class_factors(G, columns, sparse, robust)
+
+        if tile_rows is not None:
+            return (
+                yield from self._iter_tiled(
+                    dst_path,
+                    modelID,
+                    G,
+                    fingerprint,
+                    tile_rows,
+                    subspace,
+                    sparse,
+                    region,
+                    reuse,
+                    cancel,
+                    workers,
+                    storage,
+                    robust,
+                    classes,
+                    columns,
+                    pipeline,
+                    factors,
+                )
+            )
+
+        if cancel is not None:
+            cancel.raise_if_cancelled()
+
+        pixel_shape = result_shape(self.data_cube.data.shape[:2], region)
+        whole = Tile(0, 0, pixel_shape[0])
+        pixels_per_row = int(np.prod(pixel_shape[1:]))
+        tracker = ProgressTracker([whole], [whole], pixels_per_row)
+
+        if region is None:
+            d = self.data_cube.data
+        else:
+            d = region.read(self.data_cube.data)
+        labels = None if classes is None else classes.read(region)
+
+        unmixed_cube, rsquared = self._solve(
+            G, d, subspace, sparse, robust, region, columns, labels, factors
         )
-        for n, em in enumerate(self.endmembers):
-            G[:, n] = em.spectrum.data
-        mixed_cube = MixedCube(G, self.data_cube.data)
-        unmixed_cube = unmix_spectral_cube(mixed_cube)
-        rsquared = np.sqrt(np.sum(unmixed_cube.res**2, axis=2))
+        yield tracker.update(whole, unmixed_cube)
 
         result = ModelResult(
             dst_path,
             modelID,
             unmixed_cube,
-            EndMemberGroup(self.endmembers),
+            self.endmembers,
             rsquared,
+            roi=region,
+            fingerprint=fingerprint,
+            classes=(
+                None
+                if classes is None
+                else EndmemberClasses(
+                    labels.reshape(pixel_shape), classes.sets  # type: ignore
+                )
+            ),
         )
 
         return result
+
+    def run_shard(
+        self,
+        manifest_path: PathLike,
+        index: int,
+        subspace: Optional[SpectralSubspace] = None,
+        sparse: Optional[SUnSALOptions] = None,
+        tile_rows: int = 256,
+        robust: Optional[RobustOptions] = None,
+        classes: Optional[EndmemberClasses] = None,
+        **run_kwargs: Any,
+    ) -> ModelResult:
+        """
+        Unmixes shard `index` of a `ShardManifest` into the shard's own
+        file, as a tiled run restricted to the shard's rows. Interrupted
+        shards resume like any tiled run. Once every shard is done,
+        `hypmix.sharding.merge_shards` assembles them.
+
+        Other keyword arguments (`reuse`, `progress`, `cancel`,
+        `memory_budget`, `workers`, `storage`, `pipeline`) are passed on to
+        `run`; all shards of a manifest must use the same `storage`.
+        """
+        import h5py as h5  # type: ignore
+        from .sharding import ShardManifest
+
+        manifest = ShardManifest.open(manifest_path)
+        scene_shape = tuple(self.data_cube.data.shape[:2])
+        if scene_shape != (manifest.n_rows, manifest.n_cols):
+            raise ValueError(
+                f"The manifest describes a {manifest.n_rows}x"
+                f"{manifest.n_cols} scene, but the data cube is "
+                f"{scene_shape[0]}x{scene_shape[1]}."
+            )
+        shard = manifest.shards[index]
+        result = self.run(
+            shard.path,
+            manifest.modelID,
+            subspace=subspace,
+            roi=manifest.window(index),
+            sparse=sparse,
+            tile_rows=tile_rows,
+            robust=robust,
+            classes=classes,
+            **run_kwargs,
+        )
+        G = self._design_matrix()
+        scene = self._fingerprint(G, None, subspace, sparse, robust, classes)
+        with h5.File(shard.path, "r+") as f:
+            f[manifest.modelID].attrs["scene_fingerprint"] = scene
+        return result
+
+    def _class_factors(
+        self,
+        G: np.ndarray,
+        columns: dict[int, np.ndarray],
+        sparse: Optional[SUnSALOptions],
+        robust: Optional[RobustOptions],
+    ) -> Optional[dict[int, Any]]:
+        """
+        Factorization of the design matrix of every class of a class-map
+        run, computed once for all its tiles. Robust solves reweight every
+        pixel and have none.
+        """
+        if robust is not None:
+            return None
+        if sparse is not None:
+            return {
+                cid: factorize_sparse(G[:, cols], sparse)
+                for cid, cols in columns.items()
+            }
+        return {cid: factorize(G[:, cols]) for cid, cols in columns.items()}
+
+    def _fingerprint(
+        self,
+        G: np.ndarray,
+        region: Optional[ROI],
+        subspace: Optional[SpectralSubspace],
+        sparse: Optional[SUnSALOptions],
+        robust: Optional[RobustOptions] = None,
+        classes: Optional[EndmemberClasses] = None,
+    ) -> str:
+        return model_fingerprint(
+            G,
+            self.endmembers.endmember_name_list,
+            self.data_cube,
+            subspace=subspace,
+            roi=region,
+            sparse=sparse,
+            robust=robust,
+            precision=self.precision,
+            classes=classes,
+        )
+
+    def plan(
+        self,
+        roi: Optional[ROILike] = None,
+        subspace: Optional[SpectralSubspace] = None,
+        sparse: Optional[SUnSALOptions] = None,
+        memory_budget: Optional[int] = None,
+        workers: Optional[int] = None,
+        tile_rows: Optional[int] = None,
+        robust: Optional[RobustOptions] = None,
+        classes: Optional[EndmemberClasses] = None,
+        pipeline: bool = False,
+    ) -> RunPlan:
+        """
+        Dry run: estimates the peak memory and work of `run` with the same
+        arguments and chooses the tile size and worker count it would use.
+        Nothing is read or solved. See `RunPlan.report`.
+        """
+        region = None
+        if roi is not None:
+            region = make_roi(roi, self.data_cube.data.shape[:2])
+        return self._plan(
+            self._design_matrix(),
+            region,
+            subspace,
+            sparse,
+            memory_budget,
+            workers,
+            tile_rows,
+            robust,
+            classes,
+            pipeline,
+        )
+
+    def _plan(
+        self,
+        G: np.ndarray,
+        region: Optional[ROI],
+        subspace: Optional[SpectralSubspace],
+        sparse: Optional[SUnSALOptions],
+        memory_budget: Optional[int],
+        workers: Optional[int],
+        tile_rows: Optional[int],
+        robust: Optional[RobustOptions] = None,
+        classes: Optional[EndmemberClasses] = None,
+        pipeline: bool = False,
+    ) -> RunPlan:
+        pixel_shape = result_shape(self.data_cube.data.shape[:2], region)
+        cost = pixel_cost(
+            G.shape[0],
+            G.shape[1],
+            self.data_cube.data.dtype,
+            subspace_dim=None if subspace is None else subspace.basis.shape[1],
+            sparse=sparse,
+            robust=robust,
+            precision=self.precision,
+        )
+        if classes is not None:
+            cost = class_gather_cost(cost, G.shape[0])
+        cost = replace(cost, setup_bytes=identity_bytes(self.data_cube))
+        return plan_run(
+            pixel_shape[0],
+            int(np.prod(pixel_shape[1:])),
+            cost,
+            memory_budget,
+            workers,
+            tile_rows,
+            prefetch=PIPELINE_DEPTH if pipeline else 0,
+        )
+
+    def _iter_tiled(
+        self,
+        dst_path: PathLike,
+        modelID: str,
+        G: np.ndarray,
+        fingerprint: str,
+        tile_rows: int,
+        subspace: Optional[SpectralSubspace],
+        sparse: Optional[SUnSALOptions],
+        region: Optional[ROI],
+        resume: bool,
+        cancel: Optional[CancelToken],
+        workers: int,
+        storage: Optional[StorageOptions],
+        robust: Optional[RobustOptions],
+        classes: Optional[EndmemberClasses] = None,
+        columns: Optional[dict[int, np.ndarray]] = None,
+        pipeline: bool = False,
+        factors: Optional[dict[int, Any]] = None,
+    ) -> Generator[TileProgress, None, ModelResult]:
+        from .io import StreamingResultWriter, load_model_result
+
+        pixel_shape = result_shape(self.data_cube.data.shape[:2], region)
+        tiles = plan_tiles(pixel_shape[0], tile_rows)
+        pixels_per_row = int(np.prod(pixel_shape[1:]))
+
+        with StreamingResultWriter(
+            dst_path,
+            modelID,
+            pixel_shape,
+            tiles,
+            self.endmembers,
+            fingerprint,
+            roi=region,
+            resume=resume,
+            storage=storage,
+            classes=classes,
+        ) as writer:
+            pending = writer.pending()
+            tracker = ProgressTracker(tiles, pending, pixels_per_row)
+
+            def read(tile: Tile) -> tuple[np.ndarray, Optional[np.ndarray]]:
+                d = read_tile(self.data_cube.data, region, tile)
+                labels = None
+                if classes is not None:
+                    labels = classes.read(region, tile)
+                return d, labels
+
+            def solve(
+                d: np.ndarray, labels: Optional[np.ndarray]
+            ) -> tuple[UnMixedCube, np.ndarray]:
+                return self._solve(
+                    G,
+                    d,
+                    subspace,
+                    sparse,
+                    robust,
+                    region,
+                    columns,
+                    labels,
+                    factors,
+                )
+
+            if pipeline:
+                solved = self._solve_pipelined(
+                    pending, read, solve, writer.write, cancel, workers
+                )
+            else:
+                solved = self._solve_in_order(
+                    pending, read, solve, writer.write, cancel, workers
+                )
+            for tile, unmixed_cube in solved:
+                yield tracker.update(tile, unmixed_cube)
+                # Let the tile go before the next one is solved.
+                del unmixed_cube
+            writer.finalize()
+
+        return load_model_result(dst_path, modelID, lazy=True)
+
+    @staticmethod
+    def _solve_in_order(
+        tiles: list[Tile],
+        read: Callable[[Tile], tuple[np.ndarray, Optional[np.ndarray]]],
+        solve: Callable[..., tuple[UnMixedCube, np.ndarray]],
+        write: Callable[..., None],
+        cancel: Optional[CancelToken],
+        workers: int,
+    ) -> Generator[tuple[Tile, UnMixedCube], None, None]:
+        """
+        Reads and writes tiles on this thread, and solves them on up to
+        `workers` threads. Tiles are written in order, and yielded once
+        written.
+        """
+        queue = iter(tiles)
+        in_flight: deque[tuple[Tile, Future, Optional[np.ndarray]]] = deque()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            try:
+                while True:
+                    while len(in_flight) < workers:
+                        tile = next(queue, None)
+                        if tile is None:
+                            break
+                        if cancel is not None:
+                            cancel.raise_if_cancelled()
+                        d, labels = read(tile)
+                        future = pool.submit(solve, d, labels)
+                        in_flight.append((tile, future, labels))
+                    if not in_flight:
+                        break
+                    tile, future, labels = in_flight.popleft()
+                    unmixed_cube, rsquared = future.result()
+                    write(tile, unmixed_cube, rsquared, labels)
+                    del rsquared
+                    yield tile, unmixed_cube
+                    del unmixed_cube
+            finally:
+                for _, future, _ in in_flight:
+                    future.cancel()
+
+    @staticmethod
+    def _solve_pipelined(
+        tiles: list[Tile],
+        read: Callable[[Tile], tuple[np.ndarray, Optional[np.ndarray]]],
+        solve: Callable[..., tuple[UnMixedCube, np.ndarray]],
+        write: Callable[..., None],
+        cancel: Optional[CancelToken],
+        workers: int,
+    ) -> Generator[tuple[Tile, UnMixedCube], None, None]:
+        """
+        `_solve_in_order` with reads and writes on their own threads (see
+        `hypmix.pipeline`): `PIPELINE_DEPTH` tiles are read ahead into
+        reusable buffers and solved tiles are written in the background,
+        while this thread keeps `workers` solves running.
+        """
+        in_flight: deque[
+            tuple[Tile, Future, Optional[np.ndarray], object]
+        ] = deque()
+        with TileReader(
+            read, tiles, workers + PIPELINE_DEPTH
+        ) as reader, TileWriter(write, PIPELINE_DEPTH) as writer:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                try:
+                    while True:
+                        while len(in_flight) < workers:
+                            item = reader.get()
+                            if item is None:
+                                break
+                            if cancel is not None:
+                                cancel.raise_if_cancelled()
+                            tile, d, labels, buffer = item
+                            future = pool.submit(solve, d, labels)
+                            in_flight.append((tile, future, labels, buffer))
+                            del d
+                        if not in_flight:
+                            break
+                        tile, future, labels, buffer = in_flight.popleft()
+                        unmixed_cube, rsquared = future.result()
+                        reader.release(buffer)
+                        writer.put(tile, unmixed_cube, rsquared, labels)
+                        del unmixed_cube, rsquared
+                        for tile, unmixed_cube, *_ in writer.written():
+                            yield tile, unmixed_cube
+                            del unmixed_cube
+                finally:
+                    for _, future, _, _ in in_flight:
+                        future.cancel()
+        # Tiles written after the last solve.
+        for tile, unmixed_cube, *_ in writer.written():
+            yield tile, unmixed_cube
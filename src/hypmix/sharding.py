@@ -0,0 +1,293 @@
+"""
+Sharded Runs
+
+Splits one scene into row-range shards described by a manifest file, so
+independent machines can each unmix one shard into their own HDF5 file with
+no shared scheduler. `merge_shards` then assembles the shard results into a
+single model group made of HDF5 virtual datasets, without copying data. The
+merged group loads like any other result.
+
+Usage::
+
+    # once
+    ShardManifest.create("scene.json", "m1", n_rows=12000, n_cols=3000,
+                         n_shards=8)
+
+    # on worker i
+    model.run_shard("scene.json", i, tile_rows=256)
+
+    # once every shard is done
+    merge_shards("scene.json", "scene_results.hdf5")
+    res = load_model_result("scene_results.hdf5", "m1", lazy=True)
+
+Shard files are referenced relative to the merged file, so the directory
+holding them can be moved as a whole.
+"""
+
+# Standard Libraries
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+# Dependencies
+import h5py as h5  # type: ignore
+
+# Relative Imports
+from .typing import PathLike
+from .roi import PixelWindow
+from .storage import BAND_MAJOR_GROUP
+
+RESULT_DATASETS = ("fractions", "residuals", "model", "rsquared")
+
+
+class IncompleteShardError(Exception):
+    def __init__(self, message: str) -> None:
+        super().__init__(message)
+
+
+@dataclass
+class Shard:
+    """
+    Attributes
+    ----------
+    index: int
+        Position of the shard in the manifest.
+    start: int
+        First scene row of the shard.
+    stop: int
+        One past the last scene row of the shard.
+    path: Path
+        HDF5 file the shard result is written to.
+    """
+
+    index: int
+    start: int
+    stop: int
+    path: Path
+
+
+@dataclass
+class ShardManifest:
+    """
+    Attributes
+    ----------
+    modelID: str
+        Name of the model group in every shard file and in the merged file.
+    n_rows: int
+        Rows of the scene.
+    n_cols: int
+        Columns of the scene.
+    shards: list[Shard]
+        Row ranges covering the scene, in order.
+    """
+
+    modelID: str
+    n_rows: int
+    n_cols: int
+    shards: list[Shard]
+
+    @classmethod
+    def create(
+        cls,
+        path: PathLike,
+        modelID: str,
+        n_rows: int,
+        n_cols: int,
+        n_shards: int,
+    ) -> "ShardManifest":
+        """
+        Splits `n_rows` rows into `n_shards` near-equal row ranges and
+        writes the manifest to `path`. Shard files are named after the
+        manifest and placed next to it.
+        """
+        if not 1 <= n_shards <= n_rows:
+            raise ValueError(
+                f"n_shards must be between 1 and {n_rows}, got {n_shards}."
+            )
+        path = Path(path)
+        bounds = [n_rows * i // n_shards for i in range(n_shards + 1)]
+        shards = [
+            Shard(
+                i,
+                bounds[i],
+                bounds[i + 1],
+                path.with_name(f"{path.stem}_shard{i:03d}.hdf5"),
+            )
+            for i in range(n_shards)
+        ]
+        manifest = cls(modelID, n_rows, n_cols, shards)
+        manifest.save(path)
+        return manifest
+
+    @classmethod
+    def open(cls, path: PathLike) -> "ShardManifest":
+        path = Path(path)
+        with open(path, "r") as f:
+            raw = json.load(f)
+        shards = [
+            Shard(i, s["start"], s["stop"], path.parent / s["path"])
+            for i, s in enumerate(raw["shards"])
+        ]
+        return cls(raw["modelID"], raw["n_rows"], raw["n_cols"], shards)
+
+    def save(self, path: PathLike) -> None:
+        path = Path(path)
+        raw = {
+            "modelID": self.modelID,
+            "n_rows": self.n_rows,
+            "n_cols": self.n_cols,
+            "shards": [
+                {
+                    "start": s.start,
+                    "stop": s.stop,
+                    "path": os.path.relpath(s.path, path.parent),
+                }
+                for s in self.shards
+            ],
+        }
+        with open(path, "w") as f:
+            json.dump(raw, f, indent=2)
+
+    def window(self, index: int) -> PixelWindow:
+        """Region of the scene covered by shard `index`."""
+        s = self.shards[index]
+        return PixelWindow(s.start, 0, s.stop - s.start, self.n_cols)
+
+
+def _virtual_dataset(
+    g: h5.Group,
+    name: str,
+    manifest: ShardManifest,
+    sources: dict[int, h5.Dataset],
+    dst_dir: Path,
+    band_major: bool = False,
+) -> None:
+    """
+    Creates `name` in `g` as a virtual dataset stitching the shard datasets
+    `sources` together along the row axis. Missing shards read as fill.
+    """
+    first = next(iter(sources.values()))
+    if band_major:
+        shape = (first.shape[0], manifest.n_rows, manifest.n_cols)
+    else:
+        shape = (manifest.n_rows, manifest.n_cols, *first.shape[2:])
+    layout = h5.VirtualLayout(shape=shape, dtype=first.dtype)
+    for index, src in sources.items():
+        shard = manifest.shards[index]
+        rel = os.path.relpath(shard.path, dst_dir)
+        vsource = h5.VirtualSource(rel, src.name, shape=src.shape)
+        rows = slice(shard.start, shard.stop)
+        if band_major:
+            layout[:, rows] = vsource
+        else:
+            layout[rows] = vsource
+    dset = g.create_virtual_dataset(name, layout, fillvalue=first.fillvalue)
+    dset.attrs.update(first.attrs)
+
+
+def merge_shards(
+    manifest_path: PathLike, dst_path: PathLike, require_complete: bool = True
+) -> None:
+    """
+    Assembles the shard results of a manifest into the model group
+    `manifest.modelID` of `dst_path`, replacing an existing group of that
+    name. The result datasets (and band-major copies) are virtual datasets
+    that read straight from the shard files.
+
+    Parameters
+    ----------
+    manifest_path: PathLike
+        Manifest written by `ShardManifest.create`.
+    dst_path: PathLike
+        HDF5 file to hold the merged group.
+    require_complete: bool, default=True
+        If True, every shard must hold a complete result. If False,
+        unfinished shards are left out and read as NaN, and the merged
+        group is marked incomplete.
+
+    Raises
+    ------
+    IncompleteShardError
+        If a shard is missing or unfinished and `require_complete` is True.
+    ValueError
+        If the shards were computed with different inputs.
+    """
+    manifest = ShardManifest.open(manifest_path)
+    dst_dir = Path(dst_path).resolve().parent
+
+    files: dict[int, h5.File] = {}
+    try:
+        for shard in manifest.shards:
+            if not shard.path.is_file():
+                continue
+            f = h5.File(shard.path, "r")
+            g = f.get(manifest.modelID)
+            if g is None or not g.attrs.get("complete", True):
+                f.close()
+                continue
+            files[shard.index] = f
+
+        missing = [s.index for s in manifest.shards if s.index not in files]
+        if len(files) == 0 or (missing and require_complete):
+            raise IncompleteShardError(
+                f"Shards {missing} of {manifest_path} are missing or "
+                "unfinished."
+            )
+
+        groups = {i: f[manifest.modelID] for i, f in files.items()}
+        scene = {g.attrs.get("scene_fingerprint") for g in groups.values()}
+        if len(scene) != 1:
+            raise ValueError(
+                "The shards were computed with different model inputs."
+            )
+        first = next(iter(groups.values()))
+
+        open_flag = "r+" if Path(dst_path).is_file() else "w"
+        with h5.File(dst_path, open_flag) as dst:
+            if manifest.modelID in dst:
+                del dst[manifest.modelID]
+            g = dst.create_group(manifest.modelID)
+            g.attrs["wavelengths"] = first.attrs["wavelengths"]
+            first.copy("endmembers", g)
+            if "basis" in first:
+                first.copy("basis", g)
+            g.attrs["storage"] = "dense"
+            for name in RESULT_DATASETS:
+                _virtual_dataset(
+                    g,
+                    name,
+                    manifest,
+                    {i: sg[name] for i, sg in groups.items()},
+                    dst_dir,
+                )
+            if "class_endmembers" in first:
+                first.copy("class_endmembers", g)
+                _virtual_dataset(
+                    g,
+                    "class_map",
+                    manifest,
+                    {i: sg["class_map"] for i, sg in groups.items()},
+                    dst_dir,
+                )
+            if BAND_MAJOR_GROUP in first:
+                bg = g.create_group(BAND_MAJOR_GROUP)
+                for name in first[BAND_MAJOR_GROUP]:
+                    _virtual_dataset(
+                        bg,
+                        name,
+                        manifest,
+                        {
+                            i: sg[f"{BAND_MAJOR_GROUP}/{name}"]
+                            for i, sg in groups.items()
+                        },
+                        dst_dir,
+                        band_major=True,
+                    )
+            fingerprint = scene.pop()
+            if fingerprint is not None:
+                g.attrs["fingerprint"] = fingerprint
+            g.attrs["complete"] = len(missing) == 0
+    finally:
+        for f in files.values():
+            f.close()
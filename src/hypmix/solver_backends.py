@@ -0,0 +1,358 @@
+"""
+Solver Backends
+
+Registry of the per-pixel kernels behind the unmixing solvers:
+
+- `solve`: the pixel-major projection of data onto a solve matrix, fused
+  with the model reconstruction and the residual.
+- `project` and `reconstruct`: the two halves of `solve`, used when the
+  fractions are refined in between.
+- `rms`: the RMS residual of every pixel.
+- `shrink`: the soft-threshold and dual update of the sparse (SUnSAL)
+  iterations.
+
+The NumPy backend is always available. Optional backends are registered as
+loaders that import their dependencies on first use, and the first loadable
+backend in `BACKEND_LOADERS` is picked by default, so installing numba
+switches to the compiled kernels with no configuration. Band-major (BSQ)
+solves and factorizations stay on NumPy's BLAS in every backend.
+
+Backends agree to float32 rounding; `benchmarks/solver_backends.py` checks
+every available backend against NumPy.
+
+Usage::
+
+    available_backends()          # e.g. ["numba", "numpy"]
+    model = MixtureModel(endmembers, cube, backend="numpy")
+"""
+
+# Standard Libraries
+from importlib import import_module
+from typing import Callable, Optional, Protocol, Tuple
+from typing_extensions import Annotated
+
+# Dependencies
+import numpy as np
+import numpy.typing as npt
+
+
+# Working set of one pixel block of the NumPy kernels. Fixed rather than
+# tuned at runtime, since run plans charge it per worker; pick a value with
+# benchmarks/gemm_block_size.py.
+BLOCK_BYTES = 1 << 20
+# Fewest pixels per block, so GEMM calls stay large enough to be efficient.
+MIN_BLOCK = 256
+
+
+class BackendUnavailableError(Exception):
+    def __init__(self, message: str) -> None:
+        super().__init__(message)
+
+
+class SolverBackend(Protocol):
+    """
+    Kernels of one backend. Arrays are pixel-major, with the band (or
+    endmember) axis last, and every output is float32.
+    """
+
+    name: str
+
+    def project(
+        self,
+        prefix: Annotated[npt.NDArray[np.float32], (2,)],
+        d: npt.NDArray,
+        add_to_one: bool,
+    ) -> npt.NDArray[np.float32]:
+        """
+        Fractions `prefix @ [d, 1]` (the trailing 1 only if `add_to_one`)
+        of every pixel of `d`.
+        """
+        ...
+
+    def reconstruct(
+        self,
+        G: Annotated[npt.NDArray[np.float32], (2,)],
+        fracs: npt.NDArray[np.float32],
+        d: npt.NDArray,
+        add_to_one: bool,
+    ) -> Tuple[npt.NDArray[np.float32], npt.NDArray[np.float32]]:
+        """Model `G @ fracs` and residual `model - [d, 1]` of every pixel."""
+        ...
+
+    def solve(
+        self,
+        prefix: Annotated[npt.NDArray[np.float32], (2,)],
+        G: Annotated[npt.NDArray[np.float32], (2,)],
+        d: npt.NDArray,
+        add_to_one: bool,
+    ) -> Tuple[
+        npt.NDArray[np.float32],
+        npt.NDArray[np.float32],
+        npt.NDArray[np.float32],
+    ]:
+        """`project` followed by `reconstruct`: fractions, model, residual."""
+        ...
+
+    def rms(
+        self,
+        res: npt.NDArray[np.float32],
+        res_perp: Optional[npt.NDArray[np.float32]] = None,
+    ) -> npt.NDArray[np.float32]:
+        """
+        Root of the summed squared residual of every pixel, including the
+        out-of-subspace part `res_perp` of reduced solves.
+        """
+        ...
+
+    def shrink(
+        self,
+        X: Annotated[npt.NDArray[np.float32], (2,)],
+        D: Annotated[npt.NDArray[np.float32], (2,)],
+        thresh: float,
+    ) -> Annotated[npt.NDArray[np.float32], (2,)]:
+        """
+        SUnSAL splitting step: returns Z = max(X - D - thresh, 0) and updates
+        the scaled dual D -= X - Z in place.
+        """
+        ...
+
+
+class _PixelBlocks:
+    """
+    Splits the pixels of a (rows, columns, bands) cube into blocks of at
+    most `block` pixels, each a run of whole rows or part of one row, so
+    every block is a contiguous range of the flattened pixel index.
+
+    `matrix` returns a block as a C-contiguous float32 (pixels x bands)
+    matrix: a view where the cube allows one, otherwise a copy (and cast)
+    into a buffer reused by every block.
+    """
+
+    def __init__(self, d: npt.NDArray, block: int):
+        self.d = d
+        self.nrows, self.ncols, self.nb = d.shape
+        self.npix = self.nrows * self.ncols
+        self.block = max(min(block, self.npix), 1)
+        self._buffer: Optional[npt.NDArray[np.float32]] = None
+
+    def __iter__(self):
+        if self.ncols <= self.block:
+            step = self.block // self.ncols
+            for r in range(0, self.nrows, step):
+                stop = min(r + step, self.nrows)
+                yield (
+                    (slice(r, stop), slice(None)),
+                    slice(r * self.ncols, stop * self.ncols),
+                )
+        else:
+            for r in range(self.nrows):
+                for c in range(0, self.ncols, self.block):
+                    stop = min(c + self.block, self.ncols)
+                    start = r * self.ncols
+                    yield (
+                        (slice(r, r + 1), slice(c, stop)),
+                        slice(start + c, start + stop),
+                    )
+
+    def matrix(self, key: tuple[slice, slice]) -> npt.NDArray[np.float32]:
+        block = self.d[key]
+        n = block.shape[0] * block.shape[1]
+        if block.dtype == np.float32 and block.flags.c_contiguous:
+            return block.reshape(n, self.nb)
+        if self._buffer is None:
+            self._buffer = np.empty((self.block, self.nb), np.float32)
+        out = self._buffer[:n]
+        out.reshape(block.shape)[...] = block
+        return out
+
+
+class NumpyBackend:
+    """
+    Reference kernels on BLAS. The cube is processed in cache-sized blocks
+    of pixels: each block is one contiguous (pixels x bands) matrix, and
+    its fractions, model and residual are formed by GEMMs into slices of
+    the preallocated outputs while the block is in cache.
+
+    Parameters
+    ----------
+    block_bytes: int, default=BLOCK_BYTES
+        Working set of one block (data, fractions, model and residual),
+        which sets the number of pixels per block.
+        `benchmarks/gemm_block_size.py` finds the best value for a machine.
+    """
+
+    name = "numpy"
+
+    def __init__(self, block_bytes: int = BLOCK_BYTES):
+        self.block_bytes = block_bytes
+
+    def _blocks(
+        self, d: npt.NDArray, nc: int, nrows_g: int
+    ) -> _PixelBlocks:
+        per_pixel = (d.shape[-1] + nc + 2 * nrows_g) * np.float32().itemsize
+        return _PixelBlocks(
+            _as_cube(d), max(self.block_bytes // per_pixel, MIN_BLOCK)
+        )
+
+    @staticmethod
+    def _project_block(P, offset, y, out):
+        np.matmul(y, P, out=out)
+        if offset is not None:
+            out += offset
+
+    @staticmethod
+    def _reconstruct_block(Gt, x, y, add_to_one, model, res):
+        nb = y.shape[1]
+        np.matmul(x, Gt, out=model)
+        np.subtract(model[:, :nb], y, out=res[:, :nb])
+        if add_to_one:
+            np.subtract(model[:, nb], 1, out=res[:, nb])
+
+    def project(self, prefix, d, add_to_one):
+        nb = d.shape[-1]
+        nc = prefix.shape[0]
+        P = np.ascontiguousarray(prefix[:, :nb].T)
+        offset = prefix[:, nb] if add_to_one else None
+        blocks = self._blocks(d, nc, 0)
+        fracs = np.empty((blocks.npix, nc), np.float32)
+        for key, rows in blocks:
+            y = blocks.matrix(key)
+            self._project_block(P, offset, y, fracs[rows])
+        return fracs.reshape(*d.shape[:-1], nc)
+
+    def reconstruct(self, G, fracs, d, add_to_one):
+        nrows_g, nc = G.shape
+        Gt = np.ascontiguousarray(G.T)
+        blocks = self._blocks(d, 0, nrows_g)
+        x = fracs.reshape(blocks.npix, nc)
+        model = np.empty((blocks.npix, nrows_g), np.float32)
+        res = np.empty((blocks.npix, nrows_g), np.float32)
+        for key, rows in blocks:
+            y = blocks.matrix(key)
+            self._reconstruct_block(
+                Gt, x[rows], y, add_to_one, model[rows], res[rows]
+            )
+        out = (*d.shape[:-1], nrows_g)
+        return model.reshape(out), res.reshape(out)
+
+    def solve(self, prefix, G, d, add_to_one):
+        nb = d.shape[-1]
+        nrows_g, nc = G.shape
+        P = np.ascontiguousarray(prefix[:, :nb].T)
+        offset = prefix[:, nb] if add_to_one else None
+        Gt = np.ascontiguousarray(G.T)
+        blocks = self._blocks(d, nc, nrows_g)
+        fracs = np.empty((blocks.npix, nc), np.float32)
+        model = np.empty((blocks.npix, nrows_g), np.float32)
+        res = np.empty((blocks.npix, nrows_g), np.float32)
+        for key, rows in blocks:
+            y = blocks.matrix(key)
+            self._project_block(P, offset, y, fracs[rows])
+            self._reconstruct_block(
+                Gt, fracs[rows], y, add_to_one, model[rows], res[rows]
+            )
+        lead = d.shape[:-1]
+        return (
+            fracs.reshape(*lead, nc),
+            model.reshape(*lead, nrows_g),
+            res.reshape(*lead, nrows_g),
+        )
+
+    def rms(self, res, res_perp=None):
+        rss = np.sum(res**2, axis=-1)
+        if res_perp is not None:
+            rss += res_perp**2
+        return np.sqrt(rss)
+
+    def shrink(self, X, D, thresh):
+        Z = np.maximum(X - D - thresh, 0)
+        D -= X - Z
+        return Z
+
+
+def _as_cube(a: npt.NDArray) -> npt.NDArray:
+    """(rows, columns, channels) view of a pixel-major array."""
+    if a.ndim == 3:
+        return a
+    return a.reshape(-1, 1, a.shape[-1])
+
+
+def _load_numba() -> SolverBackend:
+    return import_module(".numba_backend", __package__).NumbaBackend()
+
+
+# Loaders by name, most preferred first. A loader raises ImportError when
+# its dependencies are missing.
+BACKEND_LOADERS: dict[str, Callable[[], SolverBackend]] = {
+    "numba": _load_numba,
+    "numpy": NumpyBackend,
+}
+
+_LOADED: dict[str, SolverBackend] = {}
+_UNAVAILABLE: set[str] = set()
+
+
+def register_backend(
+    name: str, loader: Callable[[], SolverBackend], preferred: bool = False
+) -> None:
+    """
+    Adds (or replaces) a backend. A `preferred` backend is tried before
+    the registered ones when no backend is named.
+    """
+    BACKEND_LOADERS.pop(name, None)
+    _LOADED.pop(name, None)
+    _UNAVAILABLE.discard(name)
+    if preferred:
+        others = dict(BACKEND_LOADERS)
+        BACKEND_LOADERS.clear()
+        BACKEND_LOADERS[name] = loader
+        BACKEND_LOADERS.update(others)
+    else:
+        BACKEND_LOADERS[name] = loader
+
+
+def _load(name: str) -> Optional[SolverBackend]:
+    backend = _LOADED.get(name)
+    if backend is None and name not in _UNAVAILABLE:
+        try:
+            backend = BACKEND_LOADERS[name]()
+        except ImportError:
+            _UNAVAILABLE.add(name)
+            return None
+        _LOADED[name] = backend
+    return backend
+
+
+def available_backends() -> list[str]:
+    """Names of the loadable backends, most preferred first."""
+    return [name for name in BACKEND_LOADERS if _load(name) is not None]
+
+
+def get_backend(name: Optional[str] = None) -> SolverBackend:
+    """
+    Backend `name`, or the most preferred loadable backend.
+
+    Raises
+    ------
+    ValueError
+        If no backend of that name is registered.
+    BackendUnavailableError
+        If the backend's dependencies are not installed.
+    """
+    if name is None:
+        for candidate in BACKEND_LOADERS:
+            backend = _load(candidate)
+            if backend is not None:
+                return backend
+        raise BackendUnavailableError("No solver backend can be loaded.")
+    if name not in BACKEND_LOADERS:
+        raise ValueError(
+            f"Unknown solver backend {name!r}; registered backends are "
+            f"{list(BACKEND_LOADERS)}."
+        )
+    backend = _load(name)
+    if backend is None:
+        raise BackendUnavailableError(
+            f"The {name!r} solver backend is not installed."
+        )
+    return backend
@@ -0,0 +1,213 @@
+"""
+Sparse Unmixing
+
+Sparse regression of every pixel against a large spectral library with the
+ADMM-based SUnSAL algorithm (Bioucas-Dias & Figueiredo, 2010)::
+
+    min 0.5 ||A x - y||^2 + lam ||x||_1   s.t.  x >= 0  (and sum(x) = 1)
+
+Pixels are processed in blocks as matrix operations. The penalty parameter
+is fixed, so the factorization of (A^T A + mu I) is computed once, cached,
+and reused for every iteration of every block and tile.
+
+Usage::
+
+    lib = SpectralLibrary.open("library.hdf5").resample(cube.wvl)
+    model = MixtureModel(lib.as_group(), cube)
+    res = model.run("results.hdf5", "sparse", sparse=SUnSALOptions(lam=1e-3))
+"""
+
+# Standard Libraries
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+from typing_extensions import Annotated
+
+# Dependencies
+import numpy as np
+import numpy.typing as npt
+
+# Relative Imports
+from .model_math import MixedCube, UnMixedCube
+from .solver_backends import SolverBackend, get_backend
+
+CACHE_SIZE = 8
+
+
+@dataclass(frozen=True)
+class SUnSALOptions:
+    """
+    Parameters
+    ----------
+    lam: float, default=1e-3
+        Weight of the L1 penalty. Larger values give sparser abundances.
+    mu: float, default=0.01
+        ADMM penalty parameter.
+    sum_to_one: bool, default=False
+        Constrain the abundances of each pixel to sum to one.
+    max_iter: int, default=200
+        Maximum number of ADMM iterations per block.
+    tol: float, default=1e-4
+        A block stops once its RMS primal and dual residuals both fall below
+        `tol`.
+    block_size: int, default=4096
+        Number of pixels solved together.
+    check_every: int, default=10
+        Number of iterations between convergence checks.
+    """
+
+    lam: float = 1e-3
+    mu: float = 0.01
+    sum_to_one: bool = False
+    max_iter: int = 200
+    tol: float = 1e-4
+    block_size: int = 4096
+    check_every: int = 10
+
+
+@dataclass
+class SparseFactorization:
+    """
+    Inverse of (A^T A + mu I) and the sum-to-one correction of a library.
+    See `factorize_sparse`.
+    """
+
+    Binv: Annotated[npt.NDArray[np.float32], (2,)]
+    C: Optional[Annotated[npt.NDArray[np.float32], (1,)]]
+
+
+_FACTOR_CACHE: OrderedDict[tuple, SparseFactorization] = OrderedDict()
+# Tiles are solved on several threads.
+_FACTOR_LOCK = threading.Lock()
+
+
+def _factorize(
+    A: Annotated[npt.NDArray[np.float32], (2,)], mu: float, sum_to_one: bool
+) -> SparseFactorization:
+    """Cached inverse of (A^T A + mu I) and the sum-to-one correction."""
+    key = (hashlib.sha1(A.tobytes()).hexdigest(), A.shape, mu, sum_to_one)
+    with _FACTOR_LOCK:
+        cached = _FACTOR_CACHE.get(key)
+        if cached is not None:
+            _FACTOR_CACHE.move_to_end(key)
+            return cached
+
+    A64 = A.astype(np.float64)
+    Binv = np.linalg.inv(A64.T @ A64 + mu * np.eye(A.shape[1]))
+    C = None
+    if sum_to_one:
+        b1 = Binv.sum(axis=1)
+        C = (b1 / b1.sum()).astype(np.float32)
+    factor = SparseFactorization(Binv.astype(np.float32), C)
+
+    with _FACTOR_LOCK:
+        _FACTOR_CACHE[key] = factor
+        if len(_FACTOR_CACHE) > CACHE_SIZE:
+            _FACTOR_CACHE.popitem(last=False)
+    return factor
+
+
+def factorize_sparse(
+    G: Annotated[npt.NDArray, (2,)], opts: SUnSALOptions
+) -> SparseFactorization:
+    """
+    Factorization `unmix_sparse` uses for the library `G` under `opts`.
+    Pass it as `factor` to solve many cubes against `G` without relying on
+    the factorization cache.
+    """
+    A = np.ascontiguousarray(G, dtype=np.float32)
+    return _factorize(A, opts.mu, opts.sum_to_one)
+
+
+def _project_sum(
+    W: npt.NDArray[np.float32], C: Optional[npt.NDArray[np.float32]]
+) -> npt.NDArray[np.float32]:
+    if C is None:
+        return W
+    return W - (W.sum(axis=1, keepdims=True) - 1) * C
+
+
+def _admm_block(
+    Y: Annotated[npt.NDArray[np.float32], (2,)],
+    A: Annotated[npt.NDArray[np.float32], (2,)],
+    factor: SparseFactorization,
+    opts: SUnSALOptions,
+    backend: SolverBackend,
+) -> Annotated[npt.NDArray[np.float32], (2,)]:
+    """Solves a (pixels x bands) block and returns (pixels x L) abundances."""
+    AtY = Y @ A
+    X = _project_sum(AtY @ factor.Binv, factor.C)
+    Z = np.maximum(X, 0)
+    D = np.zeros_like(X)
+    thresh = opts.lam / opts.mu
+    scale = np.sqrt(X.size)
+
+    for it in range(opts.max_iter):
+        X = _project_sum((AtY + opts.mu * (Z + D)) @ factor.Binv, factor.C)
+        Z_prev = Z
+        Z = backend.shrink(X, D, thresh)
+        if (it + 1) % opts.check_every == 0:
+            primal = np.linalg.norm(X - Z) / scale
+            dual = opts.mu * np.linalg.norm(Z - Z_prev) / scale
+            if primal < opts.tol and dual < opts.tol:
+                break
+    return Z
+
+
+def unmix_sparse(
+    mixed_cube: MixedCube,
+    opts: SUnSALOptions,
+    backend: Optional[str] = None,
+    factor: Optional[SparseFactorization] = None,
+) -> UnMixedCube:
+    """
+    Sparse unmixing of every pixel against the (bands x L) library `G`.
+
+    The result has the layout of `unmix_spectral_cube`: the fractions carry
+    a trailing (zero) offset column and the model and residual a trailing
+    sum-to-one row, whose residual is 0 unless `opts.sum_to_one`.
+    `backend` names the solver backend of the iterations (see
+    `hypmix.solver_backends`). `factor` is `factorize_sparse(G, opts)`,
+    computed ahead of time.
+    """
+    A = np.ascontiguousarray(mixed_cube.G, dtype=np.float32)
+    d = mixed_cube.d
+    nb, nl = A.shape
+    if factor is None:
+        factor = _factorize(A, opts.mu, opts.sum_to_one)
+    solver = get_backend(backend)
+
+    pixels = d.reshape(-1, nb)
+    npix = pixels.shape[0]
+    fracs = np.full((npix, nl + 1), np.nan, dtype=np.float32)
+    model = np.full((npix, nb + 1), np.nan, dtype=np.float32)
+    res = np.full((npix, nb + 1), np.nan, dtype=np.float32)
+
+    for start in range(0, npix, opts.block_size):
+        stop = min(start + opts.block_size, npix)
+        Y = np.ascontiguousarray(pixels[start:stop], dtype=np.float32)
+        valid = np.isfinite(Y).all(axis=1)
+        if not np.any(valid):
+            continue
+        rows = np.flatnonzero(valid) + start
+        Yv = Y[valid]
+
+        X = _admm_block(Yv, A, factor, opts, solver)
+        M = X @ A.T
+        fracs[rows, :nl] = X
+        fracs[rows, nl] = 0
+        model[rows, :nb] = M
+        model[rows, nb] = X.sum(axis=1)
+        res[rows, :nb] = M - Yv
+        # Unconstrained fractions are not fitted to sum to one, so their
+        # sum-to-one row is no misfit and stays out of the RMS residual.
+        res[rows, nb] = model[rows, nb] - 1 if opts.sum_to_one else 0
+
+    shape = d.shape[:-1]
+    return UnMixedCube(
+        model.reshape(*shape, nb + 1),
+        fracs.reshape(*shape, nl + 1),
+        res.reshape(*shape, nb + 1),
+    )
@@ -0,0 +1,284 @@
+"""
+Result Storage Codecs
+
+Lossy encodings for the fraction, residual and model datasets of a model
+result. Fractions live in roughly [-0.2, 1.2] and need about 1e-4
+precision, so full float32 storage is mostly wasted bits.
+
+- `INT16` stores round((x - add_offset) / scale_factor) with the scale and
+  offset as dataset attributes (CF convention). NaN is stored as -32768.
+- `FLOAT16` stores half floats (about 3 significant digits).
+- `SCALE_OFFSET` keeps float32 but applies the HDF5 scale-offset filter,
+  which packs each chunk into the minimum number of bits for `step`.
+
+The codec is recorded on each dataset, so readers (`load_model_result`,
+`LazyDataset`, the GIS export) decode transparently, per slice.
+
+Result datasets are chunked for two access patterns at once: band images
+(all pixels of one band) and pixel spectra (all bands of one pixel). A chunk
+holds `cb` bands of a square of about `cb` pixels, so both reads overread by
+a similar factor. Hot datasets can additionally be written band-major
+(`StorageOptions.band_major`), and `LazyDataset` then serves band images
+from that copy.
+
+Usage::
+
+    save_model_result(res, storage=StorageOptions(StorageCodec.INT16))
+    model.run("results.hdf5", "m1", tile_rows=256,
+              storage=StorageOptions(StorageCodec.SCALE_OFFSET))
+"""
+
+# Standard Libraries
+from __future__ import annotations
+import json
+import math
+from dataclasses import asdict, dataclass
+from enum import Enum
+from typing import TYPE_CHECKING, Any, Optional
+
+# Dependencies
+import numpy as np
+import numpy.typing as npt
+
+if TYPE_CHECKING:
+    import h5py as h5  # type: ignore
+
+INT16_NODATA = -32768
+INT16_MAX = 32767
+SCALE_OFFSET_NODATA = -9999.0
+CHUNK_BYTES = 64 * 1024
+BAND_MAJOR_EDGE = 256
+BAND_MAJOR_GROUP = "band_major"
+# Midpoints of the expected value ranges, used for INT16 datasets that are
+# written tile by tile, before their full range is known.
+DEFAULT_OFFSETS = {"fractions": 0.5}
+
+
+class StorageCodec(Enum):
+    FLOAT32 = "float32"
+    FLOAT16 = "float16"
+    INT16 = "int16"
+    SCALE_OFFSET = "scaleoffset"
+
+
+@dataclass(frozen=True)
+class StorageOptions:
+    """
+    Parameters
+    ----------
+    codec: StorageCodec, default=StorageCodec.FLOAT32
+        Encoding of the selected datasets.
+    step: float, default=1e-4
+        Quantization step of `INT16` and `SCALE_OFFSET`.
+    datasets: tuple[str, ...], default=("fractions", "residuals", "model")
+        Result datasets the codec applies to. Others stay float32.
+    offset: float, optional
+        `add_offset` of `INT16` datasets written tile by tile. Values more
+        than 32767 steps away from it saturate. Defaults to 0.5 for
+        fractions and 0 otherwise. Results saved whole use the midpoint of
+        their data instead and widen the step if the range needs it.
+    compression: str, optional
+        HDF5 compression filter (e.g. "gzip" or "lzf") applied, with
+        byte shuffling, on top of the codec.
+    chunk_bytes: int, default=65536
+        Approximate size of a dataset chunk.
+    band_major: tuple[str, ...], default=()
+        Datasets to also write as a (bands, rows, columns) copy, chunked
+        per band, for fast band-image reads. Doubles their storage.
+    """
+
+    codec: StorageCodec = StorageCodec.FLOAT32
+    step: float = 1e-4
+    datasets: tuple[str, ...] = ("fractions", "residuals", "model")
+    offset: Optional[float] = None
+    compression: Optional[str] = None
+    chunk_bytes: int = CHUNK_BYTES
+    band_major: tuple[str, ...] = ()
+
+
+def storage_id(storage: Optional[StorageOptions]) -> str:
+    """
+    Canonical description of the storage options (None for the default)
+    a result is written with, recorded on its group.
+    """
+    opts = asdict(storage or StorageOptions())
+    opts["codec"] = opts["codec"].value
+    return json.dumps(opts, sort_keys=True)
+
+
+def chunk_shape(
+    shape: tuple[int, ...], itemsize: int, chunk_bytes: int = CHUNK_BYTES
+) -> Optional[tuple[int, ...]]:
+    """
+    Chunk shape balancing band-image and pixel-spectrum reads.
+
+    For a (rows, columns, bands) dataset a band image read overreads by the
+    bands per chunk `cb`, and a spectrum read by the pixels per chunk, so
+    chunks cover about `cb` pixels, grown to reach `chunk_bytes`. `cb` is
+    capped at sqrt(`chunk_bytes` / `itemsize`) bands, split evenly. 2D
+    datasets, (rows, columns) images or sparse (pixels, channels) results,
+    are chunked in runs of whole rows.
+    """
+    if len(shape) == 0 or 0 in shape:
+        return None
+    n = max(chunk_bytes // itemsize, 1)
+    match shape:
+        case (ny, nx, nb):
+            n_band_chunks = -(-nb // max(math.isqrt(n), 1))
+            cb = -(-nb // n_band_chunks)
+            edge = max(math.isqrt(max(cb, n // cb)), 1)
+            return (min(edge, ny), min(edge, nx), cb)
+        case (nrows, nc):
+            return (min(max(n // nc, 1), nrows), min(nc, n))
+        case (npix,):
+            return (min(n, npix),)
+    return None
+
+
+def dataset_layout(
+    name: str,
+    storage: Optional[StorageOptions],
+    shape: tuple[int, ...],
+    data: Optional[npt.NDArray] = None,
+) -> tuple[dict[str, Any], dict[str, Any]]:
+    """
+    `create_dataset` keyword arguments and attributes for result dataset
+    `name` of `shape`. If the whole `data` is given, INT16 scale and offset
+    are fitted to its range.
+    """
+    kwargs: dict[str, Any] = {"dtype": np.float32, "fillvalue": np.nan}
+    attrs: dict[str, Any] = {}
+    chunk_bytes = CHUNK_BYTES if storage is None else storage.chunk_bytes
+    if storage is None or name not in storage.datasets:
+        kwargs["chunks"] = chunk_shape(shape, 4, chunk_bytes)
+        return kwargs, attrs
+
+    if storage.compression is not None:
+        kwargs.update(compression=storage.compression, shuffle=True)
+
+    match storage.codec:
+        case StorageCodec.FLOAT32:
+            pass
+        case StorageCodec.FLOAT16:
+            kwargs.update(dtype=np.float16)
+        case StorageCodec.INT16:
+            scale = storage.step
+            offset = storage.offset
+            if offset is None:
+                offset = DEFAULT_OFFSETS.get(name, 0.0)
+            if data is not None:
+                finite = np.asarray(data)[np.isfinite(data)]
+                if finite.size > 0:
+                    lo, hi = float(finite.min()), float(finite.max())
+                    offset = (lo + hi) / 2
+                    scale = max(scale, (hi - lo) / (2 * INT16_MAX))
+            kwargs.update(dtype=np.int16, fillvalue=INT16_NODATA)
+            attrs.update(scale_factor=scale, add_offset=offset)
+        case StorageCodec.SCALE_OFFSET:
+            digits = max(int(math.ceil(-math.log10(storage.step))), 0)
+            # The filter mangles NaN, but maps the fill value exactly.
+            kwargs.update(scaleoffset=digits, fillvalue=SCALE_OFFSET_NODATA)
+            attrs.update(nodata=SCALE_OFFSET_NODATA)
+    attrs["codec"] = storage.codec.value
+    kwargs["chunks"] = chunk_shape(
+        shape, np.dtype(kwargs["dtype"]).itemsize, chunk_bytes
+    )
+    return kwargs, attrs
+
+
+def create_result_dataset(
+    g: h5.Group,
+    name: str,
+    storage: Optional[StorageOptions],
+    data: Optional[npt.NDArray] = None,
+    shape: Optional[tuple[int, ...]] = None,
+) -> h5.Dataset:
+    """
+    Creates result dataset `name` in `g` with its codec and chunk layout,
+    plus its band-major copy if `storage` asks for one. Either `data` is
+    written at once or an empty dataset of `shape` is created.
+    """
+    if data is not None:
+        shape = np.shape(data)
+    assert shape is not None
+    kwargs, attrs = dataset_layout(name, storage, shape, data)
+    dset = g.create_dataset(name, shape=shape, **kwargs)
+    dset.attrs.update(attrs)
+
+    bands = None
+    if storage is not None and name in storage.band_major and len(shape) == 3:
+        ny, nx, nb = shape
+        kwargs["chunks"] = (
+            1,
+            min(ny, BAND_MAJOR_EDGE),
+            min(nx, BAND_MAJOR_EDGE),
+        )
+        bg = g.require_group(BAND_MAJOR_GROUP)
+        bands = bg.create_dataset(name, shape=(nb, ny, nx), **kwargs)
+        bands.attrs.update(attrs)
+
+    if data is not None:
+        dset[...] = encode(data, dset)
+        if bands is not None:
+            for n in range(shape[-1]):
+                bands[n] = encode(data[..., n], bands)
+    return dset
+
+
+def write_rows(g: h5.Group, name: str, rows: slice, arr: npt.ArrayLike):
+    """
+    Encodes `arr` into rows `rows` of result dataset `name` and of its
+    band-major copy, if any.
+    """
+    dset = g[name]
+    dset[rows] = encode(arr, dset)
+    bands = g.get(f"{BAND_MAJOR_GROUP}/{name}")
+    if bands is not None:
+        bands[:, rows] = np.moveaxis(encode(arr, bands), -1, 0)
+
+
+def band_major_name(f: h5.File, name: str) -> Optional[str]:
+    """Full name of the band-major copy of dataset `name`, if it exists."""
+    parent, _, leaf = name.rpartition("/")
+    copy = f"{parent}/{BAND_MAJOR_GROUP}/{leaf}" if parent else None
+    if copy is not None and copy in f:
+        return copy
+    return None
+
+
+def encode(arr: npt.ArrayLike, dset: h5.Dataset) -> npt.NDArray:
+    """Encodes float values for storage in `dset`."""
+    arr = np.asarray(arr)
+    match dset.attrs.get("codec"):
+        case StorageCodec.INT16.value:
+            q = (arr - dset.attrs["add_offset"]) / dset.attrs["scale_factor"]
+            q = np.clip(np.rint(q), -INT16_MAX, INT16_MAX)
+            return np.where(np.isnan(arr), INT16_NODATA, q).astype(np.int16)
+        case StorageCodec.SCALE_OFFSET.value:
+            return np.where(np.isnan(arr), dset.attrs["nodata"], arr)
+        case StorageCodec.FLOAT16.value:
+            return arr.astype(np.float16)
+    return arr
+
+
+def decode(raw: npt.NDArray, attrs: Any) -> npt.NDArray:
+    """Decodes values read from a dataset with attributes `attrs`."""
+    match attrs.get("codec"):
+        case StorageCodec.INT16.value:
+            out = np.array(raw, dtype=np.float32)
+            out *= np.float32(attrs["scale_factor"])
+            out += np.float32(attrs["add_offset"])
+            out[raw == INT16_NODATA] = np.nan
+            return out
+        case StorageCodec.SCALE_OFFSET.value:
+            out = np.asarray(raw, dtype=np.float32)
+            out[out == attrs["nodata"]] = np.nan
+            return out
+        case StorageCodec.FLOAT16.value:
+            return np.asarray(raw, dtype=np.float32)
+    return raw
+
+
+def read_decoded(dset: h5.Dataset, key: Any = ...) -> npt.NDArray:
+    """Reads `dset[key]` and decodes it."""
+    return decode(dset[key], dset.attrs)
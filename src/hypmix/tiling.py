@@ -0,0 +1,82 @@
+"""
+Tiling
+
+Splits the pixels of a model run into tiles of whole rows. For scenes and
+window regions a tile is a block of image rows; for sparse regions it is a
+block of consecutive selected pixels. Tile `i` of a run always covers the
+same rows of the result datasets, which is what allows an interrupted run
+to be resumed tile by tile.
+"""
+
+# Standard Libraries
+from dataclasses import dataclass
+from typing import Optional
+
+# Dependencies
+import numpy.typing as npt
+
+# Relative Imports
+from .roi import ROI
+
+
+@dataclass
+class Tile:
+    """
+    Attributes
+    ----------
+    index: int
+        Position of the tile in the run.
+    start: int
+        First result row covered by the tile.
+    stop: int
+        One past the last result row covered by the tile.
+    """
+
+    index: int
+    start: int
+    stop: int
+
+    def __len__(self) -> int:
+        return self.stop - self.start
+
+
+def result_shape(
+    scene_shape: tuple[int, int], region: Optional[ROI]
+) -> tuple[int, ...]:
+    """
+    Per-pixel shape of the result datasets: (rows, columns) for scenes and
+    windows, (pixels,) for sparse regions.
+    """
+    if region is None:
+        return tuple(scene_shape)
+    if region.coords is not None:
+        return (region.coords.shape[0],)
+    return (region.window.height, region.window.width)
+
+
+def plan_tiles(n_rows: int, tile_rows: int) -> list[Tile]:
+    """Splits `n_rows` result rows into tiles of at most `tile_rows`."""
+    if tile_rows < 1:
+        raise ValueError(f"tile_rows must be positive, got {tile_rows}.")
+    return [
+        Tile(n, start, min(start + tile_rows, n_rows))
+        for n, start in enumerate(range(0, n_rows, tile_rows))
+    ]
+
+
+def read_tile(
+    data: npt.NDArray, region: Optional[ROI], tile: Tile
+) -> npt.NDArray:
+    """
+    Reads the data of a tile as a (rows, columns, bands) cube. Tiles of a
+    sparse region are returned as a (pixels, 1, bands) cube.
+    """
+    if region is None:
+        return data[tile.start : tile.stop]
+    if region.coords is not None:
+        coords = region.coords[tile.start : tile.stop]
+        return data[coords[:, 0], coords[:, 1], :][:, None, :]
+    rows, cols = region.window.slices()
+    return data[
+        rows.start + tile.start : rows.start + tile.stop, cols  # type: ignore
+    ]
@@ -1,6 +1,7 @@
 # Standard Libraries
-from dataclasses import dataclass
-from typing import TypeVar
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import TypeVar, Optional
 from typing_extensions import Annotated
 import os
 from pathlib import Path
@@ -23,12 +24,77 @@ class Spectrum:
     wvl: SpectrumLike
 
 
+class Interleave(Enum):
+    """Physical memory layout of a spectral cube."""
+
+    BSQ = "bsq"  # (bands, rows, columns)
+    BIL = "bil"  # (rows, bands, columns)
+    BIP = "bip"  # (rows, columns, bands)
+
+
+def memory_interleave(data: ImageCubeLike) -> Optional[Interleave]:
+    """
+    Physical interleave of a (rows, columns, bands) array, read from its
+    strides. Returns None for layouts that are none of BSQ, BIL or BIP.
+    """
+    order = tuple(
+        sorted(range(3), key=lambda ax: abs(data.strides[ax]), reverse=True)
+    )
+    return {
+        (2, 0, 1): Interleave.BSQ,
+        (0, 2, 1): Interleave.BIL,
+        (0, 1, 2): Interleave.BIP,
+    }.get(order)
+
+
 @dataclass
 class ImageCube:
+    """
+    Spectral data cube.
+
+    `data` is always exposed as a (rows, columns, bands) array. The band axis
+    is moved with a view rather than a copy, so `interleave` records the
+    physical layout of the underlying buffer.
+
+    Attributes
+    ----------
+    data: NDArray[(3,)]
+        Spectral cube data.
+    wvl: NDArray[(1,)]
+        Band wavelengths.
+    bands_first: bool, default=False
+        If True the band axis of the input is axis 0. Otherwise it is taken
+        to be the shortest axis.
+    source: PathLike, optional
+        File the cube was read from.
+    interleave: Interleave or None
+        Physical memory layout of `data`.
+    """
+
     data: ImageCubeLike
     wvl: SpectrumLike
     bands_first: bool = False
+    source: Optional[PathLike] = None
+    interleave: Optional[Interleave] = field(init=False, default=None)
 
     def __post_init__(self):
-        bands_dim = np.argmin(self.data.shape)
+        if self.bands_first:
+            bands_dim = 0
+        else:
+            bands_dim = int(np.argmin(self.data.shape))
         self.data = np.moveaxis(self.data, bands_dim, -1)
+        self.interleave = memory_interleave(self.data)
+
+    def pixel_matrix(self) -> Annotated[npt.NDArray[DType], (2,)]:
+        """
+        (pixels x bands) view of the cube. It is C-contiguous for BIP and
+        F-contiguous for BSQ cubes, with no copy made in either case. BIL
+        cubes have no such view and are copied.
+        """
+        return self.data.reshape(-1, self.data.shape[-1])
+
+    def band_matrix(self) -> Annotated[npt.NDArray[DType], (2,)]:
+        """
+        (bands x pixels) view of the cube; C-contiguous for BSQ cubes.
+        """
+        return self.pixel_matrix().T